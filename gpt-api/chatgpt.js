@@ -2,9 +2,15 @@
 
 // Import required modules
 const fs = require('fs');
+const https = require('https');
+const readline = require('readline');
+const zlib = require('zlib');
 const { OpenAI } = require('openai');
 
-const openai = new OpenAI({ apiKey: 'YOUR-API-KEY' });
+// Reuse TLS connections between requests in server mode
+const httpAgent = new https.Agent({ keepAlive: true });
+
+const openai = new OpenAI({ apiKey: 'YOUR-API-KEY', httpAgent });
 
 // Main function to interact with the OpenAI API
 async function interactWithOpenAI(fileContent, filePath) {
@@ -25,11 +31,124 @@ async function interactWithOpenAI(fileContent, filePath) {
     }
 }
 
+// Stream the response, calling onToken for every piece of it
+async function streamExplanation(fileContent, onToken, signal,
+                                 model = "gpt-3.5-turbo") {
+    const stream = await openai.chat.completions.create({
+        messages: [{ role: "system", content: fileContent }],
+        model,
+        stream: true
+    }, { signal });
+    for await (const chunk of stream) {
+        const token = chunk.choices[0]?.delta?.content;
+        if (token) {
+            onToken(token);
+        }
+    }
+}
+
+// Read all of a stream, gunzipping it if it starts with the gzip magic
+function readPayload(input = process.stdin) {
+    return new Promise((resolve, reject) => {
+        const chunks = [];
+        const finish = () => resolve(Buffer.concat(chunks).toString('utf8'));
+        let gunzip;  // decided by the first chunk
+        input.on('data', (chunk) => {
+            if (gunzip === undefined) {
+                gunzip = chunk[0] === 0x1f && chunk[1] === 0x8b ?
+                    zlib.createGunzip() : null;
+                if (gunzip) {
+                    gunzip.on('data', (data) => chunks.push(data));
+                    gunzip.on('end', finish);
+                    gunzip.on('error', reject);
+                }
+            }
+            if (gunzip) {
+                gunzip.write(chunk);
+            } else {
+                chunks.push(chunk);
+            }
+        });
+        input.on('end', () => (gunzip ? gunzip.end() : finish()));
+        input.on('error', reject);
+    });
+}
+
+// Content of a server request, which may be sent gzipped as base64
+function requestContent(request) {
+    if (request.contentEncoding === 'gzip+base64') {
+        return zlib.gunzipSync(Buffer.from(request.fileContent, 'base64'))
+            .toString('utf8');
+    }
+    return request.fileContent;
+}
+
+// Long-lived mode: newline-delimited JSON requests on stdin, responses
+// on stdout tagged with the request id so several can run at once.
+//   in:  {"id": 1, "fileContent": "...", "model": "..."}, where large
+//        content may come with "contentEncoding": "gzip+base64"
+//        or {"id": 1, "cancel": true}
+//   out: {"id": 1, "token": "..."}, then {"id": 1, "done": true}
+//        or {"id": 1, "error": "..."}
+function serve(input = process.stdin, output = process.stdout) {
+    const running = new Map();
+    const send = (message) => output.write(JSON.stringify(message) + "\n");
+
+    const lines = readline.createInterface({ input, crlfDelay: Infinity });
+    lines.on('line', (line) => {
+        if (!line.trim()) {
+            return;
+        }
+        let request;
+        try {
+            request = JSON.parse(line);
+        } catch (error) {
+            send({ id: null, error: "Invalid request: " + error.message });
+            return;
+        }
+        const { id } = request;
+        if (request.cancel) {
+            const controller = running.get(id);
+            if (controller) {
+                controller.abort();
+            }
+            return;
+        }
+        const controller = new AbortController();
+        running.set(id, controller);
+        Promise.resolve()
+            .then(() => streamExplanation(requestContent(request),
+                                          (token) => send({ id, token }),
+                                          controller.signal, request.model))
+            .then(() => send({ id, done: true }))
+            .catch((error) => send({ id, error: error.message }))
+            .finally(() => running.delete(id));
+    });
+}
+
 // Check if this script is executed from command line
 if (require.main === module){
-    // Extracting command line arguments
-    const [, , fileContent, filePath] = process.argv;
+    if (process.argv[2] === '--server') {
+        serve();
+    } else if (process.argv[2] === '--stream') {
+        // The content comes on stdin, plain or gzipped
+        readPayload()
+            .then((fileContent) => streamExplanation(
+                fileContent, (token) => process.stdout.write(token)))
+            .catch((error) => {
+                process.stderr.write(error.message + "\n");
+                process.exitCode = 1;
+            });
+    } else {
+        // The file to append to is the only argument; its content comes
+        // on stdin, plain or gzipped
+        const [, , filePath] = process.argv;
+
+        readPayload().then((fileContent) =>
+            interactWithOpenAI(fileContent, filePath));
+    }
+}
 
-    // Call the main function with provided arguments
-    interactWithOpenAI(fileContent, filePath);
-}
\ No newline at end of file
+module.exports = {
+    interactWithOpenAI, streamExplanation, serve, readPayload, requestContent
+};
@@ -1,19 +1,38 @@
 #!/usr/bin/env python3
 """Module to define the base class"""
 
+from startup import StartupTimer
 import tkinter as tk
 from tkinter import ttk
+import tkinter.messagebox as messagebox
 import os
-from PIL import Image, ImageTk
-from hashlib import md5
 from menu_file import (
     create_menu,
     create_status_bar,
-    open_file,
-    bind_right_click
+    bind_right_click,
+    schedule_status_bar_update
 )
-import subprocess
-import json
+from file_loader import ChunkedLoader
+from large_file import LargeFileView, LARGE_FILE_THRESHOLD
+from line_index import LineIndex
+from piece_table import PieceTable, VERIFY_LIMIT
+from status_stats import DocumentStats
+from save_engine import SaveEngine
+from text_hooks import install_edit_hooks
+from explain import ExplainPanel
+from hibernate import HibernatedDocument, TabHibernator
+from highlighter import Highlighter, lexer_for
+from journal import Journal, recover_tabs, get_journal_writer
+from file_watcher import FileWatcher, file_stat
+from charset import ascii_compatible, sniff_file
+from long_lines import LongLines, has_long_line
+from styles import get_styles
+from node_worker import get_worker
+from diagnostics import get_diagnostics, diagnostics_enabled, \
+    DUMP_VARIABLE
+
+# Closed tabs kept to be reused by new ones; the rest are destroyed
+TAB_POOL_SIZE = 4
 
 
 class Tab(ttk.Frame):
@@ -21,41 +40,415 @@ class Tab(ttk.Frame):
     def __init__(self, *args, FileDir=None):
         ttk.Frame.__init__(self, *args)
         self.textbox = self.create_text_widget()
-        self.saved_content = None
+        # Version of the shared view options the text widget shows
+        self.style_version = get_styles().version
+        # Document model kept in step with the text widget
+        self.document = PieceTable()
+        self.lines = LineIndex()
+        self.edit_listeners = []
+        self.scroll_listeners = []
+        self.textbox.config(yscrollcommand=self.on_yscroll)
+        self.track_edits = True
+        # Document offset and text of the edit being reported
+        self.last_edit = (0, '')
+        self.undoing = False
+        install_edit_hooks(self.textbox, self.on_text_edit, self.on_undo)
+        self.stats = DocumentStats()
+        self.add_edit_listener(self.update_stats)
+        # Unsaved edits are journaled for crash recovery
+        self.journal = Journal(self)
+        # Dirty state comes from Tk's modified flag; the saved length and
+        # digest only catch text edited back to what is on disk
+        self.saved_length = 0
+        self.saved_digest = None
+        # Version of the file the content was last in step with
+        self.disk_stat = None
+        self.textbox.bind('<<Modified>>', self.on_modified)
         self.file_dir = None
+        self.file_name = None
+        # Guessed when the file is loaded, and used to save it
+        self.encoding = 'utf-8'
         self.status_bar = None
+        self.loader = None
+        self.large_file = None
+        self.explain_panel = None
+        self.hibernated = None
+        self.find_bar = None
+        self.highlighter = None
+        self.long_lines = None
         if FileDir:
             self.file_dir = FileDir
             self.file_name = os.path.basename(FileDir)
             self.load_file_content()
-        self.status = md5(self.textbox.get(1.0, 'end').encode('utf-8'))
+
+    @property
+    def encoding(self):
+        """Encoding the file is read and saved in"""
+        return self.lines.encoding
+
+    @encoding.setter
+    def encoding(self, encoding):
+        if encoding != self.lines.encoding:
+            # Byte offsets are counted in the new encoding
+            self.lines.reset(self.textbox.get('1.0', 'end-1c'), encoding)
 
     def load_file_content(self):
-        """Load file content and set saved_content"""
+        """Stream file content into the text widget; the tab is marked as
+           saved once the whole file has been loaded
+        """
         if self.file_dir and os.path.exists(self.file_dir):
-            with open(self.file_dir, 'r') as file:
-                content = file.read()
-                self.textbox.insert('1.0', content)
-                self.saved_content = content  # Set saved_content
+            if os.path.getsize(self.file_dir) >= LARGE_FILE_THRESHOLD:
+                self.open_large_file()
+                return
+            self.loader = ChunkedLoader(self, self.file_dir,
+                                        on_done=self.on_load_complete)
+            self.loader.start()
+
+    def on_load_complete(self, loader):
+        """Called by the loader once the file is in, or loading stopped"""
+        self.loader = None
+        if loader.cancelled:
+            # A partial buffer must never be saved over the original file
+            self.file_dir = None
+            self.file_name = 'Untitled'
+            self.journal.clear()
+            if isinstance(self.master, ttk.Notebook):
+                self.master.tab(self, text=self.file_name)
+            return
+        self.mark_saved()
+        self.update_highlighter()
+
+    def update_highlighter(self):
+        """Highlight the syntax of the file's type, if it has a lexer"""
+        if self.highlighter:
+            self.highlighter.detach()
+            self.highlighter = None
+        lexer = None
+        if not self.is_read_only() and not self.long_lines:
+            lexer = lexer_for(self.file_name)
+        if lexer:
+            self.highlighter = Highlighter(self, lexer)
+
+    def mark_saved(self, result=None):
+        """Record the content on disk, either the current content or the
+           snapshot written by a background save (a SaveResult)
+        """
+        if result is None:
+            self.saved_length = len(self.document)
+            self.saved_digest = None
+            if self.saved_length <= VERIFY_LIMIT:
+                self.saved_digest = self.document.digest()
+            self.textbox.edit_modified(False)
+            if self.hibernated is not None:
+                self.hibernated.modified = False
+            self.journal.clear()
+            self.disk_stat = file_stat(self.file_dir) if self.file_dir \
+                else None
+            return
+        self.saved_length = result.length
+        self.saved_digest = result.digest
+        self.disk_stat = file_stat(result.file_path)
+        # Edits made while the save was running are still unsaved
+        if result.version == self.document.version:
+            self.textbox.edit_modified(False)
+            if self.hibernated is not None:
+                # restore() brings this flag back
+                self.hibernated.modified = False
+            self.journal.clear()
+        else:
+            # The journaled edits no longer apply to the file on disk
+            self.journal.compact()
+
+    def is_modified(self):
+        """Whether the content differs from the content on disk.
+           Tk's modified flag follows undo/redo back to the saved state;
+           small documents retyped to their saved content are caught by
+           comparing the cached digest.
+        """
+        if not self.textbox.edit_modified():
+            return False
+        content = self.content()
+        if self.saved_digest is None or len(content) != self.saved_length:
+            return True
+        if self.hibernated is not None:
+            return self.hibernated.digest != self.saved_digest
+        return self.document.digest() != self.saved_digest
+
+    def changed_on_disk(self):
+        """Whether another program changed the file since the content
+           was last in step with it
+        """
+        if self.disk_stat is None or not self.file_dir:
+            return False
+        return file_stat(self.file_dir) not in (None, self.disk_stat)
+
+    def content(self):
+        """The document, or its compressed copy while hibernated"""
+        if self.hibernated is not None:
+            return self.hibernated
+        return self.document
+
+    def snapshot(self):
+        """Frozen copy of the content for a background save"""
+        if self.hibernated is not None:
+            return self.hibernated
+        return self.document.snapshot()
+
+    def hibernate(self):
+        """Move the content to a compressed buffer and free the text
+           widget's copy and undo stack
+        """
+        digest = None
+        if len(self.document) <= VERIFY_LIMIT:
+            digest = self.document.digest()
+        hibernated = HibernatedDocument(self.document.chunks(),
+                                        len(self.document), digest)
+        hibernated.modified = self.textbox.edit_modified()
+        hibernated.insert = self.textbox.index('insert')
+        hibernated.top = self.textbox.yview()[0]
+        self.track_edits = False
+        self.textbox.delete('1.0', 'end')
+        self.textbox.edit_reset()
+        # Same content, same version: a save still running must match it
+        version = self.document.version
+        self.document.reset()
+        self.document.version = version
+        self.lines.reset()
+        if self.long_lines:
+            self.long_lines.reset()
+        # Keeps its value while hibernated; the stats stay valid too
+        self.textbox.edit_modified(hibernated.modified)
+        self.hibernated = hibernated
+
+    def restore(self):
+        """Put the hibernated content back into the text widget"""
+        hibernated, self.hibernated = self.hibernated, None
+        # Not closed: a save may still be reading it, and the buffer is
+        # freed with the last reference
+        text = hibernated.text()
+        shown = self.long_lines.reset(text) if self.long_lines else text
+        undo = self.textbox.cget('undo')
+        self.textbox.config(undo=False)
+        self.textbox.insert('1.0', shown)
+        self.textbox.config(undo=undo)
+        version = self.document.version
+        self.document.reset(text)
+        self.document.version = version
+        self.lines.reset(shown)
+        self.track_edits = True
+        self.textbox.edit_reset()
+        self.textbox.edit_modified(hibernated.modified)
+        self.textbox.mark_set('insert', hibernated.insert)
+        self.textbox.yview_moveto(hibernated.top)
+        if self.find_bar and self.find_bar.is_open():
+            self.find_bar.search()
+        if self.highlighter:
+            self.highlighter.reset()
+
+    def on_modified(self, event=None):
+        """Flag the tab title while there are unsaved changes"""
+        if not isinstance(self.master, ttk.Notebook):
+            return
+        title = self.file_name or 'Untitled'
+        if self.textbox.edit_modified():
+            title += ' *'
+        try:
+            self.master.tab(self, text=title)
+        except tk.TclError:
+            pass  # Not added to the notebook yet
+
+    def on_text_edit(self, action, start, end, text):
+        """Apply an edit of the text widget to the document model and
+           pass it on to the registered edit listeners
+        """
+        if not self.track_edits:
+            return
+        line, column = map(int, start.split('.'))
+        offset = self.lines.offset(line, column)
+        content = text
+        if self.long_lines:
+            # The widget also holds the soft breaks of long lines
+            offset, content = self.long_lines.edited(action, offset, text,
+                                                     self.undoing)
+        self.last_edit = (offset, content)
+        if action == 'insert':
+            self.document.insert(offset, content)
+            self.lines.insert(line, column, text, lambda: self.textbox.get(
+                f'{line}.0', start))
+        else:
+            end_line, end_column = map(int, end.split('.'))
+            self.document.delete(offset, len(content))
+            self.lines.delete(line, column, end_line, end_column, text)
+        for listener in self.edit_listeners:
+            listener(action, start, end, text)
+
+    def on_undo(self, undoing):
+        """Undo or redo started (True) or finished (False)"""
+        self.undoing = undoing
+
+    def document_offset(self, line, column):
+        """Document offset of a text widget position"""
+        offset = self.lines.offset(line, column)
+        if self.long_lines:
+            offset = self.long_lines.breaks.to_document(offset)
+        return offset
+
+    def widget_position(self, offset):
+        """Text widget (line, column) of a document offset"""
+        if self.long_lines:
+            offset = self.long_lines.breaks.to_widget(offset)
+        return self.lines.position(offset)
+
+    def append_text(self, text):
+        """Add loaded text at the end, in long-line mode once it holds a
+           line too long for the text widget to lay out quickly
+        """
+        if self.long_lines is None:
+            column = int(self.textbox.index('end-1c').split('.')[1])
+            if has_long_line(text, column):
+                self.long_lines = LongLines(self)
+        self.insert_text('end-1c', text)
+
+    def insert_text(self, index, text):
+        """Insert document text at a text widget index; returns the index
+           after it
+        """
+        if self.long_lines:
+            return self.long_lines.insert(index, text)
+        index = self.textbox.index(index)
+        self.textbox.insert(index, text)
+        return self.textbox.index(f'{index} + {len(text)}c')
+
+    def update_stats(self, action, start, end, text):
+        """Keep the status bar counters in step with an edit"""
+        text = self.last_edit[1]
+        before = self.textbox.get(f'{start} - 1c', start)
+        after_index = end if action == 'insert' else start
+        after = self.textbox.get(after_index, f'{after_index} + 1c')
+        if action == 'insert':
+            self.stats.inserted(text, before, after)
+        else:
+            self.stats.deleted(text, before, after)
+        # While loading, the status bar shows the loader's progress
+        if self.loader is None:
+            schedule_status_bar_update(self.master)
+
+    def add_edit_listener(self, listener):
+        """Register listener(action, start, end, text) for every edit"""
+        self.edit_listeners.append(listener)
+
+    def remove_edit_listener(self, listener):
+        """Stop sending edits to listener"""
+        if listener in self.edit_listeners:
+            self.edit_listeners.remove(listener)
+
+    def on_yscroll(self, first, last):
+        """Move the scrollbar and tell the scroll listeners the view moved"""
+        self.yscrollbar.set(first, last)
+        for listener in self.scroll_listeners:
+            listener(first, last)
+
+    def add_scroll_listener(self, listener):
+        """Register listener(first, last) for every change of the view"""
+        self.scroll_listeners.append(listener)
+
+    def remove_scroll_listener(self, listener):
+        """Stop sending view changes to listener"""
+        if listener in self.scroll_listeners:
+            self.scroll_listeners.remove(listener)
+
+    def open_large_file(self):
+        """Show the file in the memory-mapped, read-only viewer"""
+        # The widget only ever holds a window of the file
+        self.track_edits = False
+        self.encoding = sniff_file(self.file_dir)
+        # The viewer finds lines by their newline bytes
+        encoding = self.encoding if ascii_compatible(self.encoding) \
+            else 'utf-8'
+        self.large_file = LargeFileView(self, self.file_dir, encoding)
+        self.large_file.open()
+
+    def is_read_only(self):
+        """Whether the tab shows a file that cannot be edited or saved"""
+        return self.large_file is not None
+
+    def close(self):
+        """Release resources held by the tab"""
+        self.cancel_loading()
+        self.journal.clear()
+        if self.explain_panel:
+            self.explain_panel.cancel()
+        if self.find_bar and self.find_bar.is_open():
+            self.find_bar.close()
+        if self.highlighter:
+            self.highlighter.detach()
+            self.highlighter = None
+        if self.hibernated is not None:
+            self.hibernated = None
+            self.track_edits = True
+        if self.large_file or self.long_lines:
+            # The widget does not hold the document as it is
+            if self.large_file:
+                self.large_file.close()
+                self.large_file = None
+            if self.long_lines:
+                self.long_lines.detach()
+                self.long_lines = None
+            self.track_edits = False
+            self.textbox.delete('1.0', 'end')
+            self.document.reset()
+            self.lines.reset()
+            self.stats.reset()
+            self.track_edits = True
+
+    def reset(self):
+        """Turn a closed tab into an empty untitled one, with no undo
+           history, so it can be reused
+        """
+        if self.explain_panel:
+            self.explain_panel.destroy()
+            self.explain_panel = None
+        self.track_edits = False
+        self.textbox.delete('1.0', 'end')
+        self.track_edits = True
+        self.textbox.edit_reset()
+        self.textbox.edit_modified(False)
+        self.textbox.xview_moveto(0)
+        self.document.reset()
+        self.lines.reset()
+        self.stats.reset()
+        self.last_edit = (0, '')
+        self.saved_length = 0
+        self.saved_digest = None
+        self.disk_stat = None
+        self.file_dir = None
+        self.file_name = None
+        self.encoding = 'utf-8'
+
+    def cancel_loading(self):
+        """Cancel a file that is still streaming into the tab"""
+        if self.loader:
+            self.loader.cancel()
 
     def create_text_widget(self):
         """Implementations for the text widget"""
         # Horizontal Scroll Bar
         xscrollbar = tk.Scrollbar(self, orient='horizontal')
         xscrollbar.pack(side='bottom', fill='x')
+        self.xscrollbar = xscrollbar
 
         # Vertical Scroll Bar
         yscrollbar = tk.Scrollbar(self)
         yscrollbar.pack(side='right', fill='y')
+        self.yscrollbar = yscrollbar
 
-        # Create Text Editor Box
-        default_font = ('Times New Roman', 12)
-        textbox = tk.Text(self, font=default_font, relief='flat',
-                          borderwidth=0, wrap='none',
+        # Create Text Editor Box; font and wrap are shared by every tab
+        textbox = tk.Text(self, relief='flat', borderwidth=0,
                           bg='white', fg='black',
                           insertbackground='black', selectbackground='#B4D5FF',
                           padx=10, pady=5, spacing1=3, spacing2=3, spacing3=3,
-                          undo=True, autoseparators=True)
+                          undo=True, autoseparators=True,
+                          **get_styles().widget_options(self))
         textbox.config(xscrollcommand=xscrollbar.set,
                        yscrollcommand=yscrollbar.set, undo=True,
                        autoseparators=True)
@@ -69,80 +462,73 @@ class Tab(ttk.Frame):
 
         return textbox
 
+    def apply_style(self):
+        """Pick up view options changed since the tab was last shown"""
+        version = get_styles().apply(self.textbox, self.style_version)
+        if self.large_file and version != self.style_version:
+            self.large_file.restyle()
+        self.style_version = version
+
+    def is_untitled(self):
+        """Whether the tab has never been saved to a file"""
+        return not self.file_dir
+
     def get_file_path(self):
         """Returns the path of the file open in the text editor"""
         return self.file_dir
 
     def explain_with_chatgpt(self, editor):
-        """Function that takes file content as chatgpt prompt and
-        appends the response to the text file
+        """Function that takes the content of the current tab as chatgpt
+           prompt. The request runs off the Tk thread and the response is
+           streamed into a side panel of the tab as it arrives
         """
-        # Get the path of the currently open file in the editor
-        file_path = editor.current_tab().get_file_path()
-
-        # Ensure the file path is not None
-        if os.path.exists(file_path):
-            # Read the content of the file
-            with open(file_path, 'r') as file:
-                file_content = file.read()
-        else:
-            print("No file is open.")
+        tab = editor.current_tab()
+        if tab.is_read_only():
+            print("Large files can't be explained.")
             return
-
-        # Prepare data to send to Node.js script
-        data = {
-            'fileContent': file_content,
-            'filePath': file_path
-            }
-
-        # Execute the Node.js script passing the file content and file path
-        # as arguments
-        path = r"C:\Users\LENOVO\Desktop\PyC-Text-Editor-1\gpt-api\chatgpt.js"
-        process = subprocess.Popen(['node', path, file_content, file_path],
-                                   stdin=subprocess.PIPE,
-                                   stdout=subprocess.PIPE,
-                                   stderr=subprocess.PIPE
-                                   )
-
-        # Send data to the Node.js script
-        process.stdin.write(json.dumps(data).encode())
-        process.stdin.close()
-
-        # Get the response from the Node.js script
-        stdout, stderr = process.communicate()
-
-        # Check if there was an error in executing the Node.js script
-        if stderr:
-            print("Error executing Node.js script:", stderr.decode())
-            return None
-
-        # Process the response from Node.js if needed
-        response_data = stdout.decode().strip()
-        if response_data:
-            open_file(editor)
+        file_content = tab.document.text()
+        if not file_content.strip():
+            print("Nothing to explain.")
+            return
+        if tab.explain_panel is None:
+            tab.explain_panel = ExplainPanel(tab)
+        tab.explain_panel.explain(file_content)
 
 
 class TextEditorBase(ttk.Notebook):
     """Base class TextEditorBase defines basic setup for the GUI"""
-    def __init__(self, *args, **kwargs):
-        """Class construct"""
+    def __init__(self, *args, lazy=False, **kwargs):
+        """Class construct. A lazy editor starts without a tab or icon;
+           run() adds them once the window is on screen
+        """
         super().__init__(*args, **kwargs)
 
         # Initialize the status bar
         self.status_bar = None
+        self.status_after_id = None
 
-        # Add a default tab
-        self.add_tab()
+        # Saves run on a worker thread
+        self.save_engine = SaveEngine(self)
 
-        # Find text editor icon directory and loads it
-        current_dir = os.path.dirname(os.path.abspath(__file__))
-        image_path = os.path.join(current_dir, 'PyC.png')
+        # Unload the content of tabs that are not in use
+        self.hibernator = TabHibernator(self)
+        self.hibernator.start()
+
+        # Follow changes other programs make to the open files
+        self.file_watcher = FileWatcher(self)
+        self.file_watcher.start()
 
-        icon = ImageTk.PhotoImage(Image.open(image_path))
-        self.master.iconphoto(False, icon)
+        # Closed tabs ready to be reused
+        self.tab_pool = []
+
+        if not lazy:
+            # Add a default tab
+            self.add_tab()
+            self.load_icon()
 
         self.enable_traversal()
         self.bind("<B1-Motion>", self.move_tab)
+        self.bind('<<NotebookTabChanged>>', self.on_tab_changed, add='+')
 
         # File types for file dialogs
         self.filetypes = (("Normal text file", "*.txt"), ("all files", "*.*"))
@@ -153,13 +539,32 @@ class TextEditorBase(ttk.Notebook):
         # Counter for untitled files
         self.untitled_count = 1
 
-        # Create right-click context menu
-        self.right_click_menu()
+        # Right-click context menu, built when first used
+        self._right_click_menu = None
+
+    def load_icon(self):
+        """Set the window icon; Tk reads PNG itself, PIL is only a
+           fallback for Tk versions older than 8.6
+        """
+        current_dir = os.path.dirname(os.path.abspath(__file__))
+        image_path = os.path.join(current_dir, 'PyC.png')
+        try:
+            self.icon = tk.PhotoImage(master=self, file=image_path)
+        except tk.TclError:
+            from PIL import Image, ImageTk
+            self.icon = ImageTk.PhotoImage(Image.open(image_path),
+                                           master=self)
+        self.master.iconphoto(False, self.icon)
 
     def current_tab(self):
         """Get the object of the current tab"""
         return self.nametowidget(self.select())
 
+    def on_tab_changed(self, event=None):
+        """Bring the selected tab up to the current view options"""
+        if self.select():
+            self.current_tab().apply_style()
+
     def indexed_tab(self, index):
         """Get the index of the current tab"""
         return self.nametowidget(self.tabs()[index])
@@ -182,29 +587,52 @@ class TextEditorBase(ttk.Notebook):
     def add_tab(self):
         """Add a new tab to the Notebook"""
         # Create initial tab with text 'Untitled'
-        initial_tab = Tab(self, FileDir='Untitled')
+        if self.tab_pool:
+            initial_tab = self.tab_pool.pop()
+            # View options may have changed while it was closed
+            initial_tab.apply_style()
+        else:
+            initial_tab = Tab(self)
         self.add(initial_tab, text='Untitled')
 
         # Create 'Add' tab with text '+'
         # add_tab = Tab(self, FileDir='f')
         # self.add(add_tab, text=' + ')
 
+    def release_tab(self, tab):
+        """Remove a tab from the notebook, keeping it for reuse while
+           the pool has room and destroying it otherwise
+        """
+        self.hibernator.forget(tab)
+        tab.close()
+        self.forget(tab)
+        # A save in flight still reports to the tab it was started from
+        saving = tab.file_dir and \
+            os.path.realpath(tab.file_dir) in self.save_engine.pending
+        if len(self.tab_pool) < TAB_POOL_SIZE and not saving:
+            tab.reset()
+            self.tab_pool.append(tab)
+        else:
+            tab.destroy()
+
+    @property
     def right_click_menu(self):
         """Commands for right click menu"""
-        current_tab = self.current_tab()
-        self.right_click_menu = tk.Menu(self, tearoff=0)
-        self.right_click_menu.add_command(label="Undo", command=self.undo_text)
-        self.right_click_menu.add_separator()
-        self.right_click_menu.add_command(label="Copy", command=self.copy_text)
-        self.right_click_menu.add_command(label="Cut", command=self.cut_text)
-        self.right_click_menu.add_command(
-            label="Paste", command=self.paste_text)
-        self.right_click_menu.add_command(
-            label="Delete", command=self.delete_text)
-        self.right_click_menu.add_separator()
-        self.right_click_menu.add_command(
+        if self._right_click_menu is not None:
+            return self._right_click_menu
+        menu = tk.Menu(self, tearoff=0)
+        menu.add_command(label="Undo", command=self.undo_text)
+        menu.add_separator()
+        menu.add_command(label="Copy", command=self.copy_text)
+        menu.add_command(label="Cut", command=self.cut_text)
+        menu.add_command(label="Paste", command=self.paste_text)
+        menu.add_command(label="Delete", command=self.delete_text)
+        menu.add_separator()
+        menu.add_command(
             label="Explain with chatgpt",
-            command=lambda tab=current_tab: tab.explain_with_chatgpt(self))
+            command=lambda: self.current_tab().explain_with_chatgpt(self))
+        self._right_click_menu = menu
+        return menu
 
     def undo_text(self):
         """Function to undo text"""
@@ -227,25 +655,73 @@ class TextEditorBase(ttk.Notebook):
         self.current_tab().textbox.delete(tk.SEL_FIRST, tk.SEL_LAST)
 
 
+def finish_startup(root, editor, timer):
+    """Work left until the window is on screen"""
+    editor.add_tab()
+    timer.mark('tab')
+
+    # Bring back unsaved tabs of an editor that crashed
+    recovered, kept = recover_tabs(editor)
+    if recovered:
+        editor.select(recovered[0])
+    if kept:
+        messagebox.showwarning(
+            "Recovery incomplete",
+            "Some unsaved edits could not be recovered exactly. What "
+            "could be recovered is in untitled tabs; check it before "
+            "saving. The journals are kept in:\n" + "\n".join(kept))
+    timer.mark('recovery')
+
+    create_menu(root, editor)
+
+    # Initialize status bar
+    editor.status_bar = create_status_bar(editor)
+
+    bind_right_click(editor)
+    timer.mark('menus')
+
+    editor.load_icon()
+    timer.mark('icon')
+    timer.report()
+
+
 def run():
     """Run the windows"""
+    timer = StartupTimer()
+    timer.mark('imports')
+    if diagnostics_enabled():
+        # Before any widget registers a callback
+        get_diagnostics().install()
     root = tk.Tk()
     root.title('PyC Text Editor')
     root.geometry('1500x600')
     root.resizable(1, 1)
 
     # Notebook widget to manage multiple tabs
-    editor = TextEditorBase(root)
+    editor = TextEditorBase(root, lazy=True)
     editor.pack(fill="both", expand=True)
+    editor.startup = timer
 
-    create_menu(root, editor)
+    # Show the empty window before building tabs and menus
+    root.update()
+    timer.mark('window')
+    root.after_idle(finish_startup, root, editor, timer)
+    if diagnostics_enabled():
+        get_diagnostics().start_heartbeat(root)
 
-    # Initialize status bar
-    editor.status_bar = create_status_bar(editor)
+    root.mainloop()
 
-    bind_right_click(editor)
+    dump_path = os.environ.get(DUMP_VARIABLE)
+    if diagnostics_enabled() and dump_path:
+        get_diagnostics().dump(dump_path)
 
-    root.mainloop()
+    # Stop the background explain worker, if one was started
+    get_worker().close()
+
+    editor.file_watcher.close()
+
+    # Finish the journal writes still queued
+    get_journal_writer().close()
 
 
 if __name__ == "__main__":
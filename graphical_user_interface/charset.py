@@ -0,0 +1,117 @@
+#!/usr/bin/env python3
+"""Module to guess the encoding of a file from its first bytes"""
+
+import codecs
+import io
+
+# Bytes read to guess the encoding
+SNIFF_SIZE = 8 * 1024
+
+# Byte order marks, longest first since the UTF-32 LE mark starts with
+# the UTF-16 LE one; the codecs named strip the mark when decoding and
+# write it back when encoding
+BOMS = (
+    (codecs.BOM_UTF32_LE, 'utf-32'),
+    (codecs.BOM_UTF32_BE, 'utf-32'),
+    (codecs.BOM_UTF8, 'utf-8-sig'),
+    (codecs.BOM_UTF16_LE, 'utf-16'),
+    (codecs.BOM_UTF16_BE, 'utf-16'),
+)
+
+# Encoding of files that are not valid UTF-8; every byte decodes
+FALLBACK = 'cp1252'
+
+
+# Codecs writing the same bytes as the BOM-writing ones, minus the mark
+BOMLESS = {'utf-8-sig': 'utf-8', 'utf-16': 'utf-16-le', 'utf-32': 'utf-32-le'}
+
+
+def has_bom(encoding):
+    """Whether the encoding writes a byte order mark"""
+    return encoding in ('utf-8-sig', 'utf-16', 'utf-32')
+
+
+def ascii_compatible(encoding):
+    """Whether a newline is the byte 0x0A wherever it appears"""
+    return not encoding.startswith(('utf-16', 'utf-32'))
+
+
+def bom_size(encoding):
+    """Bytes of the byte order mark the encoding writes"""
+    if not has_bom(encoding):
+        return 0
+    return len(''.encode(encoding))
+
+
+def byte_length(text, encoding='utf-8'):
+    """Bytes text takes in a file written in encoding, not counting the
+       byte order mark
+    """
+    if ascii_compatible(encoding) and text.isascii():
+        return len(text)
+    codec = BOMLESS.get(encoding, encoding)
+    errors = 'surrogatepass' if codec.startswith('utf') else 'replace'
+    return len(text.encode(codec, errors))
+
+
+def fitting_chars(text, size, encoding='utf-8'):
+    """Characters at the start of text that take at most size bytes in
+       encoding
+    """
+    low, high = 0, len(text)
+    while low < high:
+        middle = (low + high + 1) // 2
+        if byte_length(text[:middle], encoding) <= size:
+            low = middle
+        else:
+            high = middle - 1
+    return low
+
+
+def sniff(data):
+    """Encoding of a file starting with data: a BOM decides, then UTF-16
+       without BOM given away by zero bytes in every other position,
+       then valid UTF-8 (a sequence cut off at the end of data is fine),
+       then the Windows Latin-1 superset
+    """
+    for bom, encoding in BOMS:
+        if data.startswith(bom):
+            return encoding
+    sample = data[:len(data) & ~1]
+    if sample:
+        pairs = len(sample) // 2
+        if sample[1::2].count(0) > pairs * 0.4 and not sample[0::2].count(0):
+            return 'utf-16-le'
+        if sample[0::2].count(0) > pairs * 0.4 and not sample[1::2].count(0):
+            return 'utf-16-be'
+    try:
+        codecs.getincrementaldecoder('utf-8')().decode(data, final=False)
+        return 'utf-8'
+    except UnicodeDecodeError:
+        pass
+    try:
+        data.decode(FALLBACK)
+        return FALLBACK
+    except UnicodeDecodeError:
+        return 'latin-1'
+
+
+def fallback(encoding):
+    """Encoding to decode with when data turns out not to be valid in
+       encoding; Latin-1 takes any bytes and writes them back unchanged
+    """
+    return 'latin-1' if encoding == FALLBACK else FALLBACK
+
+
+def sniff_file(path):
+    """Encoding of the file at path"""
+    with open(path, 'rb') as file:
+        return sniff(file.read(SNIFF_SIZE))
+
+
+def text_decoder(encoding, errors='replace'):
+    """Incremental decoder of the encoding that turns every newline
+       convention into \\n, as reading the file in text mode would
+    """
+    decoder = codecs.getincrementaldecoder(encoding)(errors=errors)
+    return io.IncrementalNewlineDecoder(decoder, translate=True)
@@ -0,0 +1,280 @@
+#!/usr/bin/env python3
+"""Module to time Tk callbacks and detect stalls of the event loop.
+   Off unless PYC_DIAGNOSTICS is set in the environment
+"""
+
+from collections import deque
+import json
+import os
+import time
+import tkinter as tk
+from tkinter import filedialog, ttk
+
+# Set to instrument the editor; set PYC_DIAGNOSTICS_DUMP to a path to
+# also write the data there on exit
+ENABLE_VARIABLE = 'PYC_DIAGNOSTICS'
+DUMP_VARIABLE = 'PYC_DIAGNOSTICS_DUMP'
+
+# Upper bounds of the duration histogram buckets (ms); the last bucket
+# holds everything slower
+BUCKETS = (1, 2, 4, 8, 16, 32, 64, 128, 256, 512, 1024)
+
+# The heartbeat timer fires this often (ms)
+HEARTBEAT_INTERVAL = 50
+
+# A heartbeat this late means the event loop was blocked (ms)
+STALL_THRESHOLD = 100
+
+# Stalls kept for the diagnostics window
+MAX_STALLS = 200
+
+
+def callback_name(func):
+    """Readable name of a callback: module and qualified name, with the
+       line for lambdas, and the scheduled function for after() calls
+    """
+    func = getattr(func, '__func__', func)
+    if getattr(func, '__qualname__', '').endswith('after.<locals>.callit'):
+        # Misc.after wraps the function it schedules
+        for cell in func.__closure__ or ():
+            try:
+                contents = cell.cell_contents
+            except ValueError:
+                continue
+            if callable(contents) and not isinstance(contents, tk.Misc):
+                return 'after: ' + callback_name(contents)
+    code = getattr(func, '__code__', None)
+    name = getattr(func, '__qualname__', None) or type(func).__qualname__
+    module = getattr(func, '__module__', None) or type(func).__module__
+    if code is not None and '<lambda>' in name:
+        return f"{module}.{name}:{code.co_firstlineno}"
+    return f"{module}.{name}"
+
+
+class CallbackStats:
+    """Call count and duration histogram of one callback"""
+    def __init__(self, name):
+        self.name = name
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+        self.buckets = [0] * (len(BUCKETS) + 1)
+
+    def add(self, seconds):
+        """Record one call"""
+        self.count += 1
+        self.total += seconds
+        self.max = max(self.max, seconds)
+        milliseconds = seconds * 1000
+        for index, bound in enumerate(BUCKETS):
+            if milliseconds <= bound:
+                self.buckets[index] += 1
+                return
+        self.buckets[-1] += 1
+
+    def as_dict(self):
+        """JSON-friendly form"""
+        return {
+            'name': self.name,
+            'count': self.count,
+            'total_ms': self.total * 1000,
+            'mean_ms': self.total * 1000 / self.count if self.count else 0,
+            'max_ms': self.max * 1000,
+            'histogram': dict(zip([f"<={bound}ms" for bound in BUCKETS] +
+                                  [f">{BUCKETS[-1]}ms"], self.buckets))
+        }
+
+
+class Diagnostics:
+    """Wraps every Python callback Tk registers (commands, bindings,
+       after() calls) to time it, and runs a heartbeat timer whose
+       lateness shows how long the event loop was blocked
+    """
+    def __init__(self):
+        self.callbacks = {}
+        self.stalls = deque(maxlen=MAX_STALLS)
+        self.heartbeats = 0
+        self.worst_lateness = 0.0
+        self._original_register = None
+        self._slowest = (0.0, None)   # slowest callback since last beat
+        self._widget = None
+        self._expected = None
+
+    @property
+    def installed(self):
+        """Whether callbacks are being timed"""
+        return self._original_register is not None
+
+    def install(self):
+        """Time every callback registered from now on"""
+        if self.installed:
+            return
+        original = tk.Misc._register
+        diagnostics = self
+
+        def _register(widget, func, subst=None, needcleanup=1):
+            return original(widget, diagnostics.wrap(func), subst,
+                            needcleanup)
+        self._original_register = original
+        tk.Misc._register = _register
+
+    def uninstall(self):
+        """Stop wrapping new callbacks"""
+        if self.installed:
+            tk.Misc._register = self._original_register
+            self._original_register = None
+
+    def wrap(self, func):
+        """Timed version of a callback"""
+        name = callback_name(func)
+        stats = self.callbacks.get(name)
+        if stats is None:
+            stats = self.callbacks[name] = CallbackStats(name)
+
+        def timed(*args):
+            started = time.perf_counter()
+            try:
+                return func(*args)
+            finally:
+                seconds = time.perf_counter() - started
+                stats.add(seconds)
+                if seconds > self._slowest[0]:
+                    self._slowest = (seconds, name)
+        # Tk uses the name in the Tcl command it creates
+        timed.__name__ = getattr(func, '__name__', type(func).__name__)
+        return timed
+
+    def start_heartbeat(self, widget):
+        """Start watching the event loop of widget's interpreter"""
+        self._widget = widget
+        self._expected = time.perf_counter() + HEARTBEAT_INTERVAL / 1000
+        widget.after(HEARTBEAT_INTERVAL, self._beat)
+
+    def _beat(self):
+        """Record how late the timer fired and schedule the next one"""
+        now = time.perf_counter()
+        lateness = now - self._expected
+        self.heartbeats += 1
+        self.worst_lateness = max(self.worst_lateness, lateness)
+        if lateness * 1000 >= STALL_THRESHOLD:
+            seconds, culprit = self._slowest
+            self.stalls.append({
+                'time': time.time(),
+                'blocked_ms': lateness * 1000,
+                'slowest_callback': culprit,
+                'slowest_ms': seconds * 1000
+            })
+        self._slowest = (0.0, None)
+        try:
+            self._expected = time.perf_counter() + HEARTBEAT_INTERVAL / 1000
+            self._widget.after(HEARTBEAT_INTERVAL, self._beat)
+        except tk.TclError:
+            pass  # The window is gone
+
+    def reset(self):
+        """Forget everything recorded so far"""
+        for name in self.callbacks:
+            self.callbacks[name].__init__(name)
+        self.stalls.clear()
+        self.heartbeats = 0
+        self.worst_lateness = 0.0
+
+    def as_dict(self):
+        """Everything recorded, slowest callbacks first"""
+        callbacks = sorted((stats for stats in self.callbacks.values()
+                            if stats.count),
+                           key=lambda stats: stats.total, reverse=True)
+        return {
+            'callbacks': [stats.as_dict() for stats in callbacks],
+            'stalls': list(self.stalls),
+            'heartbeat': {
+                'interval_ms': HEARTBEAT_INTERVAL,
+                'beats': self.heartbeats,
+                'worst_lateness_ms': self.worst_lateness * 1000
+            }
+        }
+
+    def dump(self, path):
+        """Write everything recorded to a JSON file"""
+        with open(path, 'w', encoding='utf-8') as file:
+            json.dump(self.as_dict(), file, indent=2)
+
+
+class DiagnosticsWindow(tk.Toplevel):
+    """Window listing callback timings and event loop stalls"""
+    COLUMNS = ('count', 'total_ms', 'mean_ms', 'max_ms')
+
+    def __init__(self, master, diagnostics):
+        tk.Toplevel.__init__(self, master)
+        self.title("Diagnostics")
+        self.diagnostics = diagnostics
+
+        buttons = ttk.Frame(self)
+        buttons.pack(side='bottom', fill='x')
+        ttk.Button(buttons, text='Refresh', command=self.refresh).pack(
+            side='left')
+        ttk.Button(buttons, text='Reset', command=self.reset).pack(
+            side='left')
+        ttk.Button(buttons, text='Save JSON...', command=self.save).pack(
+            side='left')
+        self.summary = ttk.Label(buttons, text='')
+        self.summary.pack(side='right', padx=5)
+
+        self.table = ttk.Treeview(self, columns=self.COLUMNS, height=15)
+        self.table.heading('#0', text='Callback')
+        self.table.column('#0', width=420)
+        for column in self.COLUMNS:
+            self.table.heading(column, text=column)
+            self.table.column(column, width=80, anchor='e')
+        self.table.pack(fill='both', expand=True)
+
+        self.stall_list = tk.Listbox(self, height=6)
+        self.stall_list.pack(fill='x')
+        self.refresh()
+
+    def refresh(self):
+        """Show the current numbers"""
+        data = self.diagnostics.as_dict()
+        self.table.delete(*self.table.get_children())
+        for stats in data['callbacks']:
+            self.table.insert('', 'end', text=stats['name'], values=(
+                stats['count'], f"{stats['total_ms']:.1f}",
+                f"{stats['mean_ms']:.2f}", f"{stats['max_ms']:.1f}"))
+        self.stall_list.delete(0, 'end')
+        for stall in reversed(data['stalls']):
+            self.stall_list.insert('end', (
+                f"{time.strftime('%H:%M:%S', time.localtime(stall['time']))}"
+                f"  blocked {stall['blocked_ms']:.0f} ms, slowest "
+                f"{stall['slowest_callback']} ({stall['slowest_ms']:.0f} ms)"))
+        heartbeat = data['heartbeat']
+        self.summary.config(
+            text=f"{len(data['stalls'])} stalls, worst "
+            f"{heartbeat['worst_lateness_ms']:.0f} ms")
+
+    def reset(self):
+        """Clear the recorded data"""
+        self.diagnostics.reset()
+        self.refresh()
+
+    def save(self):
+        """Dump the data to a JSON file"""
+        path = filedialog.asksaveasfilename(defaultextension='.json',
+                                            parent=self)
+        if path:
+            self.diagnostics.dump(path)
+
+
+_diagnostics = None
+
+
+def get_diagnostics():
+    """The diagnostics shared by the whole editor"""
+    global _diagnostics
+    if _diagnostics is None:
+        _diagnostics = Diagnostics()
+    return _diagnostics
+
+
+def diagnostics_enabled():
+    """Whether diagnostics were asked for"""
+    return bool(os.environ.get(ENABLE_VARIABLE))
@@ -0,0 +1,380 @@
+#!/usr/bin/env python3
+"""Module to run "Explain with ChatGPT" requests off the Tk thread"""
+
+import queue
+import tkinter as tk
+from tkinter import ttk
+from node_worker import get_worker
+from explain_cache import cache_key, get_cache, MODEL
+
+# How often the Tk thread picks up streamed tokens (ms)
+POLL_INTERVAL = 30
+
+# Token budget of one request, leaving room in the context for the answer
+CHUNK_TOKENS = 3000
+
+# Rough size of a token, used to turn the budget into characters
+CHARS_PER_TOKEN = 4
+
+# Chunk requests in flight at the same time
+CONCURRENCY = 4
+
+MAP_PROMPT = "This is part {part} of {total} of a file. Explain what this " \
+    "part does; the explanations of all parts will be merged later.\n\n" \
+    "{content}"
+REDUCE_PROMPT = "These are explanations of consecutive parts of one " \
+    "file. Merge them into a single explanation of the whole file.\n\n" \
+    "{content}"
+
+
+def explain_key(content, max_tokens=CHUNK_TOKENS):
+    """Cache key of the explanation of content: the prompts and the
+       chunking decide what is asked, so they are part of it
+    """
+    return cache_key(content, MODEL, (MAP_PROMPT, REDUCE_PROMPT,
+                                      str(max_tokens), str(CHARS_PER_TOKEN)))
+
+
+def estimate_tokens(text):
+    """Approximate number of tokens in text"""
+    return len(text) // CHARS_PER_TOKEN + 1
+
+
+def _paragraphs(text):
+    """Paragraphs of text, each ending with the blank line after it"""
+    paragraph = []
+    for line in text.splitlines(keepends=True):
+        paragraph.append(line)
+        if not line.strip():
+            yield ''.join(paragraph)
+            paragraph = []
+    if paragraph:
+        yield ''.join(paragraph)
+
+
+def _pieces(text, limit):
+    """Paragraphs, or the lines of paragraphs over limit, or slices of
+       lines over limit
+    """
+    for paragraph in _paragraphs(text):
+        if len(paragraph) <= limit:
+            yield paragraph
+            continue
+        for line in paragraph.splitlines(keepends=True):
+            for start in range(0, len(line), limit):
+                yield line[start:start + limit]
+
+
+def split_for_budget(text, max_tokens=CHUNK_TOKENS):
+    """Split text on paragraph or line boundaries into chunks that fit
+       the token budget; joined together they give back text
+    """
+    limit = max_tokens * CHARS_PER_TOKEN
+    if len(text) <= limit:
+        return [text]
+    chunks = []
+    current = []
+    size = 0
+    for piece in _pieces(text, limit):
+        if current and size + len(piece) > limit:
+            chunks.append(''.join(current))
+            current = []
+            size = 0
+        current.append(piece)
+        size += len(piece)
+    if current:
+        chunks.append(''.join(current))
+    return chunks
+
+
+class ExplainRequest:
+    """Sends an explain request to the shared node worker and streams the
+       response back to the Tk thread, where on_token(text) is called for
+       every piece of the answer and on_done(error) once it has finished
+    """
+    def __init__(self, widget, file_content, on_token=None, on_done=None,
+                 worker=None):
+        self.widget = widget
+        self.file_content = file_content
+        self.on_token = on_token
+        self.on_done = on_done
+        self.worker = worker or get_worker()
+        self.events = queue.Queue()
+        self.request_id = None
+        self.cancelled = False
+        self.finished = False
+        self._after_id = None
+
+    def start(self):
+        """Start the request"""
+        self.request_id = self.worker.request(
+            {'fileContent': self.file_content, 'model': MODEL},
+            self.on_message)
+        self._after_id = self.widget.after(POLL_INTERVAL, self._poll)
+
+    def on_message(self, message):
+        """Worker reader thread: queue a response message"""
+        if 'token' in message:
+            self.events.put(('token', message['token']))
+        elif 'error' in message:
+            self.events.put(('done', message['error']))
+        elif message.get('done'):
+            self.events.put(('done', None))
+
+    def _poll(self):
+        """Tk thread: deliver whatever the worker has produced"""
+        self._after_id = None
+        while True:
+            try:
+                kind, value = self.events.get_nowait()
+            except queue.Empty:
+                break
+            if self.cancelled:
+                continue
+            if kind == 'token' and self.on_token:
+                self.on_token(value)
+            elif kind == 'done':
+                self._finish(value)
+                return
+        if not self.finished:
+            self._after_id = self.widget.after(POLL_INTERVAL, self._poll)
+
+    def _finish(self, error):
+        """Report the end of the request once"""
+        if self.finished:
+            return
+        self.finished = True
+        if self.on_done:
+            self.on_done(error)
+
+    def cancel(self):
+        """Stop the request"""
+        if self.finished:
+            return
+        self.cancelled = True
+        if self.request_id is not None:
+            self.worker.cancel(self.request_id)
+        if self._after_id is not None:
+            self.widget.after_cancel(self._after_id)
+            self._after_id = None
+        self._finish('Cancelled')
+
+
+class MapReduceExplain:
+    """Explains content too large for one request: the chunks are
+       explained concurrently (at most concurrency at a time), then the
+       partial answers are merged by a final request that is streamed
+       to on_token. Has the same interface as ExplainRequest
+    """
+    def __init__(self, widget, file_content, on_token=None, on_done=None,
+                 on_progress=None, worker=None, max_tokens=CHUNK_TOKENS,
+                 concurrency=CONCURRENCY):
+        self.widget = widget
+        self.file_content = file_content
+        self.on_token = on_token
+        self.on_done = on_done
+        self.on_progress = on_progress
+        self.worker = worker
+        self.max_tokens = max_tokens
+        self.concurrency = concurrency
+        self.active = set()
+        self.finished = False
+
+    def start(self):
+        """Start the request"""
+        chunks = split_for_budget(self.file_content, self.max_tokens)
+        if len(chunks) == 1:
+            self._final(self.file_content)
+            return
+        prompts = [MAP_PROMPT.format(part=i + 1, total=len(chunks),
+                                     content=chunk)
+                   for i, chunk in enumerate(chunks)]
+        self._run_stage(prompts, self._reduce)
+
+    def _request(self, prompt, on_token, on_done):
+        """Start one request on the shared worker"""
+        request = ExplainRequest(self.widget, prompt, on_token=on_token,
+                                 on_done=on_done, worker=self.worker)
+        self.active.add(request)
+        request.start()
+        return request
+
+    def _run_stage(self, prompts, then):
+        """Explain every prompt, then call then(answers) in prompt order"""
+        waiting = list(enumerate(prompts))
+        answers = [None] * len(prompts)
+        tokens = [[] for _ in prompts]
+        done = []
+
+        def launch():
+            index, prompt = waiting.pop(0)
+            holder = []
+
+            def finished(error):
+                self.active.discard(holder[0])
+                if self.finished:
+                    return
+                if error:
+                    self._fail(error)
+                    return
+                answers[index] = ''.join(tokens[index])
+                done.append(index)
+                if self.on_progress:
+                    self.on_progress(len(done), len(prompts))
+                if waiting:
+                    launch()
+                elif len(done) == len(prompts):
+                    then(answers)
+            holder.append(self._request(prompt, tokens[index].append,
+                                        finished))
+
+        for _ in range(min(self.concurrency, len(waiting))):
+            launch()
+
+    def _reduce(self, answers):
+        """Merge partial answers, in several rounds if they don't fit"""
+        parts = [f"Part {i + 1}:\n{answer}\n\n"
+                 for i, answer in enumerate(answers)]
+        combined = ''.join(parts)
+        if estimate_tokens(combined) <= self.max_tokens:
+            self._final(REDUCE_PROMPT.format(content=combined))
+            return
+        groups = split_for_budget(combined, self.max_tokens)
+        if len(groups) >= len(answers):
+            # Merging further would not shrink anything
+            self._final(REDUCE_PROMPT.format(content=combined))
+            return
+        self._run_stage([REDUCE_PROMPT.format(content=group)
+                         for group in groups], self._reduce)
+
+    def _final(self, prompt):
+        """Stream the last request to the caller"""
+        holder = []
+
+        def finished(error):
+            self.active.discard(holder[0])
+            self._finish(error)
+        holder.append(self._request(prompt, self.on_token, finished))
+
+    def _finish(self, error):
+        """Stop whatever is still running and report the end once"""
+        if self.finished:
+            return
+        self.finished = True
+        for request in list(self.active):
+            request.cancel()
+        self.active.clear()
+        if self.on_done:
+            self.on_done(error)
+
+    def _fail(self, error):
+        """One chunk failed: the whole explanation fails"""
+        self._finish(error)
+
+    def cancel(self):
+        """Stop every request in flight"""
+        self._finish('Cancelled')
+
+
+class ExplainPanel(ttk.Frame):
+    """Side panel of a Tab showing a streamed explanation"""
+    def __init__(self, tab):
+        ttk.Frame.__init__(self, tab)
+        self.tab = tab
+        self.request = None
+        self.response = []
+        self.cache_key = None
+
+        buttons = ttk.Frame(self)
+        buttons.pack(side='bottom', fill='x')
+        self.status = ttk.Label(buttons, text='')
+        self.status.pack(side='left', padx=5)
+        ttk.Button(buttons, text='Close', command=self.close).pack(
+            side='right')
+        self.cancel_button = ttk.Button(buttons, text='Cancel',
+                                        command=self.cancel)
+        self.cancel_button.pack(side='right')
+        self.append_button = ttk.Button(buttons, text='Append to document',
+                                        command=self.append_to_document)
+        self.append_button.pack(side='right')
+
+        self.text = tk.Text(self, width=60, wrap='word', relief='flat',
+                            bg='#F7F7F7', padx=10, pady=5, state='disabled')
+        self.text.pack(fill='both', expand=True)
+
+    def show(self):
+        """Dock the panel on the right of the tab's text widget"""
+        if not self.winfo_ismapped():
+            self.pack(side='right', fill='y', before=self.tab.textbox)
+
+    def explain(self, file_content):
+        """Start a new explanation, replacing any previous one. Content
+           explained before is answered from the cache
+        """
+        self.cancel()
+        self.response = []
+        self.text.config(state='normal')
+        self.text.delete('1.0', 'end')
+        self.text.config(state='disabled')
+        self.append_button.state(['disabled'])
+        self.show()
+
+        self.cache_key = explain_key(file_content)
+        cache = get_cache()
+        cached = cache.get(self.cache_key)
+        if cached is not None:
+            self.add_token(cached)
+            self.cancel_button.state(['disabled'])
+            self.append_button.state(['!disabled'])
+            stats = cache.stats()
+            self.status.config(text=f"Cached (hits: {stats['hits']}, "
+                               f"misses: {stats['misses']})")
+            return
+
+        self.status.config(text='Waiting for ChatGPT...')
+        self.cancel_button.state(['!disabled'])
+        self.request = MapReduceExplain(self, file_content,
+                                        on_token=self.add_token,
+                                        on_done=self.on_done,
+                                        on_progress=self.on_progress)
+        self.request.start()
+
+    def on_progress(self, done, total):
+        """Report how many chunks of a large file have been explained"""
+        self.status.config(text=f"Explained {done} of {total} parts...")
+
+    def add_token(self, token):
+        """Append a streamed piece of the answer"""
+        self.response.append(token)
+        self.text.config(state='normal')
+        self.text.insert('end', token)
+        self.text.config(state='disabled')
+        self.text.see('end')
+        self.status.config(text='Receiving...')
+
+    def on_done(self, error):
+        """The request finished, failed or was cancelled"""
+        self.request = None
+        self.cancel_button.state(['disabled'])
+        if error:
+            self.status.config(text=error.splitlines()[-1][:80])
+        else:
+            self.status.config(text='Done')
+            self.append_button.state(['!disabled'])
+            get_cache().put(self.cache_key, ''.join(self.response))
+
+    def cancel(self):
+        """Cancel the running request"""
+        if self.request:
+            self.request.cancel()
+
+    def append_to_document(self):
+        """Append the answer to the document, as the old workflow did"""
+        self.tab.textbox.insert(
+            'end', "\nChatGPT Response:\n" + ''.join(self.response) +
+            "\n\nUser Response\n")
+
+    def close(self):
+        """Cancel any request and hide the panel"""
+        self.cancel()
+        self.pack_forget()
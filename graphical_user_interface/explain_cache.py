@@ -0,0 +1,160 @@
+#!/usr/bin/env python3
+"""Module to cache ChatGPT explanations by the content they explain"""
+
+from collections import OrderedDict
+from hashlib import sha256
+import os
+import tempfile
+import threading
+
+# Model used by chatgpt.js; part of the key
+MODEL = 'gpt-3.5-turbo'
+
+CACHE_DIR = os.path.join(os.path.expanduser('~'), '.pyc_editor',
+                         'explain_cache')
+
+# Size cap of the on-disk tier (bytes)
+MAX_DISK_BYTES = 64 * 1024 * 1024
+
+# Responses kept in the in-memory hot tier
+MEMORY_ENTRIES = 64
+
+
+def cache_key(content, model=MODEL, settings=()):
+    """Content address of an explain request; settings are the strings
+       (prompt templates, chunk size...) that shape the requests sent
+    """
+    hasher = sha256()
+    for part in (model, *settings, content):
+        hasher.update(part.encode('utf-8', 'surrogatepass'))
+        hasher.update(b'\0')
+    return hasher.hexdigest()
+
+
+class ExplainCache:
+    """Two-tier LRU cache of responses: an in-memory dict of recent
+       entries in front of a directory of files whose modification time
+       records when they were last used
+    """
+    def __init__(self, directory=CACHE_DIR, max_bytes=MAX_DISK_BYTES,
+                 memory_entries=MEMORY_ENTRIES):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.memory_entries = memory_entries
+        self.memory = OrderedDict()
+        self.lock = threading.Lock()
+        self.disk_bytes = None  # measured on first write
+        self.memory_hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+
+    def _path(self, key):
+        return os.path.join(self.directory, key[:2], key)
+
+    def _remember(self, key, response):
+        """Add to the hot tier, dropping its least recently used entry"""
+        self.memory[key] = response
+        self.memory.move_to_end(key)
+        while len(self.memory) > self.memory_entries:
+            self.memory.popitem(last=False)
+
+    def get(self, key):
+        """Cached response for key, or None"""
+        with self.lock:
+            if key in self.memory:
+                self.memory.move_to_end(key)
+                self.memory_hits += 1
+                return self.memory[key]
+            path = self._path(key)
+            try:
+                with open(path, 'r', encoding='utf-8') as file:
+                    response = file.read()
+                os.utime(path)  # Mark as recently used
+            except OSError:
+                self.misses += 1
+                return None
+            self.disk_hits += 1
+            self._remember(key, response)
+            return response
+
+    def put(self, key, response):
+        """Store a response in both tiers; when the disk cannot take it
+           the response stays in memory only
+        """
+        with self.lock:
+            self._remember(key, response)
+            try:
+                self._write(key, response.encode('utf-8'))
+            except OSError as error:
+                print(f"Explain cache write failed: {error}")
+
+    def _write(self, key, data):
+        """Store data in the disk tier"""
+        path = self._path(key)
+        if self.disk_bytes is None:
+            self.disk_bytes = self._measure()
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        fd, temp_path = tempfile.mkstemp(dir=os.path.dirname(path))
+        try:
+            with os.fdopen(fd, 'wb') as file:
+                file.write(data)
+            old = os.path.getsize(path) if os.path.exists(path) else 0
+            os.replace(temp_path, path)
+        except BaseException:
+            if os.path.exists(temp_path):
+                os.remove(temp_path)
+            raise
+        self.disk_bytes += len(data) - old
+        if self.disk_bytes > self.max_bytes:
+            self._evict()
+
+    def _entries(self):
+        """(mtime, size, path) of every file on disk"""
+        entries = []
+        for root, _, files in os.walk(self.directory):
+            for name in files:
+                path = os.path.join(root, name)
+                try:
+                    stat = os.stat(path)
+                except OSError:
+                    continue
+                entries.append((stat.st_mtime, stat.st_size, path))
+        return entries
+
+    def _measure(self):
+        """Bytes used on disk"""
+        return sum(size for _, size, _ in self._entries())
+
+    def _evict(self):
+        """Remove least recently used files until under the size cap"""
+        for _, size, path in sorted(self._entries()):
+            if self.disk_bytes <= self.max_bytes:
+                break
+            try:
+                os.remove(path)
+            except OSError:
+                continue
+            self.disk_bytes -= size
+            self.memory.pop(os.path.basename(path), None)
+
+    def stats(self):
+        """Hit and miss counters"""
+        return {
+            'memory_hits': self.memory_hits,
+            'disk_hits': self.disk_hits,
+            'hits': self.memory_hits + self.disk_hits,
+            'misses': self.misses,
+            'memory_entries': len(self.memory),
+            'disk_bytes': self.disk_bytes
+        }
+
+
+_cache = None
+
+
+def get_cache():
+    """The cache shared by every tab"""
+    global _cache
+    if _cache is None:
+        _cache = ExplainCache()
+    return _cache
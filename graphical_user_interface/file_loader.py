@@ -0,0 +1,151 @@
+#!/usr/bin/env python3
+"""Module to stream files into a tab's text widget in chunks"""
+
+import os
+from charset import fallback, sniff, text_decoder, SNIFF_SIZE
+
+# Number of bytes read and inserted into the text widget per after() tick
+CHUNK_SIZE = 256 * 1024
+
+# Files up to this size (in bytes) are loaded in one go
+SYNC_LIMIT = CHUNK_SIZE
+
+
+class ChunkedLoader:
+    """Feeds a file into a Tab's text widget over successive after() ticks
+       so the Tk mainloop stays responsive while large files stream in.
+       The encoding is guessed from the first bytes and the rest is
+       decoded chunk by chunk as it is read. Bytes the guess cannot
+       decode start the load over in the fallback encoding: replacement
+       characters would be written back over them on save
+    """
+    def __init__(self, tab, file_path, on_done=None, chunk_size=CHUNK_SIZE):
+        self.tab = tab
+        self.file_path = file_path
+        self.on_done = on_done
+        self.chunk_size = chunk_size
+        self.file = None
+        self.encoding = None
+        self.decoder = None
+        self.total = 0
+        self.loaded = 0
+        self.done = False
+        self.cancelled = False
+        self._after_id = None
+        self._escape_binding = None
+
+    def start(self):
+        """Start loading; small files are inserted synchronously"""
+        self.total = os.path.getsize(self.file_path)
+        self.file = open(self.file_path, 'rb')
+        head = self.file.read(SNIFF_SIZE)
+        self.encoding = sniff(head)
+        self.tab.encoding = self.encoding
+        self.decoder = text_decoder(self.encoding, 'strict')
+        self.file.seek(0)
+        textbox = self.tab.textbox
+        # Loading is not an undoable edit, and keeping it in the undo
+        # stack would double the memory used by large files
+        textbox.config(undo=False)
+        if self.total <= SYNC_LIMIT:
+            data = self.file.read()
+            while True:
+                try:
+                    text = self.decoder.decode(data, final=True)
+                    break
+                except UnicodeDecodeError:
+                    self._fall_back()
+            self.tab.append_text(text)
+            self._finish()
+            return
+        self._escape_binding = textbox.bind(
+            '<Escape>', lambda event: self.cancel())
+        textbox.config(state='disabled')
+        self._after_id = self.tab.after(1, self._step)
+
+    def _step(self):
+        """Insert the next chunk and reschedule"""
+        self._after_id = None
+        if self.cancelled or not self.tab.winfo_exists():
+            return
+        data = self.file.read(self.chunk_size)
+        textbox = self.tab.textbox
+        try:
+            # A character or \r\n split between chunks waits for the
+            # next one
+            text = self.decoder.decode(data, final=not data)
+        except UnicodeDecodeError:
+            textbox.config(state='normal')
+            self._fall_back()
+            textbox.config(state='disabled')
+            self._after_id = self.tab.after(1, self._step)
+            return
+        textbox.config(state='normal')
+        if text:
+            self.tab.append_text(text)
+        textbox.config(state='disabled')
+        if not data:
+            self._finish()
+            return
+        self.loaded += len(data)
+        self._report_progress()
+        self._after_id = self.tab.after(1, self._step)
+
+    def _fall_back(self):
+        """Drop what was decoded so far and read the file again in the
+           fallback encoding
+        """
+        self.encoding = fallback(self.encoding)
+        self.decoder = text_decoder(self.encoding, 'strict')
+        self.file.seek(0)
+        self.loaded = 0
+        self.tab.textbox.delete('1.0', 'end')
+        self.tab.encoding = self.encoding
+
+    def cancel(self):
+        """Stop loading, keeping whatever has been inserted so far"""
+        if self.done:
+            return
+        self.cancelled = True
+        if self._after_id is not None:
+            self.tab.after_cancel(self._after_id)
+            self._after_id = None
+        self._finish()
+
+    def progress(self):
+        """Fraction of the file loaded so far"""
+        if self.done or not self.total:
+            return 1.0
+        return min(self.loaded / self.total, 1.0)
+
+    def _report_progress(self):
+        """Show loading progress in the editor's status bar"""
+        status_bar = getattr(self.tab.master, 'status_bar', None)
+        if status_bar is None:
+            return
+        name = os.path.basename(self.file_path)
+        if self.done:
+            text = f"Loading {name} cancelled" if self.cancelled else \
+                f"Loaded {name}"
+        else:
+            text = f"Loading {name}... {int(self.progress() * 100)}% " \
+                "(Esc to cancel)"
+        status_bar.config(text=text)
+
+    def _finish(self):
+        """Close the file and restore the text widget"""
+        self.done = True
+        if self.file:
+            self.file.close()
+            self.file = None
+        if self.tab.winfo_exists():
+            textbox = self.tab.textbox
+            textbox.config(state='normal', undo=True)
+            textbox.edit_reset()
+            textbox.edit_modified(False)
+            if self._escape_binding:
+                textbox.unbind('<Escape>', self._escape_binding)
+                self._escape_binding = None
+            self._report_progress()
+        if self.on_done:
+            self.on_done(self)
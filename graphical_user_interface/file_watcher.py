@@ -0,0 +1,406 @@
+#!/usr/bin/env python3
+"""Module to notice open files changed by other programs and bring the
+   changes into their tabs
+"""
+
+import ctypes
+import ctypes.util
+from difflib import SequenceMatcher
+import os
+import queue
+import select
+import struct
+import sys
+import threading
+import time
+import tkinter.messagebox as messagebox
+from charset import fallback, has_bom, text_decoder
+
+# How often the Tk thread looks for changed files (ms)
+TICK_INTERVAL = 250
+
+# A file is reloaded once it has not changed for this long (s), so a
+# program writing it in bursts is not caught halfway
+SETTLE_DELAY = 0.1
+
+# How often the polling fallback checks the files (s)
+POLL_INTERVAL = 1.0
+
+# Characters at the end of the old content checked against the file to
+# tell that it only grew
+TAIL_CHECK = 4096
+
+# Changed regions with more line pairs than this are replaced as a
+# whole instead of being diffed line by line; the diff runs on the Tk
+# thread and takes up to about 50 ms at this size when lines repeat
+DIFF_LIMIT = 250000
+
+# inotify event masks (see inotify(7))
+IN_MODIFY = 0x00000002
+IN_CLOSE_WRITE = 0x00000008
+IN_MOVED_TO = 0x00000080
+IN_CREATE = 0x00000100
+IN_DELETE = 0x00000200
+WATCH_MASK = IN_MODIFY | IN_CLOSE_WRITE | IN_MOVED_TO | IN_CREATE | IN_DELETE
+
+
+def file_stat(path):
+    """What identifies a version of a file on disk, or None if it is gone"""
+    try:
+        stat = os.stat(path)
+    except OSError:
+        return None
+    return (stat.st_size, stat.st_mtime_ns, stat.st_ino)
+
+
+class PollingBackend:
+    """Reports changed files by comparing their stat every interval"""
+    def __init__(self, changes, interval=POLL_INTERVAL):
+        self.changes = changes
+        self.interval = interval
+        self.stats = {}
+        self.lock = threading.Lock()
+        self.stopped = threading.Event()
+        self.thread = threading.Thread(target=self._run, daemon=True)
+        self.thread.start()
+
+    def watch(self, path):
+        """Start reporting changes of path"""
+        with self.lock:
+            self.stats[path] = file_stat(path)
+
+    def unwatch(self, path):
+        """Stop reporting changes of path"""
+        with self.lock:
+            self.stats.pop(path, None)
+
+    def _run(self):
+        while not self.stopped.wait(self.interval):
+            with self.lock:
+                paths = list(self.stats.items())
+            for path, old in paths:
+                new = file_stat(path)
+                if new != old:
+                    with self.lock:
+                        if path in self.stats:
+                            self.stats[path] = new
+                    self.changes.put(path)
+
+    def close(self):
+        """Stop the polling thread"""
+        self.stopped.set()
+        self.thread.join()
+
+
+class InotifyBackend:
+    """Reports changed files as the Linux kernel notices them. The
+       directories are watched, so files replaced by a rename (as most
+       editors save) are followed too
+    """
+    def __init__(self, changes):
+        if not sys.platform.startswith('linux'):
+            raise OSError('inotify is only available on Linux')
+        self.changes = changes
+        self.libc = ctypes.CDLL(ctypes.util.find_library('c'),
+                                use_errno=True)
+        self.fd = self.libc.inotify_init1(os.O_CLOEXEC | os.O_NONBLOCK)
+        if self.fd < 0:
+            raise OSError(ctypes.get_errno(), 'inotify_init1 failed')
+        self.lock = threading.Lock()
+        self.files = set()
+        self.directories = {}   # directory: (watch descriptor, files)
+        self.watches = {}       # watch descriptor: directory
+        self.stopped = threading.Event()
+        self.thread = threading.Thread(target=self._run, daemon=True)
+        self.thread.start()
+
+    def watch(self, path):
+        """Start reporting changes of path"""
+        directory = os.path.dirname(path)
+        with self.lock:
+            self.files.add(path)
+            if directory in self.directories:
+                self.directories[directory][1].add(path)
+                return
+            wd = self.libc.inotify_add_watch(
+                self.fd, os.fsencode(directory), WATCH_MASK)
+            if wd < 0:
+                self.files.discard(path)
+                return  # The directory is gone or unreadable
+            self.directories[directory] = (wd, {path})
+            self.watches[wd] = directory
+
+    def unwatch(self, path):
+        """Stop reporting changes of path"""
+        directory = os.path.dirname(path)
+        with self.lock:
+            self.files.discard(path)
+            if directory not in self.directories:
+                return
+            wd, paths = self.directories[directory]
+            paths.discard(path)
+            if not paths:
+                del self.directories[directory]
+                del self.watches[wd]
+                self.libc.inotify_rm_watch(self.fd, wd)
+
+    def _run(self):
+        while not self.stopped.is_set():
+            ready, _, _ = select.select([self.fd], [], [], 0.5)
+            if not ready:
+                continue
+            try:
+                data = os.read(self.fd, 64 * 1024)
+            except BlockingIOError:
+                continue
+            pos = 0
+            while pos < len(data):
+                wd, _, _, length = struct.unpack_from('iIII', data, pos)
+                pos += 16
+                name = data[pos:pos + length].rstrip(b'\0')
+                pos += length
+                with self.lock:
+                    directory = self.watches.get(wd)
+                    path = directory and os.path.join(directory,
+                                                      os.fsdecode(name))
+                    if path in self.files:
+                        self.changes.put(path)
+
+    def close(self):
+        """Stop the reading thread and release the inotify instance"""
+        self.stopped.set()
+        self.thread.join()
+        os.close(self.fd)
+
+
+def create_backend(changes):
+    """inotify where available, polling anywhere else"""
+    try:
+        return InotifyBackend(changes)
+    except (OSError, AttributeError, TypeError):
+        return PollingBackend(changes)
+
+
+def split_lines(text):
+    """Lines of text as the text widget counts them, newlines kept"""
+    lines = [line + '\n' for line in text.split('\n')]
+    lines[-1] = lines[-1][:-1]
+    return lines if lines[-1] else lines[:-1]
+
+
+def line_starts(text):
+    """Offsets of the starts of the lines of text, and of its end"""
+    starts = [0]
+    pos = text.find('\n')
+    while pos >= 0:
+        starts.append(pos + 1)
+        pos = text.find('\n', pos + 1)
+    starts.append(len(text))
+    return starts
+
+
+def line_changes(old, new):
+    """Edits turning the old text into the new one, as (first line,
+       line after the last, new text) replacements of whole 1-based
+       lines, last one first so they can be applied in order
+    """
+    a = split_lines(old)
+    b = split_lines(new)
+    # Lines matching at both ends need no diffing
+    start = 0
+    while start < min(len(a), len(b)) and a[start] == b[start]:
+        start += 1
+    end = 0
+    while end < min(len(a), len(b)) - start and \
+            a[len(a) - 1 - end] == b[len(b) - 1 - end]:
+        end += 1
+    a_middle = a[start:len(a) - end]
+    b_middle = b[start:len(b) - end]
+    if not a_middle and not b_middle:
+        return []
+    if len(a_middle) * len(b_middle) > DIFF_LIMIT:
+        opcodes = [('replace', 0, len(a_middle), 0, len(b_middle))]
+    else:
+        opcodes = SequenceMatcher(None, a_middle, b_middle,
+                                  autojunk=False).get_opcodes()
+    changes = []
+    for tag, i1, i2, j1, j2 in reversed(opcodes):
+        if tag != 'equal':
+            changes.append((start + i1 + 1, start + i2 + 1,
+                            ''.join(b_middle[j1:j2])))
+    return changes
+
+
+def read_text(path, start=0, encoding='utf-8'):
+    """Text of the file from the byte offset start on, decoded the way
+       the loader would; raises UnicodeDecodeError on bytes that are not
+       valid in encoding
+    """
+    with open(path, 'rb') as file:
+        file.seek(start)
+        data = file.read()
+    return text_decoder(encoding, 'strict').decode(data, final=True)
+
+
+class FileWatcher:
+    """Watches the files of the open tabs. A clean tab follows its file:
+       text appended to the file is appended to the tab, other changes
+       are applied as line edits. A tab with unsaved changes asks first
+    """
+    def __init__(self, editor, backend=None):
+        self.editor = editor
+        self.changes = queue.Queue()
+        self.backend = backend
+        self.watched = set()
+        self.changed = {}       # path: time of the last change seen
+        self.declined = {}      # path: file version the user kept out
+        self._after_id = None
+
+    def start(self):
+        """Start watching"""
+        if self.backend is None:
+            self.backend = create_backend(self.changes)
+        self._after_id = self.editor.after(TICK_INTERVAL, self._tick)
+
+    def close(self):
+        """Stop watching"""
+        if self._after_id is not None:
+            try:
+                self.editor.after_cancel(self._after_id)
+            except Exception:
+                pass    # The editor is already destroyed
+            self._after_id = None
+        if self.backend is not None:
+            self.backend.close()
+            self.backend = None
+
+    def tabs_of(self, path):
+        """Open tabs showing the file at path"""
+        tabs = []
+        for tab_id in self.editor.tabs():
+            tab = self.editor.nametowidget(tab_id)
+            if tab.file_dir and os.path.realpath(tab.file_dir) == path:
+                tabs.append(tab)
+        return tabs
+
+    def sync(self):
+        """Watch exactly the files of the open tabs"""
+        paths = set()
+        for tab_id in self.editor.tabs():
+            tab = self.editor.nametowidget(tab_id)
+            if tab.file_dir and not tab.is_read_only():
+                paths.add(os.path.realpath(tab.file_dir))
+        for path in paths - self.watched:
+            self.backend.watch(path)
+        for path in self.watched - paths:
+            self.backend.unwatch(path)
+            self.changed.pop(path, None)
+            self.declined.pop(path, None)
+        self.watched = paths
+
+    def _tick(self):
+        self._after_id = None
+        if not self.editor.winfo_exists():
+            return
+        self.sync()
+        now = time.monotonic()
+        while True:
+            try:
+                path = self.changes.get_nowait()
+            except queue.Empty:
+                break
+            if path in self.watched:
+                self.changed[path] = now
+        for path, seen in list(self.changed.items()):
+            # Our own saves are handled once they report back
+            if now - seen < SETTLE_DELAY or \
+                    path in self.editor.save_engine.pending:
+                continue
+            del self.changed[path]
+            for tab in self.tabs_of(path):
+                self.check(tab)
+        self._after_id = self.editor.after(TICK_INTERVAL, self._tick)
+
+    def check(self, tab):
+        """Bring a change of the tab's file into the tab"""
+        if tab.is_read_only() or tab.loader or tab.disk_stat is None:
+            return
+        path = os.path.realpath(tab.file_dir)
+        stat = file_stat(path)
+        if stat is None or stat == tab.disk_stat or \
+                stat == self.declined.get(path):
+            return
+        if tab.hibernated is not None:
+            tab.restore()
+        if tab.is_modified():
+            reload = messagebox.askyesno(
+                "File changed on disk",
+                f"{tab.file_name} was changed by another program. "
+                "Reload it and lose your unsaved changes?")
+            if not reload:
+                # Saving will ask before overwriting the other change
+                self.declined[path] = stat
+                return
+        self.reload(tab, path, stat)
+
+    def appended(self, tab, stat):
+        """Whether the file only grew since the tab was in step with it"""
+        old_size, _, old_inode = tab.disk_stat
+        size, _, inode = stat
+        if inode != old_inode or size <= old_size or tab.is_modified() or \
+                has_bom(tab.encoding):
+            return False
+        size = len(tab.document)
+        tail = tab.document.slice(max(size - TAIL_CHECK, 0), size)
+        try:
+            tail = tail.encode(tab.encoding)
+        except UnicodeEncodeError:
+            return False
+        with open(tab.file_dir, 'rb') as file:
+            file.seek(old_size - len(tail))
+            return file.read(len(tail)) == tail
+
+    def reload(self, tab, path, stat):
+        """Make the tab show the file again, touching only what changed"""
+        textbox = tab.textbox
+        autoseparators = textbox.cget('autoseparators')
+        textbox.config(autoseparators=False)
+        textbox.edit_separator()
+        appended = None
+        if self.appended(tab, stat):
+            try:
+                appended = read_text(path, tab.disk_stat[0], tab.encoding)
+            except UnicodeDecodeError:
+                pass
+        if appended is not None:
+            tab.append_text(appended)
+        else:
+            # As when loading, bytes the encoding cannot decode switch to
+            # the fallback rather than turn into replacement characters
+            encoding = tab.encoding
+            while True:
+                try:
+                    new = read_text(path, 0, encoding)
+                    break
+                except UnicodeDecodeError:
+                    encoding = fallback(encoding)
+            old = tab.document.text()
+            starts = line_starts(old)
+            for line1, line2, text in line_changes(old, new):
+                # Changes come last first, so the lines above are as in old
+                start = '%d.%d' % tab.widget_position(starts[line1 - 1])
+                if line2 > line1:
+                    end = '%d.%d' % tab.widget_position(starts[line2 - 1])
+                    textbox.delete(start, end)
+                if text:
+                    tab.insert_text(start, text)
+            tab.encoding = encoding
+        textbox.edit_separator()
+        textbox.config(autoseparators=autoseparators)
+        tab.mark_saved()
+        # The version read; a write since then is another change
+        tab.disk_stat = stat
+        self.declined.pop(path, None)
+        status_bar = getattr(self.editor, 'status_bar', None)
+        if status_bar is not None:
+            status_bar.config(text=f"Reloaded {tab.file_name}")
@@ -0,0 +1,424 @@
+#!/usr/bin/env python3
+"""Module to find and replace text in a tab"""
+
+from bisect import bisect_left, bisect_right
+import re
+import tkinter as tk
+from tkinter import ttk
+
+# Characters around an edit re-searched even if no match touched it, so
+# patterns looking around their match still see the change
+CONTEXT = 256
+
+# Characters read from the document at a time while scanning; a scan
+# that finds nothing in a window doubles it
+SCAN_WINDOW = 64 * 1024
+
+# Matches highlighted beyond this many are not worth drawing
+MAX_VISIBLE = 2000
+
+# Pause in typing (ms) after which the Find entry is searched
+SEARCH_DELAY = 150
+
+
+class SearchIndex:
+    """Matches of one pattern in a document (a PieceTable). The matches
+       are kept up to date as edits come in: only the region around each
+       edit is read and searched again, until the scan lines up with the
+       old matches, so an edit never copies the whole document
+    """
+    def __init__(self, document):
+        self.document = document
+        self.regex = None
+        self.matches = []       # sorted (start, end) character offsets
+        self.error = None
+        self._damaged = []      # (start, end) regions to search again
+
+    def search(self, pattern, regex=False, ignore_case=False):
+        """Find every match of pattern; returns the number of matches"""
+        self.matches = []
+        self._damaged = []
+        self.error = None
+        self.regex = None
+        if not pattern:
+            return 0
+        flags = re.MULTILINE | (re.IGNORECASE if ignore_case else 0)
+        try:
+            self.regex = re.compile(pattern if regex else re.escape(pattern),
+                                    flags)
+        except re.error as error:
+            self.error = str(error)
+            return 0
+        self.matches = self._scan(0, None, [])[0]
+        return len(self.matches)
+
+    def _scan(self, pos, stop, following):
+        """Matches from pos on. With stop set, the scan ends at the first
+           match at or after stop that is also in following (the old
+           matches after the region); returns (matches, rest of following).
+           The document is read in windows with CONTEXT characters around
+           them; a match is only trusted CONTEXT characters away from the
+           end of a window, as in refresh()
+        """
+        found = []
+        index = 0
+        size = len(self.document)
+        window = SCAN_WINDOW
+        while True:
+            base = max(pos - CONTEXT, 0)
+            end = min(pos + window, size)
+            text = self.document.slice(base, end)
+            limit = size if end == size else end - CONTEXT
+            start = pos
+            while True:
+                match = self.regex.search(text, pos - base)
+                if match is None:
+                    if end == size:
+                        return found, []
+                    pos = max(pos, limit)
+                    break
+                span = (match.start() + base, match.end() + base)
+                if end < size and (span[0] >= limit or span[1] >= end):
+                    # May change with the text after the window
+                    pos = max(pos, min(span[0], limit))
+                    break
+                # Old matches the scan went past no longer exist
+                while index < len(following) and \
+                        following[index][0] < span[0]:
+                    index += 1
+                if stop is not None and span[0] >= stop and \
+                        index < len(following) and following[index] == span:
+                    return found, following[index:]
+                if span[1] > span[0]:
+                    found.append(span)
+                    pos = span[1]
+                else:
+                    pos = span[1] + 1   # Empty match: nothing to highlight
+                if pos > size:
+                    return found, []
+            if pos == start:
+                window *= 2
+
+    def edited(self, offset, removed, inserted):
+        """Record an edit at offset replacing removed characters with
+           inserted ones; the matches are fixed up on next use
+        """
+        if self.regex is None:
+            return
+        delta = inserted - removed
+        end = offset + removed
+        # Matches before the edit stay as they are, those it touched go
+        # and those after it move
+        first = bisect_left(self.matches, (offset, -1))
+        if first and self.matches[first - 1][1] > offset:
+            first -= 1
+        last = bisect_left(self.matches, (end, -1), first)
+        tail = self.matches[last:]
+        if delta:
+            tail = [(start + delta, stop + delta) for start, stop in tail]
+        self.matches[first:] = tail
+        damaged = []
+        for start, stop in self._damaged:
+            if stop <= offset:
+                damaged.append((start, stop))
+            elif start >= end:
+                damaged.append((start + delta, stop + delta))
+            else:
+                damaged.append((min(start, offset),
+                                max(stop + delta, offset + inserted)))
+        damaged.append((offset, offset + inserted))
+        self._damaged = damaged
+
+    def refresh(self):
+        """Search the regions touched by edits again"""
+        if self.regex is None or not self._damaged:
+            return
+        regions = sorted(self._damaged)
+        self._damaged = []
+        merged = [list(regions[0])]
+        for start, stop in regions[1:]:
+            if start <= merged[-1][1] + CONTEXT:
+                merged[-1][1] = max(merged[-1][1], stop)
+            else:
+                merged.append([start, stop])
+        for start, stop in merged:
+            low = max(start - CONTEXT, 0)
+            high = stop + CONTEXT
+            before = self.matches[:bisect_left(self.matches, (low, -1))]
+            before = [span for span in before if span[1] <= low]
+            following = self.matches[bisect_left(self.matches, (high, -1)):]
+            pos = before[-1][1] if before else 0
+            found, rest = self._scan(pos, high, following)
+            self.matches = before + found + rest
+
+    def in_range(self, start, end):
+        """Matches overlapping the offsets start to end"""
+        self.refresh()
+        first = bisect_left(self.matches, (start, -1))
+        if first and self.matches[first - 1][1] > start:
+            first -= 1
+        last = bisect_right(self.matches, (end, -1))
+        return self.matches[first:last]
+
+    def next_match(self, offset, backwards=False):
+        """First match starting at or after offset, or the last one
+           starting before it when searching backwards; wraps around
+        """
+        self.refresh()
+        if not self.matches:
+            return None
+        if backwards:
+            index = bisect_left(self.matches, (offset, -1)) - 1
+            return self.matches[index]
+        index = bisect_left(self.matches, (offset, -1))
+        return self.matches[index % len(self.matches)]
+
+    def replacement(self, span, replace, regex=False):
+        """Text that replaces the match at span"""
+        if not regex:
+            return replace
+        base = max(span[0] - CONTEXT, 0)
+        text = self.document.slice(base, span[1] + CONTEXT)
+        match = self.regex.match(text, span[0] - base)
+        if match is None or match.end() + base != span[1]:
+            return replace
+        return match.expand(replace)
+
+    def replace_all(self, replace, regex=False):
+        """(start, end, new text) of the region covering every match with
+           all of them replaced, or None when there is nothing to replace
+        """
+        self.refresh()
+        if not self.matches:
+            return None
+        start = self.matches[0][0]
+        end = self.matches[-1][1]
+        text = self.document.slice(start, end)
+        parts = []
+        pos = start
+        for span in self.matches:
+            parts.append(text[pos - start:span[0] - start])
+            parts.append(self.replacement(span, replace, regex))
+            pos = span[1]
+        return start, end, ''.join(parts)
+
+
+class FindBar(ttk.Frame):
+    """Find/Replace bar docked at the top of a tab. Only the matches in
+       view are tagged, again whenever the tab scrolls or changes
+    """
+    def __init__(self, tab):
+        ttk.Frame.__init__(self, tab)
+        self.tab = tab
+        self.index = SearchIndex(tab.document)
+        self._after_id = None
+        self._search_id = None
+
+        self.find_text = tk.StringVar()
+        self.replace_text = tk.StringVar()
+        self.use_regex = tk.BooleanVar(value=False)
+        self.match_case = tk.BooleanVar(value=True)
+
+        ttk.Label(self, text='Find').pack(side='left', padx=(5, 2))
+        self.find_entry = ttk.Entry(self, textvariable=self.find_text,
+                                    width=30)
+        self.find_entry.pack(side='left')
+        ttk.Button(self, text='<', width=2,
+                   command=lambda: self.find_next(backwards=True)).pack(
+                       side='left')
+        ttk.Button(self, text='>', width=2, command=self.find_next).pack(
+            side='left')
+        ttk.Label(self, text='Replace').pack(side='left', padx=(10, 2))
+        ttk.Entry(self, textvariable=self.replace_text, width=30).pack(
+            side='left')
+        ttk.Button(self, text='Replace', command=self.replace).pack(
+            side='left')
+        ttk.Button(self, text='Replace All', command=self.replace_all).pack(
+            side='left')
+        ttk.Checkbutton(self, text='Regex', variable=self.use_regex,
+                        command=self.search).pack(side='left', padx=5)
+        ttk.Checkbutton(self, text='Match case', variable=self.match_case,
+                        command=self.search).pack(side='left')
+        self.count = ttk.Label(self, text='')
+        self.count.pack(side='left', padx=10)
+        ttk.Button(self, text='Close', command=self.close).pack(side='right')
+
+        textbox = tab.textbox
+        textbox.tag_configure('find_match', background='#FFF3A3')
+        textbox.tag_configure('find_current', background='#FFB454')
+        textbox.tag_raise('find_current', 'find_match')
+        self.find_text.trace_add('write', lambda *args:
+                                 self.schedule_search())
+        self.find_entry.bind('<Return>', lambda event: self.find_next())
+        self.find_entry.bind('<Shift-Return>',
+                             lambda event: self.find_next(backwards=True))
+        self.find_entry.bind('<Escape>', lambda event: self.close())
+
+    def is_open(self):
+        """Whether the bar is docked in its tab"""
+        return bool(self.winfo_manager())
+
+    def show(self):
+        """Dock the bar and start following edits and scrolling"""
+        if not self.is_open():
+            self.pack(side='top', fill='x', before=self.tab.textbox)
+            self.tab.add_edit_listener(self.on_edit)
+            self.tab.add_scroll_listener(self.on_scroll)
+        self.find_entry.focus_set()
+        self.find_entry.select_range(0, 'end')
+        self.search()
+
+    def close(self):
+        """Remove the highlighting and hide the bar"""
+        textbox = self.tab.textbox
+        if self._search_id is not None:
+            self.after_cancel(self._search_id)
+            self._search_id = None
+        self.tab.remove_edit_listener(self.on_edit)
+        self.tab.remove_scroll_listener(self.on_scroll)
+        textbox.tag_remove('find_match', '1.0', 'end')
+        textbox.tag_remove('find_current', '1.0', 'end')
+        self.pack_forget()
+        textbox.focus_set()
+
+    def schedule_search(self):
+        """Search once typing in the Find entry pauses, so a keystroke
+           does not wait for a search of the text typed before it
+        """
+        if self._search_id is not None:
+            self.after_cancel(self._search_id)
+        self._search_id = self.after(SEARCH_DELAY, self.search)
+
+    def flush_search(self):
+        """Run a search still waiting for typing to pause"""
+        if self._search_id is not None:
+            self.search()
+
+    def search(self):
+        """Search the document for the pattern in the entry"""
+        if self._search_id is not None:
+            self.after_cancel(self._search_id)
+            self._search_id = None
+        count = self.index.search(self.find_text.get(),
+                                  self.use_regex.get(),
+                                  not self.match_case.get())
+        if self.index.error:
+            self.count.config(text=self.index.error[:40])
+        else:
+            self.count.config(text=f"{count} matches" if count else '')
+        self.highlight()
+
+    def on_edit(self, action, start, end, text):
+        """Keep the matches in step with an edit of the document"""
+        offset, text = self.tab.last_edit
+        if action == 'insert':
+            self.index.edited(offset, 0, len(text))
+        else:
+            self.index.edited(offset, len(text), 0)
+        self.schedule_highlight()
+
+    def on_scroll(self, first, last):
+        """The view moved or resized: re-tag it"""
+        self.schedule_highlight()
+
+    def schedule_highlight(self):
+        """Re-tag the view once the pending events are handled"""
+        if self._after_id is None:
+            self._after_id = self.after_idle(self.highlight)
+
+    def _index(self, offset):
+        """Tk index of a character offset"""
+        line, column = self.tab.widget_position(offset)
+        return f'{line}.{column}'
+
+    def _offset(self, index):
+        """Character offset of a Tk index"""
+        line, column = map(int, self.tab.textbox.index(index).split('.'))
+        return self.tab.document_offset(line, column)
+
+    def highlight(self):
+        """Tag the matches in view, and only those"""
+        self._after_id = None
+        textbox = self.tab.textbox
+        textbox.tag_remove('find_match', '1.0', 'end')
+        top = self._offset('@0,0 linestart')
+        bottom = self._offset(f'@0,{textbox.winfo_height()} lineend')
+        for start, end in self.index.in_range(top, bottom)[:MAX_VISIBLE]:
+            textbox.tag_add('find_match', self._index(start),
+                            self._index(end))
+        count = len(self.index.matches)
+        if not self.index.error:
+            self.count.config(text=f"{count} matches" if count else '')
+
+    def find_next(self, backwards=False):
+        """Select the next (or previous) match after the cursor"""
+        self.flush_search()
+        textbox = self.tab.textbox
+        offset = self._offset('insert')
+        if backwards and textbox.tag_ranges('find_current'):
+            offset = self._offset('find_current.first')
+        span = self.index.next_match(offset, backwards)
+        if span is None:
+            return None
+        start, end = self._index(span[0]), self._index(span[1])
+        textbox.tag_remove('find_current', '1.0', 'end')
+        textbox.tag_add('find_current', start, end)
+        textbox.mark_set('insert', end)
+        textbox.see(start)
+        return span
+
+    def replace(self):
+        """Replace the current match and move on to the next one"""
+        self.flush_search()
+        textbox = self.tab.textbox
+        if not textbox.tag_ranges('find_current'):
+            self.find_next()
+            return
+        span = (self._offset('find_current.first'),
+                self._offset('find_current.last'))
+        self.index.refresh()
+        if span not in self.index.matches:
+            self.find_next()
+            return
+        new = self.index.replacement(span, self.replace_text.get(),
+                                     self.use_regex.get())
+        start = self._index(span[0])
+        textbox.edit_separator()
+        textbox.delete(start, self._index(span[1]))
+        # Through the tab, so long lines are cut into rows
+        end = self.tab.insert_text(start, new)
+        textbox.edit_separator()
+        textbox.mark_set('insert', end)
+        self.find_next()
+
+    def replace_all(self):
+        """Replace every match with one edit, undone in one step"""
+        self.flush_search()
+        region = self.index.replace_all(self.replace_text.get(),
+                                        self.use_regex.get())
+        if region is None:
+            return
+        start, end, new = region
+        replaced = len(self.index.matches)
+        textbox = self.tab.textbox
+        first = self._index(start)
+        last = self._index(end)
+        autoseparators = textbox.cget('autoseparators')
+        textbox.config(autoseparators=False)
+        textbox.edit_separator()
+        textbox.delete(first, last)
+        self.tab.insert_text(first, new)
+        textbox.edit_separator()
+        textbox.config(autoseparators=autoseparators)
+        self.search()
+        self.count.config(text=f"Replaced {replaced}")
+
+
+def open_find_bar(editor):
+    """Show the Find/Replace bar of the current tab"""
+    tab = editor.current_tab()
+    if tab.is_read_only():
+        return
+    if tab.find_bar is None:
+        tab.find_bar = FindBar(tab)
+    tab.find_bar.show()
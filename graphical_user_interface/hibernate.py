@@ -0,0 +1,177 @@
+#!/usr/bin/env python3
+"""Module to unload the content of inactive tabs to compressed buffers"""
+
+import codecs
+import os
+import tempfile
+import threading
+import time
+import zlib
+
+# Background tabs unused for this long are hibernated (seconds)
+HIBERNATE_AFTER = 5 * 60
+
+# Characters kept live across all tabs before the least recently used
+# background tabs are hibernated
+MEMORY_BUDGET = 64 * 1024 * 1024
+
+# Compressed buffers larger than this go to a temporary file (bytes)
+SPILL_SIZE = 8 * 1024 * 1024
+
+# How often idle tabs are looked for (ms)
+CHECK_INTERVAL = 30 * 1000
+
+# Bytes decompressed at a time when a buffer is read back
+READ_SIZE = 1024 * 1024
+
+
+class HibernatedDocument:
+    """zlib-compressed copy of a document, kept in memory or spilled to
+       a temporary file. Reads like a DocumentSnapshot, so it can be
+       saved without waking the tab up
+    """
+    def __init__(self, chunks, length, digest=None, spill_size=SPILL_SIZE):
+        self.length = length
+        self.digest = digest    # digest of the content, if known
+        self.memory = []
+        self.file = None
+        self.compressed_size = 0
+        self.lock = threading.Lock()   # saves read it on worker threads
+        compressor = zlib.compressobj(1)
+        for chunk in chunks:
+            self._store(compressor.compress(
+                chunk.encode('utf-8', 'surrogatepass')), spill_size)
+        self._store(compressor.flush(), spill_size)
+
+    def _store(self, data, spill_size):
+        """Keep a piece of compressed data, spilling once over the limit"""
+        if not data:
+            return
+        self.compressed_size += len(data)
+        if self.file is None and self.compressed_size > spill_size:
+            self.file = tempfile.TemporaryFile(prefix='pyc-tab-')
+            for block in self.memory:
+                self.file.write(block)
+            self.memory = []
+        if self.file is None:
+            self.memory.append(data)
+        else:
+            self.file.write(data)
+
+    def __len__(self):
+        return self.length
+
+    def _blocks(self):
+        """The compressed data, in order"""
+        if self.file is None:
+            yield from self.memory
+            return
+        position = 0
+        while True:
+            with self.lock:
+                self.file.seek(position)
+                block = self.file.read(READ_SIZE)
+            if not block:
+                break
+            position += len(block)
+            yield block
+
+    def chunks(self):
+        """The content as a sequence of strings"""
+        decompressor = zlib.decompressobj()
+        decoder = codecs.getincrementaldecoder('utf-8')('surrogatepass')
+        for block in self._blocks():
+            while block:
+                data = decompressor.decompress(block, READ_SIZE)
+                block = decompressor.unconsumed_tail
+                text = decoder.decode(data)
+                if text:
+                    yield text
+        text = decoder.decode(decompressor.flush(), final=True)
+        if text:
+            yield text
+
+    def text(self):
+        """The whole content as one string"""
+        return ''.join(self.chunks())
+
+    def close(self):
+        """Free the buffer"""
+        if self.file is not None:
+            self.file.close()
+            self.file = None
+        self.memory = []
+
+
+class TabHibernator:
+    """Hibernates background tabs that have been idle for idle_after
+       seconds, or the least recently used ones while the live tabs
+       hold more than memory_budget characters, and wakes tabs up when
+       they are selected
+    """
+    def __init__(self, editor, idle_after=HIBERNATE_AFTER,
+                 memory_budget=MEMORY_BUDGET):
+        self.editor = editor
+        self.idle_after = idle_after
+        self.memory_budget = memory_budget
+        self.last_used = {}
+        self._after_id = None
+
+    def start(self):
+        """Follow tab changes and start the periodic check"""
+        self.editor.bind('<<NotebookTabChanged>>', self.on_tab_changed,
+                         add='+')
+        self._schedule()
+
+    def _schedule(self):
+        self._after_id = self.editor.after(CHECK_INTERVAL, self.check)
+
+    def on_tab_changed(self, event=None):
+        """Wake the selected tab up before it is drawn"""
+        if not self.editor.select():
+            return
+        tab = self.editor.current_tab()
+        if tab.hibernated is not None:
+            tab.restore()
+        self.last_used[tab] = time.monotonic()
+        self.check(reschedule=False)
+
+    def can_hibernate(self, tab):
+        """Whether a tab may be unloaded now"""
+        if tab.hibernated is not None or tab.is_read_only() or tab.loader:
+            return False
+        if tab.explain_panel and tab.explain_panel.request:
+            return False
+        # A save in flight must find the version it wrote on return
+        return not (tab.file_dir and os.path.realpath(tab.file_dir)
+                    in self.editor.save_engine.pending)
+
+    def check(self, reschedule=True):
+        """Hibernate idle tabs, then tabs over the memory budget"""
+        now = time.monotonic()
+        current = str(self.editor.select())
+        candidates = []
+        live = 0
+        for name in self.editor.tabs():
+            tab = self.editor.nametowidget(name)
+            if tab.hibernated is not None:
+                continue
+            live += len(tab.document)
+            if str(name) != current:
+                candidates.append(
+                    (self.last_used.setdefault(tab, now), tab))
+        candidates.sort(key=lambda item: item[0])
+        for used, tab in candidates:
+            idle = now - used >= self.idle_after
+            if not idle and live <= self.memory_budget:
+                continue
+            if self.can_hibernate(tab):
+                size = len(tab.document)
+                tab.hibernate()
+                live -= size
+        if reschedule:
+            self._schedule()
+
+    def forget(self, tab):
+        """Stop tracking a closed tab"""
+        self.last_used.pop(tab, None)
@@ -0,0 +1,315 @@
+#!/usr/bin/env python3
+"""Module to highlight syntax incrementally, a line at a time"""
+
+import keyword
+import os
+import re
+import time
+
+# Time one idle-time slice of lexing may take (s)
+SLICE_BUDGET = 0.008
+
+# Colours of the token tags
+TAG_COLOURS = {
+    'syntax_keyword': '#0033B3',
+    'syntax_builtin': '#8A2BE2',
+    'syntax_string': '#067D17',
+    'syntax_comment': '#8C8C8C',
+    'syntax_number': '#1750EB',
+    'syntax_definition': '#00627A',
+}
+
+# State of lines not lexed yet; never equal to a real state
+UNKNOWN = object()
+
+
+class Lexer:
+    """Splits one line into (start, end, tag) tokens, given the state the
+       line before left the lexer in; returns the tokens and the state at
+       the end of the line. States must compare equal when the lexer
+       would carry on the same way
+    """
+    initial_state = None
+
+    def lex_line(self, line, state):
+        """Tokens of line and the state after it"""
+        return [], state
+
+
+class RegexLexer(Lexer):
+    """Lexer driven by one regular expression with a named group per tag,
+       plus delimiters of comments or strings that span lines. A match of
+       the group named 'open' starts a multi-line token whose closing
+       delimiter is given by CLOSERS
+    """
+    TOKENS = re.compile(r'(?!)')
+    CLOSERS = {}
+    OPEN_TAG = 'syntax_string'
+
+    def lex_line(self, line, state):
+        """Tokens of line and the state after it"""
+        tokens = []
+        pos = 0
+        if state is not None:
+            end = self._close(line, 0, state)
+            if end is None:
+                return [(0, len(line), self.OPEN_TAG)], state
+            tokens.append((0, end, self.OPEN_TAG))
+            pos = end
+        while True:
+            match = self.TOKENS.search(line, pos)
+            if match is None:
+                return tokens, None
+            kind = match.lastgroup
+            start, end = match.span()
+            if kind == 'open':
+                delimiter = match.group('open')
+                closer = self.CLOSERS[delimiter.lstrip('rRbBuUfF')]
+                close = self._close(line, end, closer)
+                if close is None:
+                    tokens.append((start, len(line), self.OPEN_TAG))
+                    return tokens, closer
+                tokens.append((start, close, self.OPEN_TAG))
+                end = close
+            else:
+                tokens.append((start, end, 'syntax_' + kind))
+            pos = max(end, start + 1)
+
+    def _close(self, line, pos, closer):
+        """End of the closing delimiter from pos on, or None"""
+        while True:
+            index = line.find(closer, pos)
+            if index < 0:
+                return None
+            # An odd run of backslashes escapes the delimiter
+            slashes = len(line[pos:index]) - len(line[pos:index].rstrip('\\'))
+            if slashes % 2 == 0:
+                return index + len(closer)
+            pos = index + 1
+
+
+class PythonLexer(RegexLexer):
+    """Python: keywords, builtins, strings (triple-quoted ones may span
+       lines), comments, numbers and the names of definitions
+    """
+    BUILTINS = ('print', 'len', 'range', 'open', 'str', 'int', 'float',
+                'list', 'dict', 'set', 'tuple', 'bool', 'object', 'super',
+                'isinstance', 'enumerate', 'zip', 'map', 'min', 'max',
+                'sum', 'sorted', 'self')
+    TOKENS = re.compile(
+        r"(?P<comment>#.*)"
+        r"|(?P<open>[rRbBuUfF]{0,2}(?:'''|\"\"\"))"
+        r"|(?P<string>[rRbBuUfF]{0,2}(?:'(?:\\.|[^'\\])*'?"
+        r"|\"(?:\\.|[^\"\\])*\"?))"
+        r"|(?<=\bdef )(?P<definition>\w+)|(?<=\bclass )(?P<class>\w+)"
+        r"|\b(?P<keyword>" + '|'.join(keyword.kwlist) + r")\b"
+        r"|\b(?P<builtin>" + '|'.join(BUILTINS) + r")\b"
+        r"|(?P<number>\b\d[\d_]*(?:\.\d*)?(?:[eE][+-]?\d+)?[jJ]?\b)")
+    CLOSERS = {"'''": "'''", '"""': '"""'}
+
+    def lex_line(self, line, state):
+        """Tokens of line and the state after it"""
+        tokens, state = RegexLexer.lex_line(self, line, state)
+        return [(start, end, 'syntax_definition' if tag == 'syntax_class'
+                 else tag) for start, end, tag in tokens], state
+
+
+class CLexer(RegexLexer):
+    """C: keywords, preprocessor lines, strings, characters, numbers and
+       comments (block comments may span lines)
+    """
+    KEYWORDS = ('auto', 'break', 'case', 'char', 'const', 'continue',
+                'default', 'do', 'double', 'else', 'enum', 'extern', 'float',
+                'for', 'goto', 'if', 'inline', 'int', 'long', 'register',
+                'restrict', 'return', 'short', 'signed', 'sizeof', 'static',
+                'struct', 'switch', 'typedef', 'union', 'unsigned', 'void',
+                'volatile', 'while', 'NULL')
+    TOKENS = re.compile(
+        r"(?P<comment>//.*)"
+        r"|(?P<open>/\*)"
+        r"|(?P<builtin>^\s*#\s*\w+)"
+        r"|(?P<string>\"(?:\\.|[^\"\\])*\"?|'(?:\\.|[^'\\])*'?)"
+        r"|\b(?P<keyword>" + '|'.join(KEYWORDS) + r")\b"
+        r"|(?P<number>\b(?:0[xX][0-9a-fA-F]+|\d+(?:\.\d*)?"
+        r"(?:[eE][+-]?\d+)?)[uUlLfF]*\b)")
+    CLOSERS = {'/*': '*/'}
+    OPEN_TAG = 'syntax_comment'
+
+
+# Lexers by file extension; register_lexer() adds more
+LEXERS = {
+    '.py': PythonLexer,
+    '.pyw': PythonLexer,
+    '.c': CLexer,
+    '.h': CLexer,
+}
+
+
+def register_lexer(extension, lexer_class):
+    """Highlight files with extension using lexer_class"""
+    LEXERS[extension.lower()] = lexer_class
+
+
+def lexer_for(file_name):
+    """A lexer for the file, or None if there is none for its type"""
+    if not file_name:
+        return None
+    lexer_class = LEXERS.get(os.path.splitext(file_name)[1].lower())
+    return lexer_class() if lexer_class else None
+
+
+class LineStates:
+    """Lexer state at the start of every line. States are computed from
+       the top only as far as they are needed; after an edit they are
+       computed again from the edited line only until the new state of a
+       line past the edit matches the old one
+    """
+    def __init__(self, lexer, line_count=1):
+        self.lexer = lexer
+        self.reset(line_count)
+
+    def reset(self, line_count):
+        """Forget every state"""
+        self.states = [self.lexer.initial_state] + \
+            [UNKNOWN] * (max(line_count, 1) - 1)
+        self.valid = 1      # states[:valid] are right
+        self.lexed = 1      # states[:lexed] were computed at some point
+        self.edit_end = 0   # last edited line, re-lexed whatever its state
+
+    def line_count(self):
+        """Number of lines tracked"""
+        return len(self.states)
+
+    def inserted(self, line, newlines):
+        """Text with newlines line breaks was inserted in the 1-based line"""
+        if newlines:
+            self.states[line:line] = [UNKNOWN] * newlines
+            if self.lexed > line:
+                self.lexed += newlines
+            if self.edit_end > line:
+                self.edit_end += newlines
+        self.valid = min(self.valid, line)
+        self.edit_end = max(self.edit_end, line + newlines)
+
+    def deleted(self, line1, line2):
+        """Text from the 1-based line1 to line2 was deleted"""
+        removed = line2 - line1
+        if removed:
+            del self.states[line1:line2]
+            for name in ('lexed', 'edit_end'):
+                value = getattr(self, name)
+                if value > line2:
+                    setattr(self, name, value - removed)
+                elif value > line1:
+                    setattr(self, name, line1)
+        self.valid = min(self.valid, line1)
+        self.edit_end = max(self.edit_end, line1)
+
+    def advance(self, get_line, target, deadline=None):
+        """Compute states until the one at the start of the 1-based target
+           line is right; stops early (returning False) at deadline
+        """
+        target = min(target, len(self.states))
+        while self.valid < target:
+            line = self.valid
+            _, state = self.lexer.lex_line(get_line(line),
+                                           self.states[line - 1])
+            if line < self.lexed and line >= self.edit_end and \
+                    self.states[line] == state:
+                # Converged: the old states of the lines below still hold
+                self.valid = self.lexed
+                self.edit_end = 0
+                continue
+            self.states[line] = state
+            self.valid += 1
+            self.lexed = max(self.lexed, self.valid)
+            if deadline is not None and time.perf_counter() > deadline:
+                return self.valid >= target
+        return True
+
+    def tokens(self, line, text):
+        """Tokens of the 1-based line, whose state must be known"""
+        return self.lexer.lex_line(text, self.states[line - 1])[0]
+
+
+class Highlighter:
+    """Highlights the visible lines of a tab. Edits and scrolling only
+       schedule work; lexing runs in idle time in short slices so typing
+       is never held up, and only the lines in view are tagged
+    """
+    def __init__(self, tab, lexer):
+        self.tab = tab
+        self.textbox = tab.textbox
+        self.states = LineStates(lexer, tab.lines.line_count())
+        self._after_id = None
+        for tag, colour in TAG_COLOURS.items():
+            self.textbox.tag_configure(tag, foreground=colour)
+        tab.add_edit_listener(self.on_edit)
+        tab.add_scroll_listener(self.on_scroll)
+        self.schedule()
+
+    def detach(self):
+        """Stop highlighting and remove the tags"""
+        self.tab.remove_edit_listener(self.on_edit)
+        self.tab.remove_scroll_listener(self.on_scroll)
+        if self._after_id is not None:
+            self.textbox.after_cancel(self._after_id)
+            self._after_id = None
+        for tag in TAG_COLOURS:
+            self.textbox.tag_remove(tag, '1.0', 'end')
+
+    def reset(self):
+        """The whole text was replaced behind the edit hooks"""
+        self.states.reset(self.tab.lines.line_count())
+        self.schedule()
+
+    def on_edit(self, action, start, end, text):
+        """Invalidate the states from the edited line on"""
+        line = int(start.split('.')[0])
+        if action == 'insert':
+            self.states.inserted(line, text.count('\n'))
+        else:
+            self.states.deleted(line, int(end.split('.')[0]))
+        self.schedule()
+
+    def on_scroll(self, first, last):
+        """New lines may have come into view"""
+        self.schedule()
+
+    def schedule(self):
+        """Run the highlighting once the pending events are handled"""
+        if self._after_id is None:
+            self._after_id = self.textbox.after_idle(self._work)
+
+    def _visible_lines(self):
+        """First and last line in view"""
+        first = int(self.textbox.index('@0,0').split('.')[0])
+        last = int(self.textbox.index(
+            f'@0,{self.textbox.winfo_height()}').split('.')[0])
+        return first, last
+
+    def _get_line(self, line):
+        return self.textbox.get(f'{line}.0', f'{line}.end')
+
+    def _work(self):
+        """Lex up to the bottom of the view, a slice at a time, then tag"""
+        self._after_id = None
+        if not self.textbox.winfo_exists():
+            return
+        first, last = self._visible_lines()
+        deadline = time.perf_counter() + SLICE_BUDGET
+        if not self.states.advance(self._get_line, last, deadline):
+            # Let pending events in before the next slice
+            self._after_id = self.textbox.after(1, self._work)
+            return
+        self.tag_lines(first, last)
+
+    def tag_lines(self, first, last):
+        """Tag the tokens of lines first to last"""
+        textbox = self.textbox
+        for tag in TAG_COLOURS:
+            textbox.tag_remove(tag, f'{first}.0', f'{last}.end')
+        for line in range(first, min(last, self.states.line_count()) + 1):
+            for start, end, tag in self.states.tokens(
+                    line, self._get_line(line)):
+                textbox.tag_add(tag, f'{line}.{start}', f'{line}.{end}')
@@ -0,0 +1,312 @@
+#!/usr/bin/env python3
+"""Module to journal edits so unsaved work survives a crash"""
+
+import json
+import os
+import queue
+import tempfile
+import threading
+import uuid
+from charset import text_decoder
+from piece_table import PieceTable
+
+JOURNAL_DIR = os.path.join(os.path.expanduser('~'), '.pyc_editor',
+                           'journal')
+
+# Edits are appended this long after the first one of a burst (ms)
+FLUSH_DELAY = 200
+
+# Journals that could not be recovered in full are renamed with this
+# suffix and kept for the user
+KEPT_SUFFIX = '.unrecovered'
+
+# Records past this many characters, and past the size of the document,
+# are replaced by a snapshot of the document
+COMPACT_MIN = 1024 * 1024
+
+
+class JournalWriter:
+    """Single worker thread doing the journal file I/O in order, so the
+       Tk thread never waits on the disk
+    """
+    def __init__(self):
+        self.tasks = queue.Queue()
+        self.thread = threading.Thread(target=self._run, daemon=True)
+        self.thread.start()
+
+    def _run(self):
+        while True:
+            task = self.tasks.get()
+            try:
+                if task is None:
+                    return
+                task()
+            except OSError as error:
+                print(f"Journal write failed: {error}")
+            finally:
+                self.tasks.task_done()
+
+    def append(self, path, data):
+        """Append data to path and make it durable"""
+        def task():
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            with open(path, 'a', encoding='utf-8',
+                      errors='surrogatepass') as file:
+                file.write(data)
+                file.flush()
+                os.fsync(file.fileno())
+        self.tasks.put(task)
+
+    def replace(self, path, header, snapshot):
+        """Atomically replace path with a header and a document snapshot"""
+        def task():
+            directory = os.path.dirname(path)
+            os.makedirs(directory, exist_ok=True)
+            fd, temp_path = tempfile.mkstemp(suffix='.tmp', dir=directory)
+            try:
+                with os.fdopen(fd, 'w', encoding='utf-8',
+                               errors='surrogatepass') as file:
+                    file.write(header)
+                    file.write(json.dumps(['=', snapshot.text()]) + '\n')
+                    file.flush()
+                    os.fsync(file.fileno())
+                os.replace(temp_path, path)
+            except BaseException:
+                if os.path.exists(temp_path):
+                    os.remove(temp_path)
+                raise
+        self.tasks.put(task)
+
+    def remove(self, path):
+        """Delete path if it exists"""
+        def task():
+            if os.path.exists(path):
+                os.remove(path)
+        self.tasks.put(task)
+
+    def wait(self):
+        """Block until every queued write is done"""
+        self.tasks.join()
+
+    def close(self):
+        """Finish the queued writes and stop the thread"""
+        self.tasks.put(None)
+        self.thread.join()
+
+
+class Journal:
+    """Appends the edits of one tab to a recovery file: a JSON header
+       naming the file the edits apply to, then one JSON record per
+       edit. Writing costs as much as the edit, not the document; once
+       the records outgrow the document they are compacted into one
+       snapshot record. The file is removed when the tab is saved
+    """
+    def __init__(self, tab, directory=JOURNAL_DIR, writer=None):
+        self.tab = tab
+        self.directory = directory
+        self.writer = writer
+        self.path = None        # created with the first edit
+        self.pending = []
+        self.written = 0        # characters of records since the base
+        self._after_id = None
+        tab.add_edit_listener(self.on_edit)
+
+    def _writer(self):
+        if self.writer is None:
+            self.writer = get_journal_writer()
+        return self.writer
+
+    def _header(self, snapshot=False):
+        """First line of the journal: the base the records apply to"""
+        header = {'pid': os.getpid(), 'file': self.tab.file_dir,
+                  'encoding': self.tab.encoding, 'snapshot': snapshot}
+        if not snapshot and self.tab.file_dir:
+            # The file as it is now is the base of the records
+            try:
+                stat = os.stat(self.tab.file_dir)
+                header.update(size=stat.st_size, mtime=stat.st_mtime_ns)
+            except OSError:
+                header['file'] = None
+        return json.dumps(header) + '\n'
+
+    def _new_path(self):
+        return os.path.join(self.directory, uuid.uuid4().hex + '.journal')
+
+    def on_edit(self, action, start, end, text):
+        """Record an edit of the tab"""
+        if self.tab.loader is not None:
+            return  # The file being loaded is already on disk
+        offset, text = self.tab.last_edit
+        if action == 'insert':
+            record = ['+', offset, text]
+        else:
+            record = ['-', offset, len(text)]
+        if self.path is None:
+            self.path = self._new_path()
+            self.pending.append(self._header())
+        self.pending.append(json.dumps(record) + '\n')
+        if self._after_id is None:
+            self._after_id = self.tab.after(FLUSH_DELAY, self.flush)
+
+    def flush(self):
+        """Hand the buffered records to the writer"""
+        if self._after_id is not None:
+            self.tab.after_cancel(self._after_id)
+            self._after_id = None
+        if not self.pending:
+            return
+        data = ''.join(self.pending)
+        self.pending = []
+        self._writer().append(self.path, data)
+        self.written += len(data)
+        if self.written > max(COMPACT_MIN, len(self.tab.document)):
+            self.compact()
+
+    def compact(self):
+        """Replace the journal with a snapshot of the document"""
+        if self._after_id is not None:
+            self.tab.after_cancel(self._after_id)
+            self._after_id = None
+        self.pending = []
+        if self.path is None:
+            self.path = self._new_path()
+        self._writer().replace(self.path, self._header(snapshot=True),
+                               self.tab.document.snapshot())
+        self.written = 0
+
+    def clear(self):
+        """The content is on disk; drop the journal"""
+        if self._after_id is not None:
+            self.tab.after_cancel(self._after_id)
+            self._after_id = None
+        self.pending = []
+        self.written = 0
+        if self.path is not None:
+            self._writer().remove(self.path)
+            self.path = None
+
+
+def replay(path, check=True):
+    """Header and recovered text of a journal. Raises ValueError when
+       the file the edits apply to has changed since, unless check is
+       false. A record cut short by a crash ends the replay
+    """
+    with open(path, 'r', encoding='utf-8', errors='surrogatepass') as file:
+        header = json.loads(file.readline())
+        document = PieceTable()
+        if header.get('file') and not header.get('snapshot'):
+            stat = os.stat(header['file'])
+            if check and (stat.st_size != header['size'] or
+                          stat.st_mtime_ns != header['mtime']):
+                raise ValueError(f"{header['file']} changed since")
+            decoder = text_decoder(header.get('encoding', 'utf-8'))
+            with open(header['file'], 'rb') as base:
+                document.reset(decoder.decode(base.read(), final=True))
+        for line in file:
+            try:
+                record = json.loads(line)
+            except ValueError:
+                break
+            if record[0] == '=':
+                document.reset(record[1])
+            elif record[0] == '+':
+                document.insert(record[1], record[2])
+            else:
+                document.delete(record[1], record[2])
+    return header, document.text()
+
+
+def is_running(pid):
+    """Whether another live process has the pid"""
+    if pid == os.getpid():
+        return False
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except OSError:
+        return True     # Exists, owned by someone else
+    return True
+
+
+def orphaned_journals(directory=JOURNAL_DIR):
+    """Journals left behind by editors that are no longer running"""
+    if not os.path.isdir(directory):
+        return []
+    paths = []
+    for name in sorted(os.listdir(directory)):
+        path = os.path.join(directory, name)
+        if not name.endswith('.journal'):
+            continue
+        try:
+            with open(path, 'r', encoding='utf-8') as file:
+                header = json.loads(file.readline())
+        except (OSError, ValueError):
+            header = {}
+        if not is_running(header.get('pid', 0)):
+            paths.append(path)
+    return paths
+
+
+def keep_journal(path):
+    """Move a journal out of the way of recovery without losing it;
+       returns its new path
+    """
+    kept = path[:-len('.journal')] + KEPT_SUFFIX
+    os.replace(path, kept)
+    return kept
+
+
+def recover_tabs(editor, directory=JOURNAL_DIR):
+    """Reopen the unsaved tabs of an editor that did not exit cleanly.
+       When the file a journal applies to changed since, its edits are
+       applied to the file as it is now in an untitled tab. Journals not
+       recovered in full are kept; returns the recovered tabs and the
+       paths of the kept journals
+    """
+    tabs = []
+    kept = []
+    for path in orphaned_journals(directory):
+        exact = True
+        try:
+            try:
+                header, text = replay(path)
+            except ValueError:
+                # The best text there is; the user has to check it
+                header, text = replay(path, check=False)
+                header = dict(header, file=None)
+                exact = False
+        except (OSError, ValueError, KeyError, IndexError) as error:
+            print(f"Could not recover {path}: {error}")
+            kept.append(keep_journal(path))
+            continue
+        editor.add_tab()
+        tab = editor.indexed_tab(-1)
+        if header.get('file'):
+            tab.file_dir = header['file']
+            tab.file_name = os.path.basename(header['file'])
+        tab.encoding = header.get('encoding', 'utf-8')
+        tab.append_text(text)
+        tab.textbox.edit_reset()
+        tab.textbox.edit_modified(True)
+        tab.on_modified()
+        tab.update_highlighter()
+        # Journal the content afresh under this editor's pid
+        tab.journal.compact()
+        if exact:
+            os.remove(path)
+        else:
+            kept.append(keep_journal(path))
+        tabs.append(tab)
+    return tabs, kept
+
+
+_writer = None
+
+
+def get_journal_writer():
+    """The journal writer shared by every tab"""
+    global _writer
+    if _writer is None:
+        _writer = JournalWriter()
+    return _writer
@@ -0,0 +1,271 @@
+#!/usr/bin/env python3
+"""Module to define the read-only viewer used for very large files"""
+
+from array import array
+from bisect import bisect_left
+import codecs
+import mmap
+import os
+import tkinter.font as tkfont
+
+# Files of at least this size (in bytes) open in the large file viewer
+LARGE_FILE_THRESHOLD = 256 * 1024 * 1024
+
+# Extra lines materialized above and below the visible region
+MARGIN = 200
+
+# Never materialize more than this many bytes at once (very long lines)
+MAX_WINDOW_BYTES = 4 * 1024 * 1024
+
+# Bytes in which a line start is looked for newline by newline
+FIND_BYTES = 256
+
+
+class SparseLineIndex:
+    """Line-offset index over a memory-mapped file.
+       Instead of one offset per line it keeps one checkpoint per block
+       (the number of newlines before the block starts), so memory stays
+       flat whatever the file size; lines inside a block are found by
+       scanning at most one block.
+    """
+    BLOCK = 1024 * 1024
+
+    def __init__(self, data):
+        self.data = data
+        self.size = len(data)
+        # newlines_before[b] == number of newlines in data[:b * BLOCK]
+        self.newlines_before = array('Q', [0])
+        self.indexed = 0  # bytes indexed so far
+
+    @property
+    def complete(self):
+        """Whether the whole file has been indexed"""
+        return self.indexed >= self.size
+
+    def build(self, max_blocks=None):
+        """Index up to max_blocks more blocks; returns True when complete"""
+        count = 0
+        while not self.complete and (max_blocks is None or
+                                     count < max_blocks):
+            end = min(self.indexed + self.BLOCK, self.size)
+            newlines = self.data[self.indexed:end].count(b'\n')
+            self.newlines_before.append(self.newlines_before[-1] + newlines)
+            self.indexed = end
+            count += 1
+        return self.complete
+
+    def line_count(self):
+        """Number of lines indexed so far"""
+        return self.newlines_before[-1] + 1
+
+    def line_offset(self, line):
+        """Byte offset where the 0-based line starts"""
+        if line <= 0:
+            return 0
+        if line >= self.line_count():
+            return self.indexed
+        # Block holding the line-th newline
+        block = bisect_left(self.newlines_before, line) - 1
+        start = block * self.BLOCK
+        chunk = self.data[start:start + self.BLOCK]
+        wanted = line - self.newlines_before[block]
+        # Halve the part of the block holding the newline by counting
+        # newlines, then find it among the last few
+        low, high = 0, len(chunk)
+        while high - low > FIND_BYTES:
+            middle = (low + high) // 2
+            newlines = chunk.count(b'\n', low, middle)
+            if newlines >= wanted:
+                high = middle
+            else:
+                wanted -= newlines
+                low = middle
+        pos = low
+        for _ in range(wanted):
+            pos = chunk.find(b'\n', pos) + 1
+        return start + pos
+
+    def offset_line(self, offset):
+        """0-based line containing the byte offset"""
+        offset = min(max(offset, 0), self.indexed)
+        block = offset // self.BLOCK
+        if block >= len(self.newlines_before):
+            block = len(self.newlines_before) - 1
+        start = block * self.BLOCK
+        return self.newlines_before[block] + \
+            self.data[start:offset].count(b'\n')
+
+
+class LargeFileView:
+    """Read-only, virtualized view of a memory-mapped file inside a Tab.
+       Only the lines around the visible region are materialized into the
+       text widget; they are replaced as the user scrolls.
+    """
+    def __init__(self, tab, file_path, encoding='utf-8'):
+        self.tab = tab
+        self.textbox = tab.textbox
+        self.file_path = file_path
+        self.encoding = encoding
+        self.file = None
+        self.data = None
+        self.index = None
+        self.top = 0            # first visible file line (0-based)
+        self.window_start = 0   # first file line in the text widget
+        self.window_end = 0     # one past the last file line in the widget
+        # Whether the window was cut short of its lines to fit the byte
+        # budget, and the top line it was made for
+        self.window_cut = False
+        self.window_top = 0
+        self._after_id = None
+        self._rendering = False
+        self._row_height = None     # Measured once per font and options
+
+    def open(self):
+        """Map the file and show its first lines"""
+        self.file = open(self.file_path, 'rb')
+        self.data = mmap.mmap(self.file.fileno(), 0, access=mmap.ACCESS_READ)
+        self.index = SparseLineIndex(self.data)
+        self.index.build(max_blocks=4)
+
+        self.textbox.config(undo=False,
+                            yscrollcommand=self._on_text_scrolled)
+        self.tab.yscrollbar.config(command=self.yview)
+        self.scroll_to(0)
+        if not self.index.complete:
+            self._after_id = self.tab.after(1, self._build_step)
+
+    def close(self):
+        """Unmap the file and hand scrolling back to the text widget"""
+        if self._after_id is not None:
+            self.tab.after_cancel(self._after_id)
+            self._after_id = None
+        if self.textbox.winfo_exists():
+            self.textbox.config(state='normal', undo=True,
+                                yscrollcommand=self.tab.on_yscroll)
+            self.tab.yscrollbar.config(command=self.textbox.yview)
+        if self.data is not None:
+            self.data.close()
+            self.data = None
+        if self.file is not None:
+            self.file.close()
+            self.file = None
+
+    def _build_step(self):
+        """Keep indexing the file in the background"""
+        self._after_id = None
+        if self.data is None:
+            return
+        if not self.index.build(max_blocks=64):
+            self._after_id = self.tab.after(1, self._build_step)
+        self._update_scrollbar()
+
+    def restyle(self):
+        """Measure rows again after the font or view options changed"""
+        self._row_height = None
+
+    def visible_rows(self):
+        """Number of text rows that fit in the widget"""
+        if self._row_height is None:
+            font = tkfont.Font(font=self.textbox['font'])
+            spacing = int(self.textbox['spacing1']) + \
+                int(self.textbox['spacing3'])
+            self._row_height = max(font.metrics('linespace') + spacing, 1)
+        return max(self.textbox.winfo_height() // self._row_height, 1)
+
+    def file_line(self, text_line):
+        """Map a 1-based text widget line to a 1-based file line"""
+        return self.window_start + text_line
+
+    def yview(self, *args):
+        """Scrollbar command working in file lines instead of widget lines"""
+        rows = self.visible_rows()
+        if args[0] == 'moveto':
+            top = int(float(args[1]) * self.index.line_count())
+        else:
+            step = rows if args[2] == 'pages' else 1
+            top = self.top + int(args[1]) * step
+        self.scroll_to(top)
+
+    def scroll_to(self, top):
+        """Make the 0-based file line the first visible line"""
+        rows = self.visible_rows()
+        top = max(min(top, self.index.line_count() - rows), 0)
+        outside = top < self.window_start or (
+            top + rows > self.window_end and
+            self.window_end < self.index.line_count())
+        # A window cut to the budget for this top is as full as it gets
+        if outside and not (self.window_cut and top == self.window_top):
+            self._materialize(top)
+        self.top = top
+        self._rendering = True
+        self.textbox.yview(f'{top - self.window_start + 1}.0')
+        self._rendering = False
+        self._update_scrollbar()
+
+    def _materialize(self, top):
+        """Replace the widget content with the lines around top. Within
+           the byte budget the margin goes above and below top; beyond it
+           the window starts at top, holding whole lines but for a line
+           too long for the budget, which is shown up to it
+        """
+        rows = self.visible_rows()
+        start = max(top - MARGIN, 0)
+        end = min(top + rows + MARGIN, self.index.line_count())
+        begin = self.index.line_offset(start)
+        finish = self.index.line_offset(end)
+        cut = finish - begin > MAX_WINDOW_BYTES
+        if cut:
+            start = top
+            begin = self.index.line_offset(top)
+            limit = begin + MAX_WINDOW_BYTES
+            if finish > limit:
+                # Whole lines only, unless top itself does not fit
+                finish = self.data.rfind(b'\n', begin, limit) + 1 or limit
+            else:
+                cut = False
+        # A character cut at the end is left out rather than replaced
+        decoder = codecs.getincrementaldecoder(self.encoding)('replace')
+        text = decoder.decode(self.data[begin:finish], final=not cut)
+        if text.endswith('\n'):
+            text = text[:-1]
+
+        self._rendering = True
+        self.textbox.config(state='normal')
+        self.textbox.delete('1.0', 'end')
+        self.textbox.insert('1.0', text)
+        self.textbox.config(state='disabled')
+        self._rendering = False
+        self.window_start = start
+        self.window_end = start + text.count('\n') + 1
+        self.window_cut = cut
+        self.window_top = top
+
+    def _on_text_scrolled(self, first, last):
+        """Follow scrolling done by the text widget itself (mouse wheel,
+           cursor keys) and slide the window before it runs out
+        """
+        if self._rendering or self.data is None:
+            return
+        text_top = int(self.textbox.index('@0,0').split('.')[0])
+        top = self.file_line(text_top) - 1
+        rows = self.visible_rows()
+        near_start = self.window_start > 0 and \
+            top - self.window_start < MARGIN // 2
+        near_end = self.window_end < self.index.line_count() and \
+            self.window_end - (top + rows) < MARGIN // 2
+        if near_start or near_end:
+            self.scroll_to(top)
+        else:
+            self.top = top
+            self._update_scrollbar()
+
+    def _update_scrollbar(self):
+        """Position the scrollbar relative to the whole file"""
+        total = self.index.line_count()
+        rows = self.visible_rows()
+        self.tab.yscrollbar.set(self.top / total,
+                                min((self.top + rows) / total, 1.0))
+
+    def size(self):
+        """Size of the file in bytes"""
+        return os.path.getsize(self.file_path)
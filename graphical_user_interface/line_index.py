@@ -0,0 +1,246 @@
+#!/usr/bin/env python3
+"""Module to define the per-tab line index"""
+
+from charset import bom_size, byte_length
+
+# Lines per block; blocks are split when they grow past twice this size
+BLOCK_SIZE = 512
+
+
+class _Totals:
+    """Binary indexed tree of per-block totals: prefix sums and the
+       block holding a given position both take O(log n)
+    """
+    def __init__(self, values=()):
+        self.build(values)
+
+    def build(self, values):
+        """Rebuild from a list of per-block totals"""
+        self.values = list(values)
+        self.tree = [0] * (len(self.values) + 1)
+        for index, value in enumerate(self.values, 1):
+            self.tree[index] += value
+            parent = index + (index & -index)
+            if parent <= len(self.values):
+                self.tree[parent] += self.tree[index]
+
+    def set(self, index, value):
+        """Change the total of one block"""
+        delta = value - self.values[index]
+        self.values[index] = value
+        index += 1
+        while index < len(self.tree):
+            self.tree[index] += delta
+            index += index & -index
+
+    def prefix(self, count):
+        """Sum of the totals of the first count blocks"""
+        total = 0
+        while count > 0:
+            total += self.tree[count]
+            count -= count & -count
+        return total
+
+    def total(self):
+        """Sum of every block"""
+        return self.prefix(len(self.values))
+
+    def find(self, position):
+        """Block holding position (0-based) and the sum of the blocks
+           before it; the last block when position is past the end
+        """
+        index = 0
+        before = 0
+        step = 1 << len(self.values).bit_length()
+        while step:
+            following = index + step
+            if following <= len(self.values) and \
+                    before + self.tree[following] <= position:
+                index = following
+                before += self.tree[following]
+            step >>= 1
+        if index >= len(self.values):
+            index = len(self.values) - 1
+            before -= self.values[index]
+        return index, before
+
+
+class LineIndex:
+    """Lengths of every line (newline included) in characters and in
+       bytes of the file's encoding, kept in blocks with per-block
+       totals, so Tk "line.column" positions map to character and byte
+       offsets in O(log n) without asking Tk to count anything. Byte
+       offsets count the byte order mark, if the encoding writes one
+    """
+    def __init__(self, text='', encoding='utf-8'):
+        self.reset(text, encoding)
+
+    def reset(self, text='', encoding=None):
+        """Rebuild the index from a whole document, in a new encoding
+           if one is given
+        """
+        if encoding is not None:
+            self.encoding = encoding
+            self._bom = bom_size(encoding)
+            self._newline = byte_length('\n', encoding)
+        lines = text.split('\n')
+        lines = [line + '\n' for line in lines[:-1]] + lines[-1:]
+        lengths = [len(line) for line in lines]
+        sizes = [self._bytes(line) for line in lines]
+        self._blocks = [lengths[i:i + BLOCK_SIZE]
+                        for i in range(0, len(lengths), BLOCK_SIZE)]
+        self._byte_blocks = [sizes[i:i + BLOCK_SIZE]
+                             for i in range(0, len(sizes), BLOCK_SIZE)]
+        self._rebuild()
+
+    def _bytes(self, text):
+        return byte_length(text, self.encoding)
+
+    def _rebuild(self):
+        """Recompute every per-block total"""
+        self._counts = _Totals(len(block) for block in self._blocks)
+        self._sums = _Totals(sum(block) for block in self._blocks)
+        self._byte_sums = _Totals(sum(block) for block in self._byte_blocks)
+        self._count = self._counts.total()
+
+    def line_count(self):
+        """Number of lines in the document"""
+        return self._count
+
+    def __len__(self):
+        return self._sums.total()
+
+    def byte_size(self):
+        """Size of the document in bytes"""
+        return self._bom + self._byte_sums.total()
+
+    def _locate(self, line):
+        """Block and position inside it of the 1-based line"""
+        line = min(max(line, 1), self._count) - 1
+        block, before = self._counts.find(line)
+        return block, line - before
+
+    def line_length(self, line):
+        """Length of the 1-based line, newline included"""
+        block, pos = self._locate(line)
+        return self._blocks[block][pos]
+
+    def line_bytes(self, line):
+        """Size in bytes of the 1-based line, newline included"""
+        block, pos = self._locate(line)
+        return self._byte_blocks[block][pos]
+
+    def line_start(self, line):
+        """Character offset where the 1-based line starts"""
+        block, pos = self._locate(line)
+        return self._sums.prefix(block) + sum(self._blocks[block][:pos])
+
+    def line_start_byte(self, line):
+        """Byte offset where the 1-based line starts"""
+        block, pos = self._locate(line)
+        return self._bom + self._byte_sums.prefix(block) + \
+            sum(self._byte_blocks[block][:pos])
+
+    def offset(self, line, column):
+        """Character offset of a Tk "line.column" position"""
+        return self.line_start(line) + column
+
+    def byte_offset(self, line, prefix):
+        """Byte offset of the position after prefix, the text of the
+           1-based line before the position
+        """
+        return self.line_start_byte(line) + self._bytes(prefix)
+
+    def _find(self, sums, blocks, offset):
+        """(line, offset inside it) of an offset counted with sums"""
+        offset = min(max(offset, 0), sums.total())
+        block, before = sums.find(offset)
+        offset -= before
+        line = self._counts.prefix(block) + 1
+        for length in blocks[block]:
+            if offset < length or line == self._count:
+                return line, offset
+            offset -= length
+            line += 1
+        return line, offset
+
+    def position(self, offset):
+        """Tk (line, column) of a character offset"""
+        return self._find(self._sums, self._blocks, offset)
+
+    def byte_position(self, offset):
+        """(line, byte inside the line) of a byte offset"""
+        return self._find(self._byte_sums, self._byte_blocks,
+                          offset - self._bom)
+
+    def _replace(self, line, count, lengths, sizes):
+        """Replace count lines starting at the 1-based line"""
+        block, pos = self._locate(line)
+        rows = self._blocks[block]
+        byte_rows = self._byte_blocks[block]
+        end = pos + count
+        rebuild = False
+        # The replaced lines may run into the following blocks
+        while end > len(rows) and block + 1 < len(self._blocks):
+            rows.extend(self._blocks.pop(block + 1))
+            byte_rows.extend(self._byte_blocks.pop(block + 1))
+            rebuild = True
+        rows[pos:end] = lengths
+        byte_rows[pos:end] = sizes
+        if len(rows) > 2 * BLOCK_SIZE:
+            self._blocks[block:block + 1] = [
+                rows[i:i + BLOCK_SIZE]
+                for i in range(0, len(rows), BLOCK_SIZE)]
+            self._byte_blocks[block:block + 1] = [
+                byte_rows[i:i + BLOCK_SIZE]
+                for i in range(0, len(byte_rows), BLOCK_SIZE)]
+            rebuild = True
+        if rebuild:
+            self._rebuild()
+            return
+        self._counts.set(block, len(rows))
+        self._sums.set(block, sum(rows))
+        self._byte_sums.set(block, sum(byte_rows))
+        self._count += len(lengths) - count
+
+    def insert(self, line, column, text, get_prefix=None):
+        """Update the index for text inserted at "line.column".
+           get_prefix() returns the text of the line before column; it
+           is only needed to split lines holding non-ASCII characters
+        """
+        if not text:
+            return
+        parts = text.split('\n')
+        old = self.line_length(line)
+        old_bytes = self.line_bytes(line)
+        if len(parts) == 1:
+            self._replace(line, 1, [old + len(text)],
+                          [old_bytes + self._bytes(text)])
+            return
+        # One code unit per character unless the line says otherwise
+        prefix_bytes = column * self._newline
+        if old_bytes != old * self._newline and get_prefix is not None:
+            prefix_bytes = self._bytes(get_prefix())
+        lengths = [column + len(parts[0]) + 1]
+        lengths.extend(len(part) + 1 for part in parts[1:-1])
+        lengths.append(old - column + len(parts[-1]))
+        newline = self._newline
+        sizes = [prefix_bytes + self._bytes(parts[0]) + newline]
+        sizes.extend(self._bytes(part) + newline for part in parts[1:-1])
+        sizes.append(old_bytes - prefix_bytes + self._bytes(parts[-1]))
+        self._replace(line, 1, lengths, sizes)
+
+    def delete(self, line1, column1, line2, column2, text=None):
+        """Update the index for text, the text between two positions,
+           removed; without it the text is taken to be ASCII
+        """
+        merged = column1 + self.line_length(line2) - column2
+        if text is None:
+            removed = (self.offset(line2, column2) -
+                       self.offset(line1, column1)) * self._newline
+        else:
+            removed = self._bytes(text)
+        old_bytes = self.line_start_byte(line2) + self.line_bytes(line2) - \
+            self.line_start_byte(line1)
+        self._replace(line1, line2 - line1 + 1, [merged],
+                      [old_bytes - removed])
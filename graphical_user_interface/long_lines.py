@@ -0,0 +1,219 @@
+#!/usr/bin/env python3
+"""Module to show very long lines as rows of bounded length"""
+
+from bisect import bisect_left, insort
+from collections import deque
+
+# A loaded line longer than this turns long-line mode on (characters)
+LONG_LINE = 4096
+
+# Characters shown per row of a long line
+SEGMENT_LENGTH = 1000
+
+# Deletes of soft breaks remembered so undo can put them back as such
+MAX_TOMBSTONES = 256
+
+
+def has_long_line(text, column=0):
+    """Whether text, starting at column of its first line, holds a line
+       longer than LONG_LINE
+    """
+    start = 0
+    while True:
+        end = text.find('\n', start)
+        length = (len(text) if end < 0 else end) - start
+        if column + length > LONG_LINE:
+            return True
+        if end < 0:
+            return False
+        start = end + 1
+        column = 0
+
+
+def segment(text, column=0, limit=SEGMENT_LENGTH):
+    """Text with a newline added wherever a line would pass limit, given
+       it starts at column of its first line; returns the new text and
+       the positions of the added newlines in it
+    """
+    parts = []
+    soft = []
+    length = 0
+    for index, line in enumerate(text.split('\n')):
+        if index:
+            parts.append('\n')
+            length += 1
+            column = 0
+        pos = 0
+        while len(line) - pos > max(limit - column, 0):
+            take = max(limit - column, 0)
+            parts.append(line[pos:pos + take])
+            length += take
+            parts.append('\n')
+            soft.append(length)
+            length += 1
+            pos += take
+            column = 0
+        parts.append(line[pos:])
+        length += len(line) - pos
+        column += len(line) - pos
+    return ''.join(parts), soft
+
+
+class SoftBreaks:
+    """Character offsets, in the text widget, of the newlines that are
+       only there for display. Widget offsets map to document offsets
+       by skipping them
+    """
+    def __init__(self, breaks=()):
+        self.breaks = list(breaks)
+
+    def __len__(self):
+        return len(self.breaks)
+
+    def count_before(self, offset):
+        """Soft breaks before the widget offset"""
+        return bisect_left(self.breaks, offset)
+
+    def to_document(self, offset):
+        """Document offset of a widget offset"""
+        return offset - bisect_left(self.breaks, offset)
+
+    def to_widget(self, offset):
+        """Widget offset of a document offset; at a soft break, the start
+           of the row after it
+        """
+        # breaks[i] - i, the document offset of break i, never decreases
+        low, high = 0, len(self.breaks)
+        while low < high:
+            middle = (low + high) // 2
+            if self.breaks[middle] - middle <= offset:
+                low = middle + 1
+            else:
+                high = middle
+        return offset + low
+
+    def inserted(self, offset, length, soft=()):
+        """length characters were inserted at the widget offset, the ones
+           at the positions soft (relative to offset) being soft breaks
+        """
+        index = bisect_left(self.breaks, offset)
+        self.breaks[index:] = [pos + length for pos in self.breaks[index:]]
+        for pos in soft:
+            insort(self.breaks, offset + pos)
+
+    def deleted(self, start, end):
+        """Widget offsets start to end were deleted; returns the positions
+           (relative to start) of the soft breaks that went with them
+        """
+        first = bisect_left(self.breaks, start)
+        last = bisect_left(self.breaks, end)
+        removed = [pos - start for pos in self.breaks[first:last]]
+        self.breaks[first:] = [pos - (end - start)
+                               for pos in self.breaks[last:]]
+        return removed
+
+
+def strip_soft(text, soft):
+    """text without the characters at the positions soft"""
+    if not soft:
+        return text
+    parts = []
+    pos = 0
+    for index in soft:
+        parts.append(text[pos:index])
+        pos = index + 1
+    parts.append(text[pos:])
+    return ''.join(parts)
+
+
+class LongLines:
+    """Long-line mode of a tab. Lines are cut into rows of at most
+       SEGMENT_LENGTH characters by newlines that exist only in the text
+       widget: the tab's document, and so every save, never sees them.
+       Copying takes the text from the document for the same reason
+    """
+    def __init__(self, tab):
+        self.tab = tab
+        self.textbox = tab.textbox
+        self.breaks = SoftBreaks()
+        self.expected = None    # (text, soft) of an insert we are making
+        self.tombstones = deque(maxlen=MAX_TOMBSTONES)
+        self._bindings = [
+            ('<<Copy>>', self.textbox.bind('<<Copy>>', self.copy)),
+            ('<<Cut>>', self.textbox.bind('<<Cut>>', self.cut)),
+        ]
+
+    def detach(self):
+        """Leave long-line mode"""
+        for sequence, binding in self._bindings:
+            self.textbox.unbind(sequence, binding)
+        self._bindings = []
+
+    def reset(self, text=''):
+        """Forget the soft breaks; returns text cut into rows, to be put
+           in the widget behind the edit hooks
+        """
+        shown, soft = segment(text)
+        self.breaks = SoftBreaks(soft)
+        self.tombstones.clear()
+        return shown
+
+    def insert(self, index, text):
+        """Insert document text at a widget index, cut into rows; returns
+           the widget index after it
+        """
+        index = self.textbox.index(index)
+        shown, soft = segment(text, int(index.split('.')[1]))
+        self.expected = (shown, soft)
+        try:
+            self.textbox.insert(index, shown)
+        finally:
+            self.expected = None
+        return self.textbox.index(f'{index} + {len(shown)}c')
+
+    def edited(self, action, offset, text, undoing=False):
+        """Translate an edit at a widget offset into the document; returns
+           the document offset and the document text of the edit
+        """
+        position = self.breaks.to_document(offset)
+        if action == 'insert':
+            soft = ()
+            if self.expected is not None and self.expected[0] == text:
+                soft = self.expected[1]
+            elif undoing and '\n' in text:
+                # Undo puts deleted soft breaks back
+                for tombstone in self.tombstones:
+                    if tombstone[:2] == (offset, text):
+                        soft = tombstone[2]
+                        break
+            self.breaks.inserted(offset, len(text), soft)
+            return position, strip_soft(text, soft)
+        soft = self.breaks.deleted(offset, offset + len(text))
+        if soft:
+            self.tombstones.append((offset, text, soft))
+        return position, strip_soft(text, soft)
+
+    def _selection(self):
+        """Document text of the selection, or None"""
+        ranges = self.textbox.tag_ranges('sel')
+        if not ranges:
+            return None
+        start = self.tab.document_offset(
+            *map(int, str(ranges[0]).split('.')))
+        end = self.tab.document_offset(*map(int, str(ranges[1]).split('.')))
+        return self.tab.document.slice(start, end)
+
+    def copy(self, event=None):
+        """Copy the selection without the soft breaks"""
+        text = self._selection()
+        if text is not None:
+            self.textbox.clipboard_clear()
+            self.textbox.clipboard_append(text)
+        return 'break'
+
+    def cut(self, event=None):
+        """Cut the selection without the soft breaks"""
+        if self._selection() is not None:
+            self.copy()
+            self.textbox.delete('sel.first', 'sel.last')
+        return 'break'
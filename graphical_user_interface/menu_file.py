@@ -3,9 +3,18 @@
 
 from tkinter import filedialog
 import tkinter.messagebox as messagebox
+import tkinter.simpledialog as simpledialog
 import tkinter as tk
 from tkinter import ttk
 import os
+from save_engine import SaveBatch, format_size
+from diagnostics import DiagnosticsWindow, get_diagnostics
+from find_replace import open_find_bar
+from styles import get_styles
+from charset import byte_length, fitting_chars
+
+# Status bar repaints are coalesced to at most one per frame (ms)
+STATUS_BAR_DELAY = 16
 
 
 def create_menu(root, editor):
@@ -67,6 +76,14 @@ def create_menu(root, editor):
         state='disabled'
         )
     editmenu.add_separator()
+    editmenu.add_command(
+        label="Find/Replace   Ctrl+F",
+        command=lambda: open_find_bar(editor)
+    )
+    editmenu.add_command(
+        label="Go to Line...   Ctrl+G",
+        command=lambda: go_to_line(editor)
+    )
     editmenu.add_command(
         label="Explain with chatGPT",
         command=lambda:
@@ -110,11 +127,16 @@ def create_menu(root, editor):
                              command=lambda: toggle_status_bar(editor))
     viewmenu.add_checkbutton(label="Word Wrap",
                              command=lambda: toggle_word_wrap(editor))
+    if get_diagnostics().installed:
+        viewmenu.add_separator()
+        viewmenu.add_command(
+            label="Diagnostics",
+            command=lambda: DiagnosticsWindow(root, get_diagnostics()))
     menubar.add_cascade(label="View", menu=viewmenu)
 
     # Bind cursor movement event
     editor.current_tab().textbox.bind(
-        "<Motion>", lambda event: update_status_bar(editor, editor.status_bar)
+        "<Motion>", lambda event: schedule_status_bar_update(editor)
         )
 
     # File Menu Keyboard bindings
@@ -128,28 +150,21 @@ def create_menu(root, editor):
     root.bind_all("<Control-Shift-W>", lambda event: close_window(editor))
     root.bind_all("<Control-q>", lambda event: exit_editor(editor))
 
+    # Edit Menu Keyboard bindings
+    root.bind_all("<Control-f>", lambda event: open_find_bar(editor))
+    root.bind_all("<Control-g>", lambda event: go_to_line(editor))
+
 
 def change_font(editor, font_name):
-    """Function that changes font type"""
-    current_tab = editor.current_tab()
-    current_font = current_tab.textbox['font']
-    current_font = current_font.split()[:]
-    # print("Current Font:", current_font)
-    if len(current_font) == 4:
-        current_font_size = current_font[3]
-    elif len(current_font) == 3:
-        current_font_size = current_font[2]
-    else:
-        current_font_size = current_font[1]
-    current_tab.textbox.config(font=(font_name, current_font_size))
+    """Function that changes font type of every tab"""
+    get_styles().set_font(family=font_name)
+    editor.current_tab().apply_style()
 
 
 def change_font_size(editor, font_size):
-    """Function that changes font size"""
-    current_tab = editor.current_tab()
-    current_font = current_tab.textbox['font']
-    current_font_name = ' '.join(current_font.split()[1:])  # Extract font name
-    current_tab.textbox.config(font=(current_font_name, font_size))
+    """Function that changes font size of every tab"""
+    get_styles().set_font(size=font_size)
+    editor.current_tab().apply_style()
 
 
 def close_window(root):
@@ -166,67 +181,162 @@ def open_file(editor):
     """Function to open an existing file"""
     file_path = filedialog.askopenfilename()
     if file_path:
-        with open(file_path, 'r') as file:
-            content = file.read()
         tab = editor.current_tab()
+        tab.close()
         tab.textbox.delete('1.0', tk.END)
-        tab.textbox.insert('1.0', content)
         # Update tab name to reflect the file name
         tab.file_dir = file_path
         tab.file_name = os.path.basename(file_path)
         editor.tab(editor.select(), text=tab.file_name)
+        # Stream the file in so large files don't freeze the window
+        tab.load_file_content()
+
+
+def save_tab(editor, tab, file_path, batch=None):
+    """Write a tab's document to file_path on the save engine's worker
+       threads and return the Future of the write. Saves belonging to a
+       batch report to it instead of the status bar
+    """
+    snapshot = tab.snapshot()
+
+    def done(future):
+        error = future.exception()
+        if not error and tab.winfo_exists():
+            tab.mark_saved(future.result())
+        if batch is not None:
+            batch.add(file_path, future)
+        elif error:
+            messagebox.showerror("Save failed",
+                                 f"Could not save {file_path}:\n{error}")
+        else:
+            report_save(editor, future.result())
+    return editor.save_engine.submit(snapshot, file_path,
+                                     tab.document.version, on_done=done,
+                                     encoding=tab.encoding)
+
+
+def report_save(editor, result):
+    """Show a finished save in the status bar"""
+    if editor.status_bar is not None:
+        name = os.path.basename(result.file_path)
+        editor.status_bar.config(
+            text=f"Saved {name} ({result.size / 1024:.1f} KB in "
+            f"{result.seconds:.2f} s)")
 
 
 def save_file(editor):
-    """Function to save the characters inserted into the text editor"""
+    """Function to save the characters inserted into the text editor.
+       Returns the Future of the background write, or None if nothing
+       was written
+    """
     tab = editor.current_tab()
+    if tab.is_read_only():
+        return None
     if tab.file_dir:  # Check if file_dir is set (file has been saved before)
-        content = tab.textbox.get('1.0', tk.END)
-        with open(tab.file_dir, 'w') as file:
-            file.write(content)
+        # Nothing to write when the file on disk is up to date
+        if not tab.is_modified() and os.path.exists(tab.file_dir):
+            return None
+        if not confirm_overwrite(tab):
+            return None
+        return save_tab(editor, tab, tab.file_dir)
     else:  # File is being saved for the first time
         if tab.file_name == 'Untitled' or tab.file_name is None:
-            save_as(editor)
+            return save_as(editor)
         else:
             # File has been renamed, save without opening file dialog
             file_path = os.path.join(
                 os.path.dirname(tab.file_dir), tab.file_name
                 )
-            content = tab.textbox.get('1.0', tk.END)
-            with open(file_path, 'w') as file:
-                file.write(content)
             tab.file_dir = file_path  # Update file_dir with the new path
             editor.tab(editor.select(), text=tab.file_name)  # Update tab name
+            return save_tab(editor, tab, file_path)
+
+
+def confirm_overwrite(tab):
+    """Ask before saving over changes another program made to the file"""
+    if not tab.changed_on_disk():
+        return True
+    return messagebox.askyesno(
+        "File changed on disk",
+        f"{tab.file_name} was changed by another program since it was "
+        "loaded. Overwrite those changes?")
 
 
 def save_as(editor):
     """Function to save an open file with a different name
        in a different directory
     """
+    if editor.current_tab().is_read_only():
+        return None
     file_path = filedialog.asksaveasfilename(defaultextension=".txt")
     if file_path:
         tab = editor.current_tab()
-        content = tab.textbox.get('1.0', tk.END)
-        with open(file_path, 'w') as file:
-            file.write(content)
         # Update tab attributes with new file information
         tab.file_dir = file_path
         tab.file_name = os.path.basename(file_path)
         editor.tab(editor.select(), text=tab.file_name)
+        tab.update_highlighter()
+        return save_tab(editor, tab, file_path)
+    return None
 
 
 def save_all(editor):
     """Function that saves all the content of all the tabs
-       open in the text editor
+       open in the text editor. Only tabs with changes are written, all
+       at the same time; untitled tabs are asked for a name one by one
+       first. Returns the Futures of the writes
     """
+    jobs = []
     for tab_id in editor.tabs():
         tab = editor.nametowidget(tab_id)
-        if tab.file_dir:
-            content = tab.textbox.get('1.0', tk.END)
-            with open(tab.file_dir, 'w') as file:
-                file.write(content)
-        else:
-            save_as(editor)
+        if tab.is_read_only():
+            continue
+        if tab.is_untitled():
+            if not tab.is_modified():
+                continue
+            # Show the tab being named
+            editor.select(tab_id)
+            file_path = filedialog.asksaveasfilename(
+                defaultextension=".txt",
+                title=f"Save {editor.tab(tab_id, 'text')} As")
+            if not file_path:
+                continue
+            tab.file_dir = file_path
+            tab.file_name = os.path.basename(file_path)
+            editor.tab(tab_id, text=tab.file_name)
+            tab.update_highlighter()
+        elif not tab.is_modified() and os.path.exists(tab.file_dir):
+            continue
+        elif not confirm_overwrite(tab):
+            continue
+        jobs.append((tab, tab.file_dir))
+    if not jobs:
+        return []
+
+    batch = SaveBatch(len(jobs), lambda batch: report_save_all(editor, batch))
+    return [save_tab(editor, tab, file_path, batch)
+            for tab, file_path in jobs]
+
+
+def report_save_all(editor, batch):
+    """Show the throughput and per-file results of Save All"""
+    if editor.status_bar is not None:
+        editor.status_bar.config(text=batch.summary())
+    if len(batch.results) == 1 and not batch.errors:
+        return
+    window = tk.Toplevel(editor)
+    window.title("Save All")
+    ttk.Label(window, text=batch.summary()).pack(side='top', fill='x',
+                                                 padx=10, pady=5)
+    report = tk.Text(window, height=15, width=100, wrap='none')
+    report.pack(fill='both', expand=True)
+    for file_path, error in batch.errors:
+        report.insert('end', f"FAILED  {file_path}: {error}\n")
+    for result in batch.results:
+        report.insert('end', f"OK      {result.file_path} "
+                      f"({format_size(result.size)}, "
+                      f"{result.seconds:.2f} s)\n")
+    report.config(state='disabled')
 
 
 def close_tab(editor):
@@ -240,31 +350,45 @@ def close_tab(editor):
         if confirm_close:
             save_file(editor)
         else:
-            editor.forget(editor.select())
+            editor.release_tab(current_tab)
     else:
-        editor.forget(editor.select())
+        editor.release_tab(current_tab)
 
 
 def exit_editor(editor):
     """Close the entire window of the text editor"""
-    current_tab = editor.current_tab()
-    if has_unsaved_changes(current_tab):
-        confirm_close = messagebox.askyesno(
+    saving = False
+    saved = set()
+    if any(has_unsaved_changes(editor.nametowidget(tab_id))
+           for tab_id in editor.tabs()):
+        saving = messagebox.askyesno(
             "Unsaved Changes, "
             "There are unsaved changes. "
             "Do you want to save before exiting?"
             )
-        if confirm_close:
-            save_all(editor)
-        editor.quit()
-    else:
-        editor.quit()
+        if saving:
+            futures = save_all(editor)
+            # Don't quit before the files are on disk
+            editor.save_engine.wait()
+            saved = {future.result().file_path for future in futures
+                     if not future.exception()}
+    for tab_id in editor.tabs():
+        tab = editor.nametowidget(tab_id)
+        if saving and has_unsaved_changes(tab) and not (
+                tab.file_dir and os.path.realpath(tab.file_dir) in saved):
+            # Not saved after all; the work stays recoverable
+            tab.journal.flush()
+            continue
+        # The user chose; nothing is left to recover
+        tab.journal.clear()
+    editor.quit()
 
 
 def has_unsaved_changes(tab):
     """Checks whether an open tab has unsaved changes"""
-    content = tab.textbox.get("1.0", "end-1c")
-    return content != tab.saved_content
+    if tab.is_read_only():
+        return False
+    return tab.is_modified()
 
 
 def update_edit_menu_state(editor, editmenu):
@@ -300,6 +424,7 @@ def toggle_status_bar(editor):
             tab.status_bar.pack(side='bottom', fill='x')
         # else:
             # tab.status_bar.pack_forget()
+    schedule_status_bar_update(editor)
 
 
 def create_status_bar(editor):
@@ -314,13 +439,82 @@ def create_status_bar(editor):
 
 def update_status_bar(editor, status_bar):
     """Updates the status bar dynamically"""
-    cursor_pos = editor.current_tab().textbox.index(tk.INSERT)
+    tab = editor.current_tab()
+    if tab.loader:
+        return  # The loader reports its progress there
+    cursor_pos = tab.textbox.index(tk.INSERT)
     line, column = map(int, cursor_pos.split('.'))
-    total_char = len(editor.current_tab().textbox.get('1.0', tk.END))
-    text = f"Line: {line}, Column: {column} | Total Characters: {total_char}"
+    if tab.large_file:
+        # Only a window of the file is in the widget
+        line = tab.large_file.file_line(line)
+        text = f"Line: {line}, Column: {column} | " \
+            f"Size: {tab.large_file.size()} bytes | " \
+            f"Encoding: {tab.large_file.encoding}"
+    else:
+        stats = tab.stats
+        offset = tab.lines.byte_offset(
+            line, tab.textbox.get(f'{line}.0', cursor_pos))
+        if tab.long_lines:
+            # Soft breaks are newlines in the widget, nothing on disk
+            offset -= tab.long_lines.breaks.count_before(
+                tab.lines.offset(line, column)) * byte_length('\n',
+                                                             tab.encoding)
+        text = f"Line: {line}, Column: {column} | Byte: {offset} | " \
+            f"Total Characters: {stats.chars} | Lines: {stats.lines} | " \
+            f"Words: {stats.words} | Encoding: {tab.encoding}"
     status_bar.config(text=text)
 
 
+def go_to_line(editor):
+    """Move the cursor to a line number, or to a byte offset in the
+       saved file when the answer starts with "b" (e.g. b1024)
+    """
+    tab = editor.current_tab()
+    if tab.is_read_only():
+        messagebox.showinfo("Go to Line",
+                            "Go to Line is not available for this file")
+        return
+    answer = simpledialog.askstring(
+        "Go to Line", f"Line (1-{tab.lines.line_count()}) or byte offset "
+        "(b<offset>):", parent=editor)
+    if not answer:
+        return
+    answer = answer.strip().lower()
+    try:
+        number = int(answer[1:] if answer.startswith('b') else answer)
+    except ValueError:
+        messagebox.showerror("Go to Line", f"Not a line number: {answer}")
+        return
+    if answer.startswith('b'):
+        line, byte = tab.lines.byte_position(number)
+        # The byte may fall inside a character; go to its start
+        column = fitting_chars(tab.textbox.get(f'{line}.0', f'{line}.end'),
+                               byte, tab.encoding)
+        index = f'{line}.{column}'
+    else:
+        line = min(max(number, 1), tab.lines.line_count())
+        index = f'{line}.0'
+    tab.textbox.mark_set(tk.INSERT, index)
+    tab.textbox.see(index)
+    tab.textbox.focus_set()
+    schedule_status_bar_update(editor)
+
+
+def schedule_status_bar_update(editor):
+    """Repaint the status bar at most once per frame, however many edits
+       and mouse motions ask for it in between
+    """
+    if getattr(editor, 'status_bar', None) is None or \
+            getattr(editor, 'status_after_id', None):
+        return
+
+    def repaint():
+        editor.status_after_id = None
+        if editor.status_bar.winfo_ismapped():
+            update_status_bar(editor, editor.status_bar)
+    editor.status_after_id = editor.after(STATUS_BAR_DELAY, repaint)
+
+
 def bind_status_bar_update(editor):
     """Bind cursor movement event to update status bar"""
     editor.textbox.bind(
@@ -330,14 +524,11 @@ def bind_status_bar_update(editor):
 
 def toggle_word_wrap(editor):
     """Toggle word wrap"""
-    current_value = editor.current_tab().textbox.cget('wrap')
-    new_value = 'none' if current_value == 'word' else 'word'
-    editor.current_tab().textbox.configure(wrap=new_value)
-
-    # Apply word wrap setting to all tabs
-    for tab_id in editor.tabs():
-        tab = editor.nametowidget(tab_id)
-        tab.textbox.configure(wrap=new_value)
+    styles = get_styles()
+    new_value = 'none' if styles.options['wrap'] == 'word' else 'word'
+    styles.set_options(wrap=new_value)
+    # The other tabs pick the setting up when they are selected
+    editor.current_tab().apply_style()
 
 
 def bind_right_click(editor):
@@ -0,0 +1,161 @@
+#!/usr/bin/env python3
+"""Module to keep one chatgpt.js process alive for all explain requests"""
+
+import base64
+from collections import deque
+import gzip
+import itertools
+import json
+import os
+import queue
+import subprocess
+import threading
+
+# Script that talks to the OpenAI API
+SCRIPT_PATH = os.path.join(
+    os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
+    'gpt-api', 'chatgpt.js')
+
+# Content of at least this many characters is sent gzipped
+COMPRESS_THRESHOLD = 64 * 1024
+
+# Fast compression: the pipe is local, the point is fewer bytes to copy
+COMPRESS_LEVEL = 1
+
+
+def encode_request(message):
+    """One protocol line for a request; large content is sent gzipped
+       as base64 with "contentEncoding": "gzip+base64"
+    """
+    content = message.get('fileContent')
+    if content is not None and len(content) >= COMPRESS_THRESHOLD:
+        data = gzip.compress(content.encode('utf-8', 'replace'),
+                             COMPRESS_LEVEL)
+        message = dict(message, contentEncoding='gzip+base64',
+                       fileContent=base64.b64encode(data).decode('ascii'))
+    return json.dumps(message).encode() + b'\n'
+
+
+class NodeWorker:
+    """Runs chatgpt.js in server mode and multiplexes requests over its
+       stdin/stdout as newline-delimited JSON tagged with request ids.
+       Handlers are called on the reader thread with every message of
+       their request; a worker that dies fails the requests it owned and
+       is restarted by the next request.
+    """
+    def __init__(self, script_path=None):
+        self.script_path = script_path
+        self.lock = threading.Lock()
+        self.process = None
+        self.outbox = None
+        self.handlers = {}      # request id: (owning process, handler)
+        self.ids = itertools.count(1)
+
+    def _start(self):
+        """Start the node process with its reader and writer threads"""
+        process = subprocess.Popen(
+            ['node', self.script_path or SCRIPT_PATH, '--server'],
+            stdin=subprocess.PIPE,
+            stdout=subprocess.PIPE,
+            stderr=subprocess.PIPE)
+        errors = deque(maxlen=20)
+        outbox = queue.Queue()
+        threading.Thread(target=self._write, args=(process, outbox),
+                         daemon=True).start()
+        threading.Thread(target=self._read, args=(process, outbox, errors),
+                         daemon=True).start()
+        threading.Thread(target=self._read_errors, args=(process, errors),
+                         daemon=True).start()
+        self.process = process
+        self.outbox = outbox
+
+    def request(self, payload, handler):
+        """Send a request and return its id; handler(message) receives
+           the {"token"}, {"done"} or {"error"} messages for it
+        """
+        with self.lock:
+            if self.process is None or self.process.poll() is not None:
+                self._start()
+            request_id = next(self.ids)
+            self.handlers[request_id] = (self.process, handler)
+            self.outbox.put(dict(payload, id=request_id))
+        return request_id
+
+    def cancel(self, request_id):
+        """Ask the worker to abort a request"""
+        with self.lock:
+            owner, _ = self.handlers.pop(request_id, (None, None))
+            if owner is not None and owner is self.process:
+                self.outbox.put({'id': request_id, 'cancel': True})
+
+    def _write(self, process, outbox):
+        """Writer thread: large payloads never block the Tk thread"""
+        while True:
+            message = outbox.get()
+            if message is None:
+                break
+            try:
+                process.stdin.write(encode_request(message))
+                process.stdin.flush()
+            except OSError:
+                break
+
+    def _read(self, process, outbox, errors):
+        """Reader thread: route each response to its request's handler"""
+        for line in process.stdout:
+            try:
+                message = json.loads(line)
+            except ValueError:
+                continue
+            final = 'done' in message or 'error' in message
+            with self.lock:
+                _, handler = self.handlers.get(message.get('id'),
+                                               (None, None))
+                if final:
+                    self.handlers.pop(message.get('id'), None)
+            if handler:
+                handler(message)
+        process.wait()
+
+        # The worker died: fail whatever it was still working on, even
+        # if a request has already started its replacement
+        outbox.put(None)
+        with self.lock:
+            if self.process is process:
+                self.process = None
+                self.outbox = None
+            failed = [request_id for request_id, (owner, _)
+                      in self.handlers.items() if owner is process]
+            handlers = [self.handlers.pop(request_id)[1]
+                        for request_id in failed]
+        error = '\n'.join(errors) or \
+            f"node exited with status {process.returncode}"
+        for handler in handlers:
+            handler({'error': error})
+
+    def _read_errors(self, process, errors):
+        """Keep the last lines node wrote to stderr"""
+        for line in process.stderr:
+            errors.append(line.decode(errors='replace').rstrip())
+
+    def close(self):
+        """Stop the worker process"""
+        with self.lock:
+            process, self.process = self.process, None
+            if self.outbox:
+                self.outbox.put(None)
+                self.outbox = None
+        if process and process.poll() is None:
+            process.stdin.close()
+            process.terminate()
+
+
+_worker = None
+
+
+def get_worker():
+    """The worker shared by every tab"""
+    global _worker
+    if _worker is None:
+        _worker = NodeWorker()
+    return _worker
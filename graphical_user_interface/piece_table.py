@@ -0,0 +1,192 @@
+#!/usr/bin/env python3
+"""Module to define the piece-table document model kept behind each Tab"""
+
+from hashlib import blake2b
+
+# Appended fragments grow in place up to this size while typing
+FRAGMENT_LIMIT = 4096
+
+# Merge the piece list back into one buffer beyond this many pieces
+COMPACT_LIMIT = 8192
+
+# Documents up to this many characters are hashed when saved, so editing
+# them back to their saved content clears the dirty state
+VERIFY_LIMIT = 4 * 1024 * 1024
+
+
+def digest_chunks(chunks):
+    """Content hash of a document given as a sequence of strings"""
+    hasher = blake2b(digest_size=16)
+    for chunk in chunks:
+        hasher.update(chunk.encode('utf-8', 'surrogatepass'))
+    return hasher.digest()
+
+
+class PieceTable:
+    """Piece table over an original buffer and appended fragments.
+       Each piece is a (buffer, start, length) tuple; buffer 0 is the
+       original text and every other buffer holds inserted text.
+    """
+    def __init__(self, original=''):
+        self.version = 0
+        self._digest = None
+        self.reset(original)
+
+    def reset(self, original=''):
+        """Replace the whole document"""
+        self._buffers = [original]
+        self._pieces = [(0, 0, len(original))] if original else []
+        self._length = len(original)
+        self._digest = None
+        self.version += 1
+
+    def __len__(self):
+        return self._length
+
+    def _find(self, offset):
+        """Index of the piece holding offset and the offset inside it.
+           An inner offset of 0 means offset falls before that piece.
+        """
+        pos = 0
+        for index, (_, _, length) in enumerate(self._pieces):
+            if offset < pos + length:
+                return index, offset - pos
+            pos += length
+        return len(self._pieces), 0
+
+    def insert(self, offset, text):
+        """Insert text at the character offset"""
+        if not text:
+            return
+        offset = min(max(offset, 0), self._length)
+        index, inner = self._find(offset)
+        self._length += len(text)
+        self.version += 1
+
+        # Typing appends to the previous piece instead of adding a new one
+        if inner == 0 and index > 0:
+            buf, start, length = self._pieces[index - 1]
+            last = len(self._buffers) - 1
+            if buf == last and buf != 0 and \
+                    start + length == len(self._buffers[buf]) and \
+                    len(self._buffers[buf]) < FRAGMENT_LIMIT:
+                self._buffers[buf] += text
+                self._pieces[index - 1] = (buf, start, length + len(text))
+                return
+
+        self._buffers.append(text)
+        piece = (len(self._buffers) - 1, 0, len(text))
+        if inner == 0:
+            self._pieces.insert(index, piece)
+        else:
+            buf, start, length = self._pieces[index]
+            self._pieces[index:index + 1] = [
+                (buf, start, inner),
+                piece,
+                (buf, start + inner, length - inner)
+            ]
+        self._maybe_compact()
+
+    def delete(self, offset, length):
+        """Delete length characters starting at the character offset"""
+        offset = min(max(offset, 0), self._length)
+        end = min(offset + length, self._length)
+        if end <= offset:
+            return
+        first, inner = self._find(offset)
+        kept = []
+        if inner:
+            buf, start, _ = self._pieces[first]
+            kept.append((buf, start, inner))
+        pos = offset - inner
+        last = first
+        while last < len(self._pieces):
+            buf, start, size = self._pieces[last]
+            if pos + size > end:
+                skip = end - pos
+                kept.append((buf, start + skip, size - skip))
+                last += 1
+                break
+            pos += size
+            last += 1
+            if pos == end:
+                break
+        self._pieces[first:last] = kept
+        self._length -= end - offset
+        self.version += 1
+        self._maybe_compact()
+
+    def _maybe_compact(self):
+        """Keep piece lookups cheap after long editing sessions"""
+        if len(self._pieces) > COMPACT_LIMIT:
+            version = self.version
+            self.reset(self.text())
+            self.version = version + 1
+
+    def chunks(self):
+        """Yield the document as a sequence of strings"""
+        buffers = self._buffers
+        for buf, start, length in self._pieces:
+            yield buffers[buf][start:start + length]
+
+    def text(self):
+        """The whole document as one string"""
+        return ''.join(self.chunks())
+
+    def slice(self, start, end):
+        """Text between two character offsets"""
+        parts = []
+        pos = 0
+        for chunk in self.chunks():
+            if pos >= end:
+                break
+            if pos + len(chunk) > start:
+                parts.append(chunk[max(start - pos, 0):end - pos])
+            pos += len(chunk)
+        return ''.join(parts)
+
+    def snapshot(self):
+        """Immutable view of the current document, cheap to take.
+           Buffers are never modified in place, only rebound, so the
+           captured strings stay valid while the table keeps changing.
+        """
+        return DocumentSnapshot(
+            [(self._buffers[buf], start, length)
+             for buf, start, length in self._pieces],
+            self._length)
+
+    def digest(self):
+        """Content hash of the document, cached until the next edit"""
+        if self._digest is None or self._digest[0] != self.version:
+            self._digest = (self.version, digest_chunks(self.chunks()))
+        return self._digest[1]
+
+    def equals(self, text):
+        """Compare with a string without building the document"""
+        if text is None or len(text) != self._length:
+            return False
+        pos = 0
+        for chunk in self.chunks():
+            if text[pos:pos + len(chunk)] != chunk:
+                return False
+            pos += len(chunk)
+        return True
+
+
+class DocumentSnapshot:
+    """Frozen piece list, safe to read from another thread"""
+    def __init__(self, pieces, length):
+        self._pieces = pieces
+        self._length = length
+
+    def __len__(self):
+        return self._length
+
+    def chunks(self):
+        """Yield the document as a sequence of strings"""
+        for buffer, start, length in self._pieces:
+            yield buffer[start:start + length]
+
+    def text(self):
+        """The whole document as one string"""
+        return ''.join(self.chunks())
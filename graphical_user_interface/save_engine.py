@@ -0,0 +1,186 @@
+#!/usr/bin/env python3
+"""Module to write documents to disk atomically on worker threads"""
+
+from concurrent.futures import ThreadPoolExecutor, wait
+import os
+import queue
+import tempfile
+import time
+from piece_table import digest_chunks, VERIFY_LIMIT
+
+# Largest slice of a piece encoded and written at once (characters)
+WRITE_CHUNK = 1024 * 1024
+
+# How often the Tk thread checks for finished saves (ms)
+POLL_INTERVAL = 20
+
+# Files written at the same time by Save All
+MAX_WORKERS = 8
+
+
+class SaveResult:
+    """Outcome of one finished save"""
+    def __init__(self, file_path, version, length, digest, size, seconds):
+        self.file_path = file_path
+        self.version = version      # document version that was written
+        self.length = length        # characters written
+        self.digest = digest        # digest of the content, if computed
+        self.size = size            # bytes on disk
+        self.seconds = seconds
+
+
+def write_atomic(snapshot, file_path, version, encoding='utf-8'):
+    """Stream a document snapshot to a temporary file next to file_path,
+       fsync it and rename it over file_path, so a crash mid-write never
+       leaves a truncated file behind
+    """
+    started = time.perf_counter()
+    file_path = os.path.realpath(file_path)
+    directory = os.path.dirname(file_path)
+    fd, temp_path = tempfile.mkstemp(
+        prefix='.' + os.path.basename(file_path) + '.', suffix='.tmp',
+        dir=directory)
+    try:
+        with os.fdopen(fd, 'w', encoding=encoding) as file:
+            for chunk in snapshot.chunks():
+                for start in range(0, len(chunk), WRITE_CHUNK):
+                    file.write(chunk[start:start + WRITE_CHUNK])
+            file.flush()
+            os.fsync(file.fileno())
+        if os.path.exists(file_path):
+            os.chmod(temp_path, os.stat(file_path).st_mode & 0o7777)
+        os.replace(temp_path, file_path)
+    except BaseException:
+        if os.path.exists(temp_path):
+            os.remove(temp_path)
+        raise
+    if hasattr(os, 'O_DIRECTORY'):
+        # Make the rename itself durable
+        dir_fd = os.open(directory, os.O_RDONLY | os.O_DIRECTORY)
+        try:
+            os.fsync(dir_fd)
+        finally:
+            os.close(dir_fd)
+
+    digest = None
+    if len(snapshot) <= VERIFY_LIMIT:
+        digest = digest_chunks(snapshot.chunks())
+    return SaveResult(file_path, version, len(snapshot), digest,
+                      os.path.getsize(file_path),
+                      time.perf_counter() - started)
+
+
+def format_size(size):
+    """Human readable byte count"""
+    for unit in ('B', 'KB', 'MB'):
+        if size < 1024:
+            return f"{size:.1f} {unit}" if unit != 'B' else f"{size:.0f} B"
+        size /= 1024
+    return f"{size:.1f} GB"
+
+
+class SaveBatch:
+    """Collects the results of a group of saves such as Save All"""
+    def __init__(self, total, on_finished=None):
+        self.total = total
+        self.on_finished = on_finished
+        self.results = []
+        self.errors = []
+        self.started = time.perf_counter()
+        self.elapsed = 0.0
+
+    @property
+    def done(self):
+        """Whether every save in the batch has finished"""
+        return len(self.results) + len(self.errors) >= self.total
+
+    def add(self, file_path, future):
+        """Record one finished save"""
+        error = future.exception()
+        if error:
+            self.errors.append((file_path, error))
+        else:
+            self.results.append(future.result())
+        self.elapsed = time.perf_counter() - self.started
+        if self.done and self.on_finished:
+            self.on_finished(self)
+
+    def size(self):
+        """Bytes written by the batch"""
+        return sum(result.size for result in self.results)
+
+    def throughput(self):
+        """Bytes written per second of wall time"""
+        return self.size() / self.elapsed if self.elapsed else 0.0
+
+    def summary(self):
+        """One line description of the batch"""
+        text = f"Saved {len(self.results)} of {self.total} files, " \
+            f"{format_size(self.size())} in {self.elapsed:.2f} s " \
+            f"({format_size(self.throughput())}/s)"
+        if self.errors:
+            text += f", {len(self.errors)} failed"
+        return text
+
+
+class SaveEngine:
+    """Runs saves on worker threads and hands their results back to the
+       Tk thread through a queue polled with after()
+    """
+    def __init__(self, widget, max_workers=MAX_WORKERS):
+        self.widget = widget
+        self.executor = ThreadPoolExecutor(max_workers=max_workers,
+                                           thread_name_prefix='pyc-save')
+        self.finished = queue.Queue()
+        self.pending = {}
+        self._after_id = None
+
+    def submit(self, snapshot, file_path, version, on_done=None,
+               encoding='utf-8'):
+        """Save a snapshot in the background; on_done(future) is called
+           on the Tk thread once the save has finished
+        """
+        key = os.path.realpath(file_path)
+        previous = self.pending.get(key)
+
+        def job():
+            # Saves of the same file are written in order
+            if previous is not None:
+                wait([previous])
+            return write_atomic(snapshot, file_path, version, encoding)
+
+        future = self.executor.submit(job)
+        self.pending[key] = future
+        future.add_done_callback(
+            lambda done: self.finished.put((key, done, on_done)))
+        self._schedule_poll()
+        return future
+
+    def _schedule_poll(self):
+        """Check for finished saves on the next tick"""
+        if self._after_id is None:
+            self._after_id = self.widget.after(POLL_INTERVAL, self._poll)
+
+    def _poll(self):
+        """Deliver finished saves on the Tk thread"""
+        self._after_id = None
+        while True:
+            try:
+                key, future, on_done = self.finished.get_nowait()
+            except queue.Empty:
+                break
+            if self.pending.get(key) is future:
+                del self.pending[key]
+            if on_done:
+                on_done(future)
+        if self.pending:
+            self._schedule_poll()
+
+    def wait(self):
+        """Block until every pending save is on disk"""
+        wait(list(self.pending.values()))
+
+    def shutdown(self):
+        """Finish pending saves and stop the worker threads"""
+        self.wait()
+        self.executor.shutdown()
@@ -0,0 +1,44 @@
+#!/usr/bin/env python3
+"""Module to time the phases of the editor's startup"""
+
+import os
+import sys
+import time
+
+# Imported first by User_Interface, so this is roughly when imports began
+IMPORTS_STARTED = time.perf_counter()
+
+# Set to print the startup breakdown to stderr
+REPORT_VARIABLE = 'PYC_STARTUP_REPORT'
+
+
+class StartupTimer:
+    """Records how long each startup phase took"""
+    def __init__(self, started=None):
+        self.started = IMPORTS_STARTED if started is None else started
+        self.last = self.started
+        self.phases = []
+
+    def mark(self, phase):
+        """End a phase that started when the previous one ended"""
+        now = time.perf_counter()
+        self.phases.append((phase, now - self.last))
+        self.last = now
+
+    def total(self):
+        """Seconds from the start to the last phase"""
+        return self.last - self.started
+
+    def summary(self):
+        """One line breakdown in milliseconds"""
+        phases = ', '.join(f"{phase} {seconds * 1000:.0f}"
+                           for phase, seconds in self.phases)
+        return f"Startup {self.total() * 1000:.0f} ms ({phases})"
+
+    def report(self, stream=None):
+        """Print the breakdown when asked to through the environment"""
+        if stream is None:
+            if not os.environ.get(REPORT_VARIABLE):
+                return
+            stream = sys.stderr
+        print(self.summary(), file=stream)
@@ -0,0 +1,38 @@
+#!/usr/bin/env python3
+"""Module to keep running document statistics for the status bar"""
+
+
+def count_words(text):
+    """Number of whitespace separated words in text"""
+    return len(text.split())
+
+
+class DocumentStats:
+    """Character, line and word counters updated from edit deltas.
+       Word counts only look at the edited text and the characters just
+       before and after it, which decide whether words join or split.
+    """
+    def __init__(self, text=''):
+        self.reset(text)
+
+    def reset(self, text=''):
+        """Count a whole document"""
+        self.chars = len(text)
+        self.lines = text.count('\n') + 1
+        self.words = count_words(text)
+
+    def inserted(self, text, before='', after=''):
+        """Account for text inserted between the before and after chars"""
+        self.chars += len(text)
+        self.lines += text.count('\n')
+        self.words += count_words(before + text + after) - \
+            count_words(before + after)
+
+    def deleted(self, text, before='', after=''):
+        """Account for text removed from between the before and after
+           chars
+        """
+        self.chars -= len(text)
+        self.lines -= text.count('\n')
+        self.words -= count_words(before + text + after) - \
+            count_words(before + after)
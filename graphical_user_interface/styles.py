@@ -0,0 +1,78 @@
+#!/usr/bin/env python3
+"""Module to share fonts and view options across every tab"""
+
+import tkinter as tk
+import tkinter.font as tkfont
+
+# Font family and size of the text widgets
+DEFAULT_FONT = ('Times New Roman', 12)
+
+# View options of the text widgets
+DEFAULT_OPTIONS = {'wrap': 'none'}
+
+
+class Styles:
+    """Editor-wide look of the text widgets. They all use one named font,
+       so a family or size change is a single configure that Tk passes on
+       to every widget. Options such as wrap are per widget in Tk: they
+       are kept here with a version, and a tab applies them only when it
+       is shown with an older version, so hibernated and background tabs
+       cost nothing until selected and new tabs start out current
+    """
+    def __init__(self, font=DEFAULT_FONT, options=None):
+        self.family, self.size = font
+        self.options = dict(DEFAULT_OPTIONS if options is None else options)
+        self.version = 0
+        self._fonts = {}        # Tk root: the named font made for it
+
+    def font(self, master):
+        """The shared font of the Tk interpreter of master"""
+        root = master._root()
+        if root not in self._fonts:
+            self._fonts[root] = tkfont.Font(root=root, family=self.family,
+                                            size=self.size)
+        return self._fonts[root]
+
+    def set_font(self, family=None, size=None):
+        """Change the font of every text widget"""
+        if family is not None:
+            self.family = family
+        if size is not None:
+            self.size = int(size)
+        # Tabs that measure rows in the font look again when next shown
+        self.version += 1
+        for root, font in list(self._fonts.items()):
+            try:
+                font.configure(family=self.family, size=self.size)
+            except tk.TclError:
+                del self._fonts[root]   # The root was destroyed
+
+    def set_options(self, **options):
+        """Change view options; tabs pick them up when next shown"""
+        if any(self.options.get(name) != value
+               for name, value in options.items()):
+            self.options.update(options)
+            self.version += 1
+
+    def widget_options(self, master):
+        """Options to create a text widget with"""
+        return dict(self.options, font=self.font(master))
+
+    def apply(self, textbox, version):
+        """Bring a text widget showing options of the version up to date;
+           returns the version it shows now
+        """
+        if version != self.version:
+            textbox.configure(**self.options)
+        return self.version
+
+
+_styles = None
+
+
+def get_styles():
+    """The styles shared by every tab"""
+    global _styles
+    if _styles is None:
+        _styles = Styles()
+    return _styles
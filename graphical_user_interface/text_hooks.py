@@ -0,0 +1,104 @@
+#!/usr/bin/env python3
+"""Module to report every edit made to a Tk text widget"""
+
+# The widget command is renamed and replaced by this proc. Edits are
+# carried out on the original command first, so Tcl errors reach the
+# caller unchanged, and are then reported to the Python callback with
+# normalized positions: "insert start chars" or "delete start end chars".
+# Undo and redo are reported as "undo 1" before and "undo 0" after.
+PROXY_SCRIPT = r'''
+proc ::pyc_text_proxy {orig notify args} {
+    set op [lindex $args 0]
+    if {$op eq "edit" && [lindex $args 1] in {undo redo}} {
+        $notify undo 1
+        catch {$orig {*}$args} result options
+        $notify undo 0
+        return -options $options $result
+    }
+    if {$op ni {insert delete replace} || [$orig cget -state] ne "normal"} {
+        return [$orig {*}$args]
+    }
+    if {$op eq "delete" && [llength $args] > 3} {
+        # Several ranges: delete them one at a time, last range first
+        set ranges {}
+        foreach {first last} [lrange $args 1 end] {
+            if {$last eq ""} {set last "$first + 1c"}
+            lappend ranges [list [$orig index $first] [$orig index $last]]
+        }
+        set ranges [lsort -dictionary -decreasing -index 0 $ranges]
+        foreach range $ranges {
+            ::pyc_text_proxy $orig $notify delete {*}$range
+        }
+        return
+    }
+    set start [$orig index [lindex $args 1]]
+    if {[$orig compare $start > "end - 1c"]} {
+        set start [$orig index "end - 1c"]
+    }
+    if {$op eq "insert"} {
+        set result [$orig {*}$args]
+        set chars ""
+        foreach {text tags} [lrange $args 2 end] {append chars $text}
+        if {$chars ne ""} {$notify insert $start $chars}
+        return $result
+    }
+    if {$op eq "delete" && [llength $args] == 2} {
+        set end [$orig index "$start + 1c"]
+    } else {
+        set end [$orig index [lindex $args 2]]
+    }
+    if {[$orig compare $end > "end - 1c"]} {
+        set end [$orig index "end - 1c"]
+    }
+    set removed ""
+    if {[$orig compare $start < $end]} {
+        set removed [$orig get $start $end]
+    }
+    set result [$orig {*}$args]
+    if {$removed ne ""} {$notify delete $start $end $removed}
+    if {$op eq "replace"} {
+        set chars ""
+        foreach {text tags} [lrange $args 3 end] {append chars $text}
+        if {$chars ne ""} {$notify insert $start $chars}
+    }
+    return $result
+}
+'''
+
+
+def install_edit_hooks(textbox, callback, on_undo=None):
+    """Call callback(action, start, end, text) after every insert and
+       delete made to textbox, whether by the user, a binding, undo/redo
+       or Python code. start and end are "line.column" positions taken
+       before the edit; for inserts end is where the new text ends.
+       on_undo(True) and on_undo(False) bracket the edits of undo/redo.
+    """
+    if not textbox.tk.call('info', 'commands', '::pyc_text_proxy'):
+        textbox.tk.eval(PROXY_SCRIPT)
+
+    def notify(action, start, *args):
+        if action == 'undo':
+            if on_undo:
+                on_undo(start == '1')
+            return
+        if action == 'insert':
+            text = args[0]
+            line, column = map(int, start.split('.'))
+            newlines = text.count('\n')
+            if newlines:
+                last = text.rsplit('\n', 1)[1]
+                end = f"{line + newlines}.{len(last)}"
+            else:
+                end = f"{line}.{column + len(text)}"
+        else:
+            end, text = args
+        callback(action, start, end, text)
+
+    widget = str(textbox)
+    original = widget + '_orig'
+    textbox.tk.call('rename', widget, original)
+    textbox.tk.call('interp', 'alias', '', widget, '', '::pyc_text_proxy',
+                    original, textbox.register(notify))
+    # Tk deletes the original command with the widget; drop the alias too
+    textbox.bind('<Destroy>', lambda event: textbox.tk.call(
+        'rename', widget, ''), add='+')
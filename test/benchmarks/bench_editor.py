@@ -0,0 +1,337 @@
+#!/usr/bin/env python3
+"""Benchmarks of editor operations on synthetic files
+
+Run from the repository root:
+
+    python test/benchmarks/bench_editor.py [--max-size 64MB] [--repeat 3]
+
+Xvfb is started when there is no display. Tab creation and every file
+size are measured in a fresh interpreter, so the peak memory reported
+for a size is not left over from a larger one. Every run appends one
+JSON line to test/benchmarks/history.jsonl (not tracked by git) and is
+compared with the run before it.
+"""
+
+import argparse
+import json
+import os
+import platform
+import resource
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+from unittest.mock import patch
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+ROOT = os.path.dirname(os.path.dirname(HERE))
+
+# The editor modules import each other by their flat names
+sys.path.insert(0, os.path.join(ROOT, 'graphical_user_interface'))
+
+import tkinter as tk  # noqa: E402
+import menu_file  # noqa: E402
+from User_Interface import TextEditorBase  # noqa: E402
+
+HISTORY = os.path.join(HERE, 'history.jsonl')
+
+SIZES = ['1KB', '64KB', '1MB', '16MB', '64MB', '256MB', '1GB']
+DEFAULT_MAX_SIZE = '64MB'
+
+# A run this much slower than the previous one is reported
+REGRESSION_RATIO = 1.5
+
+# Job measuring tab creation; the other jobs are file sizes
+TAB_CREATION = 'tab_creation'
+
+# Tabs written by one Save All
+SAVE_ALL_TABS = 4
+
+LINE = 'The quick brown fox jumps over the lazy dog, 0123456789.\n'
+UNITS = {'KB': 1024, 'MB': 1024 ** 2, 'GB': 1024 ** 3}
+
+
+def parse_size(text):
+    """Bytes in a size such as 64KB"""
+    text = text.strip().upper()
+    for unit, factor in UNITS.items():
+        if text.endswith(unit):
+            return int(float(text[:-len(unit)]) * factor)
+    return int(text)
+
+
+def make_file(directory, label):
+    """Write a synthetic text file of the given size"""
+    size = parse_size(label)
+    path = os.path.join(directory, f'bench_{label}.txt')
+    block = LINE * (1024 * 1024 // len(LINE))
+    with open(path, 'w', encoding='utf-8') as file:
+        written = 0
+        while written < size:
+            data = block[:size - written]
+            file.write(data)
+            written += len(data)
+    return path
+
+
+def start_display():
+    """Start Xvfb if there is no display; returns its process"""
+    if os.environ.get('DISPLAY'):
+        return None
+    if not shutil.which('Xvfb'):
+        sys.exit('No display and Xvfb is not installed')
+    number = 90 + os.getpid() % 100
+    process = subprocess.Popen(
+        ['Xvfb', f':{number}', '-screen', '0', '1280x800x24', '-nolisten',
+         'tcp'], stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    socket = f'/tmp/.X11-unix/X{number}'
+    for _ in range(100):
+        if os.path.exists(socket):
+            break
+        time.sleep(0.05)
+    os.environ['DISPLAY'] = f':{number}'
+    return process
+
+
+def peak_rss():
+    """Peak resident set size of this process in bytes; each job runs in
+       its own process, so this is the peak of the job so far
+    """
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak if sys.platform == 'darwin' else peak * 1024
+
+
+def pump(root, done):
+    """Run the event loop until done() is true"""
+    while not done():
+        root.update()
+
+
+def git_commit():
+    """Commit being measured, if known"""
+    try:
+        return subprocess.check_output(
+            ['git', 'rev-parse', '--short', 'HEAD'], cwd=ROOT,
+            stderr=subprocess.DEVNULL).decode().strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+class EditorBench:
+    """Times editor operations against a live, headless editor"""
+    def __init__(self, repeat):
+        self.repeat = repeat
+        self.root = tk.Tk()
+        self.root.withdraw()
+        self.editor = TextEditorBase(self.root)
+        self.editor.pack(fill='both', expand=True)
+        self.editor.status_bar = menu_file.create_status_bar(self.editor)
+        self.results = []
+
+    def record(self, operation, size, seconds):
+        """Store one measurement with the peak memory so far"""
+        self.results.append({
+            'operation': operation,
+            'size': size,
+            'seconds': seconds,
+            'peak_rss': peak_rss()
+        })
+        print(f"{operation:20} {size:>6} {seconds * 1000:10.2f} ms "
+              f"{peak_rss() / 1024 ** 2:8.1f} MB peak")
+
+    def measure(self, operation, size, run, setup=None):
+        """Time run() repeat times, each after setup(), keeping the best"""
+        best = None
+        for _ in range(self.repeat):
+            if setup:
+                setup()
+            started = time.perf_counter()
+            run()
+            seconds = time.perf_counter() - started
+            best = seconds if best is None else min(best, seconds)
+        self.record(operation, size, best)
+
+    def close_tabs(self):
+        """Close every tab but a fresh empty one"""
+        editor = self.editor
+        for tab_id in editor.tabs():
+            tab = editor.nametowidget(tab_id)
+            editor.hibernator.forget(tab)
+            tab.close()
+            editor.forget(tab_id)
+            tab.destroy()
+        editor.add_tab()
+        self.root.update()
+
+    def open(self, path):
+        """Open path in a new tab through the File menu command"""
+        self.editor.add_tab()
+        self.editor.select(self.editor.tabs()[-1])
+        with patch('menu_file.filedialog.askopenfilename',
+                   return_value=path):
+            menu_file.open_file(self.editor)
+        tab = self.editor.current_tab()
+        pump(self.root, lambda: tab.loader is None)
+        return tab
+
+    def bench_tab_creation(self):
+        """Time creating and showing a tab"""
+        def run():
+            self.editor.add_tab()
+            self.root.update_idletasks()
+        self.measure('tab_creation', '-', run)
+        self.close_tabs()
+
+    def bench_size(self, label, path, directory):
+        """Time every operation on one file size"""
+        editor = self.editor
+        self.measure('open_file', label, lambda: self.open(path),
+                     setup=self.close_tabs)
+        tab = self.open(path)
+        if tab.is_read_only():
+            self.measure('update_status_bar', label, lambda:
+                         menu_file.update_status_bar(editor,
+                                                     editor.status_bar))
+            self.close_tabs()
+            return
+
+        tab.textbox.insert('1.0', 'x')
+        self.measure('has_unsaved_changes', label,
+                     lambda: menu_file.has_unsaved_changes(tab))
+        self.measure('update_status_bar', label, lambda:
+                     menu_file.update_status_bar(editor, editor.status_bar))
+
+        tab.file_dir = os.path.join(directory, f'saved_{label}.txt')
+
+        def save():
+            menu_file.save_file(editor).result()
+            pump(self.root, lambda: not editor.save_engine.pending)
+        self.measure('save_file', label, save,
+                     setup=lambda: tab.textbox.insert('1.0', 'x'))
+        self.close_tabs()
+
+        tabs = []
+        for i in range(SAVE_ALL_TABS):
+            tab = self.open(path)
+            tab.file_dir = os.path.join(directory, f'saved_{label}_{i}.txt')
+            tabs.append(tab)
+
+        def modify():
+            for tab in tabs:
+                tab.textbox.insert('1.0', 'x')
+
+        def save_all():
+            for future in menu_file.save_all(editor):
+                future.result()
+            pump(self.root, lambda: not editor.save_engine.pending)
+        # The per-file report window is not part of the measurement
+        with patch('menu_file.report_save_all'):
+            self.measure('save_all', label, save_all, setup=modify)
+        self.close_tabs()
+
+    def close(self):
+        """Shut the editor down"""
+        self.editor.save_engine.shutdown()
+        self.root.destroy()
+
+
+def compare(previous, results):
+    """Report operations noticeably slower than in the previous run"""
+    before = {(result['operation'], result['size']): result['seconds']
+              for result in previous['results']}
+    for result in results:
+        old = before.get((result['operation'], result['size']))
+        if old and result['seconds'] > old * REGRESSION_RATIO:
+            print(f"Slower: {result['operation']} {result['size']} "
+                  f"{old * 1000:.2f} ms -> {result['seconds'] * 1000:.2f} ms"
+                  f" (was {previous.get('commit')})")
+
+
+def last_run(history):
+    """Last entry of the history file, if any"""
+    if not os.path.exists(history):
+        return None
+    entry = None
+    with open(history, 'r', encoding='utf-8') as file:
+        for line in file:
+            if line.strip():
+                entry = json.loads(line)
+    return entry
+
+
+def run_job(job, repeat, directory):
+    """Measure tab creation or one file size in this process, leaving the
+       results in directory
+    """
+    bench = EditorBench(repeat)
+    try:
+        if job == TAB_CREATION:
+            bench.bench_tab_creation()
+        else:
+            path = make_file(directory, job)
+            bench.bench_size(job, path, directory)
+            os.remove(path)
+    finally:
+        bench.close()
+    with open(os.path.join(directory, f'results_{job}.json'), 'w',
+              encoding='utf-8') as file:
+        json.dump(bench.results, file)
+
+
+def run_in_child(job, repeat, directory):
+    """Run a job in a fresh interpreter; returns its results"""
+    subprocess.run([sys.executable, os.path.abspath(__file__),
+                    '--job', job, '--repeat', str(repeat),
+                    '--directory', directory], check=True)
+    with open(os.path.join(directory, f'results_{job}.json'), 'r',
+              encoding='utf-8') as file:
+        return json.load(file)
+
+
+def main(argv=None):
+    """Run the benchmarks"""
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--max-size', default=DEFAULT_MAX_SIZE,
+                        help='largest synthetic file, up to 1GB')
+    parser.add_argument('--repeat', type=int, default=3)
+    parser.add_argument('--history', default=HISTORY)
+    # Used by the child processes running one job each
+    parser.add_argument('--job', help=argparse.SUPPRESS)
+    parser.add_argument('--directory', help=argparse.SUPPRESS)
+    args = parser.parse_args(argv)
+    if args.job:
+        run_job(args.job, args.repeat, args.directory)
+        return
+
+    display = start_display()
+    sizes = [label for label in SIZES
+             if parse_size(label) <= parse_size(args.max_size)]
+    directory = tempfile.mkdtemp(prefix='pyc-bench-')
+    results = []
+    try:
+        for job in [TAB_CREATION] + sizes:
+            results.extend(run_in_child(job, args.repeat, directory))
+    finally:
+        shutil.rmtree(directory, ignore_errors=True)
+        if display:
+            display.terminate()
+
+    entry = {
+        'timestamp': time.strftime('%Y-%m-%dT%H:%M:%S'),
+        'commit': git_commit(),
+        'python': platform.python_version(),
+        'tk': tk.TkVersion,
+        'platform': platform.platform(),
+        'repeat': args.repeat,
+        'results': results
+    }
+    previous = last_run(args.history)
+    if previous:
+        compare(previous, results)
+    with open(args.history, 'a', encoding='utf-8') as file:
+        file.write(json.dumps(entry) + '\n')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,120 @@
+#!/usr/bin/node
+
+const { PassThrough } = require('stream');
+const zlib = require('zlib');
+
+const mockCreate = jest.fn();
+jest.mock('openai', () => ({
+  OpenAI: jest.fn(() => ({ chat: { completions: { create: mockCreate } } }))
+}), { virtual: true });
+
+const { serve } = require('../../gpt-api/chatgpt.js');
+
+// Streams the content back as two tokens
+async function* echo(content) {
+  yield { choices: [{ delta: { content: 'echo: ' } }] };
+  yield { choices: [{ delta: { content } }] };
+}
+
+// Runs the server loop on in-memory streams, collecting what it sends
+function startServer() {
+  const input = new PassThrough();
+  const output = new PassThrough();
+  const messages = [];
+  let buffer = '';
+  output.on('data', (chunk) => {
+    buffer += chunk.toString('utf8');
+    const lines = buffer.split('\n');
+    buffer = lines.pop();
+    lines.forEach((line) => messages.push(JSON.parse(line)));
+  });
+  serve(input, output);
+  const send = (message) => input.write(
+    (typeof message === 'string' ? message : JSON.stringify(message)) + '\n');
+  return { send, messages };
+}
+
+// Waits until check() is true
+async function until(check) {
+  while (!check()) {
+    await new Promise((resolve) => setTimeout(resolve, 5));
+  }
+}
+
+describe('serve', () => {
+  beforeEach(() => {
+    mockCreate.mockReset();
+    mockCreate.mockImplementation(async (body) => echo(body.messages[0].content));
+  });
+
+  it('should stream tokens of a plain request tagged with its id', async () => {
+    const server = startServer();
+    server.send({ id: 1, fileContent: 'hello', model: 'test-model' });
+    await until(() => server.messages.length === 3);
+
+    expect(server.messages).toEqual([
+      { id: 1, token: 'echo: ' },
+      { id: 1, token: 'hello' },
+      { id: 1, done: true }
+    ]);
+    expect(mockCreate).toHaveBeenCalledWith(
+      expect.objectContaining({
+        messages: [{ role: 'system', content: 'hello' }],
+        model: 'test-model',
+        stream: true
+      }),
+      expect.objectContaining({ signal: expect.anything() }));
+  });
+
+  it('should decode gzip+base64 content', async () => {
+    const content = 'print("héllo")\n'.repeat(10000);
+    const server = startServer();
+    server.send({
+      id: 2,
+      contentEncoding: 'gzip+base64',
+      fileContent: zlib.gzipSync(Buffer.from(content, 'utf8'))
+        .toString('base64')
+    });
+    await until(() => server.messages.length === 3);
+
+    expect(server.messages[1]).toEqual({ id: 2, token: content });
+    expect(server.messages[2]).toEqual({ id: 2, done: true });
+  });
+
+  it('should abort a cancelled request', async () => {
+    let signal;
+    mockCreate.mockImplementation(async (body, options) => {
+      signal = options.signal;
+      return (async function* () {
+        await new Promise((resolve, reject) => signal.addEventListener(
+          'abort', () => reject(new Error('Request was aborted.'))));
+      })();
+    });
+    const server = startServer();
+    server.send({ id: 3, fileContent: 'slow' });
+    await until(() => signal !== undefined);
+    server.send({ id: 3, cancel: true });
+    await until(() => server.messages.length === 1);
+
+    expect(signal.aborted).toBe(true);
+    expect(server.messages).toEqual([
+      { id: 3, error: 'Request was aborted.' }
+    ]);
+  });
+
+  it('should answer a bad line with an error and keep serving', async () => {
+    const server = startServer();
+    server.send('');
+    server.send('not json');
+    server.send({ id: 4, fileContent: 'after' });
+    await until(() => server.messages.length === 4);
+
+    expect(server.messages[0].id).toBeNull();
+    expect(server.messages[0].error).toMatch(/^Invalid request: /);
+    expect(server.messages.slice(1)).toEqual([
+      { id: 4, token: 'echo: ' },
+      { id: 4, token: 'after' },
+      { id: 4, done: true }
+    ]);
+  });
+});
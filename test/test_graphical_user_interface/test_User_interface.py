@@ -3,8 +3,14 @@
 
 import os
 import pytest
-from graphical_user_interface.User_Interface import TextEditorBase, Tab, run
+from graphical_user_interface.User_Interface import (
+    TAB_POOL_SIZE,
+    TextEditorBase,
+    Tab,
+    run
+)
 import tempfile
+from graphical_user_interface.save_engine import write_atomic
 
 
 @pytest.fixture
@@ -25,6 +31,60 @@ def test_add_tab(text_editor):
     assert text_editor.index("end") == initial_tab_count + 2
 
 
+def test_closed_tab_is_reused(text_editor):
+    """Test a closed tab comes back empty, clean and without undo"""
+    text_editor.add_tab()
+    tab = text_editor.indexed_tab(-1)
+    tab.file_name = 'notes.txt'
+    tab.textbox.insert('1.0', 'some text')
+    text_editor.release_tab(tab)
+    assert tab in text_editor.tab_pool
+    text_editor.add_tab()
+    assert text_editor.indexed_tab(-1) is tab
+    assert tab.textbox.get('1.0', 'end-1c') == ''
+    assert len(tab.document) == 0
+    assert tab.file_name is None
+    assert not tab.textbox.edit_modified()
+    assert not tab.textbox.tk.call(tab.textbox, 'edit', 'canundo')
+
+
+def test_tab_pool_is_bounded(text_editor):
+    """Test closed tabs past the pool size are destroyed"""
+    tabs = []
+    for _ in range(TAB_POOL_SIZE + 2):
+        text_editor.add_tab()
+        tabs.append(text_editor.indexed_tab(-1))
+    for tab in tabs:
+        text_editor.release_tab(tab)
+    assert len(text_editor.tab_pool) == TAB_POOL_SIZE
+    assert not tabs[-1].winfo_exists()
+
+
+def test_save_while_hibernated(text_editor, tmp_path):
+    """Test a tab saved while hibernated, or by a save that was running
+       when it hibernated, comes back clean
+    """
+    tab = text_editor.current_tab()
+    path = str(tmp_path / 'notes.txt')
+    tab.textbox.insert('1.0', 'unsaved text')
+    version = tab.document.version
+    tab.hibernate()
+    assert tab.document.version == version
+    tab.mark_saved(write_atomic(tab.snapshot(), path, version))
+    tab.restore()
+    assert tab.document.version == version
+    assert not tab.textbox.edit_modified()
+
+    # The save started before the tab was hibernated
+    tab.textbox.insert('end', ', more')
+    result = write_atomic(tab.snapshot(), path, tab.document.version)
+    tab.hibernate()
+    tab.restore()
+    tab.mark_saved(result)
+    assert not tab.textbox.edit_modified()
+    assert not tab.is_modified()
+
+
 def test_move_tab(text_editor):
     """Test if tab can move"""
     # Add a few tabs
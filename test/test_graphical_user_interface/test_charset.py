@@ -0,0 +1,80 @@
+#!/usr/bin/env python3
+"""Module to test encoding detection"""
+
+import codecs
+import pytest
+from graphical_user_interface.charset import (
+    byte_length,
+    fallback,
+    fitting_chars,
+    sniff,
+    text_decoder
+)
+
+
+def test_boms():
+    """Test byte order marks decide the encoding"""
+    assert sniff(codecs.BOM_UTF8 + b"text") == 'utf-8-sig'
+    assert sniff("text".encode('utf-16')) == 'utf-16'
+    assert sniff("text".encode('utf-32')) == 'utf-32'
+
+
+def test_utf8():
+    """Test UTF-8, even cut off in the middle of a character"""
+    data = "héllo wörld €".encode('utf-8')
+    assert sniff(data) == 'utf-8'
+    assert sniff(data[:-1]) == 'utf-8'
+    assert sniff(b"") == 'utf-8'
+
+
+def test_legacy_encodings():
+    """Test UTF-16 without BOM and single byte encodings"""
+    assert sniff("plain text\n".encode('utf-16-le')) == 'utf-16-le'
+    assert sniff("plain text\n".encode('utf-16-be')) == 'utf-16-be'
+    assert sniff("café €5".encode('cp1252')) == 'cp1252'
+    assert sniff(b"\x81\x8d\x8f") == 'latin-1'
+
+
+def test_incremental_decoding():
+    """Test characters and CRLF split across chunks decode whole"""
+    data = "a€b\r\nc\rd".encode('utf-8')
+    decoder = text_decoder('utf-8')
+    text = "".join(decoder.decode(data[i:i + 1]) for i in range(len(data)))
+    text += decoder.decode(b"", final=True)
+    assert text == "a€b\nc\nd"
+
+
+def test_fallback():
+    """Test invalid bytes can be refused, and every fallback chain ends in
+       an encoding that gives the bytes back unchanged
+    """
+    data = b"ok \xe9 \x81"
+    with pytest.raises(UnicodeDecodeError):
+        text_decoder('utf-8', 'strict').decode(data, final=True)
+    assert text_decoder('utf-8').decode(data, final=True).count('\ufffd')
+    encoding = 'utf-8'
+    while True:
+        try:
+            text = text_decoder(encoding, 'strict').decode(data, final=True)
+            break
+        except UnicodeDecodeError:
+            encoding = fallback(encoding)
+    assert encoding == 'latin-1'
+    assert text.encode(encoding) == data
+
+
+def test_byte_length():
+    """Test sizes follow the encoding and leave the BOM out"""
+    assert byte_length("é€", 'utf-8') == 5
+    assert byte_length("é€", 'cp1252') == 2
+    assert byte_length("é€", 'utf-8-sig') == 5
+    assert byte_length("a\U0001F600", 'utf-16') == 6
+    assert byte_length("ab", 'utf-32') == 8
+
+
+def test_fitting_chars():
+    """Test a byte count inside a character stops before it"""
+    assert fitting_chars("aé€b", 3) == 2
+    assert fitting_chars("aé€b", 5) == 2
+    assert fitting_chars("aé€b", 6) == 3
+    assert fitting_chars("aé€b", 3, 'utf-16') == 1
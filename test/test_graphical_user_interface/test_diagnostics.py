@@ -0,0 +1,69 @@
+#!/usr/bin/env python3
+"""Module to test the callback profiler"""
+
+import json
+import time
+import tkinter as tk
+from graphical_user_interface.diagnostics import Diagnostics, \
+    CallbackStats, callback_name
+
+
+def handler(event=None):
+    """A named callback"""
+    return 'handled'
+
+
+def test_callback_names():
+    """Test functions, lambdas and methods get readable names"""
+    assert callback_name(handler).endswith('test_diagnostics.handler')
+    assert ':' in callback_name(lambda: None)
+    stats = CallbackStats('x')
+    assert callback_name(stats.add).endswith('CallbackStats.add')
+
+
+def test_wrapped_callback_is_timed():
+    """Test calls are counted and sorted into histogram buckets"""
+    diagnostics = Diagnostics()
+    timed = diagnostics.wrap(handler)
+    assert timed.__name__ == 'handler'
+    assert timed() == 'handled'
+    slow = diagnostics.wrap(lambda: time.sleep(0.005))
+    slow()
+    data = diagnostics.as_dict()
+    assert data['callbacks'][0]['max_ms'] >= 5
+    fast = [stats for stats in data['callbacks']
+            if stats['name'].endswith('handler')][0]
+    assert fast['count'] == 1
+    assert fast['histogram']['<=1ms'] == 1
+
+
+def test_install_restores_register():
+    """Test installing patches Tk's callback registration and back"""
+    original = tk.Misc._register
+    diagnostics = Diagnostics()
+    diagnostics.install()
+    try:
+        assert diagnostics.installed
+        assert tk.Misc._register is not original
+    finally:
+        diagnostics.uninstall()
+    assert tk.Misc._register is original
+    assert not diagnostics.installed
+
+
+def test_stalls_are_recorded(tmpdir):
+    """Test a late heartbeat is reported with the slowest callback"""
+    diagnostics = Diagnostics()
+
+    class Widget:
+        def after(self, ms, func):
+            pass
+    diagnostics.start_heartbeat(Widget())
+    diagnostics.wrap(lambda: time.sleep(0.2))()
+    diagnostics._beat()
+    assert len(diagnostics.stalls) == 1
+    assert diagnostics.stalls[0]['slowest_ms'] >= 200
+
+    path = tmpdir.join('diagnostics.json')
+    diagnostics.dump(str(path))
+    assert json.loads(path.read())['stalls'][0]['blocked_ms'] >= 100
@@ -0,0 +1,218 @@
+#!/usr/bin/env python3
+"""Module to test streamed ChatGPT explanations"""
+
+import pytest
+from graphical_user_interface import explain
+import re
+from graphical_user_interface.explain import ExplainRequest, \
+    MapReduceExplain, split_for_budget, estimate_tokens, explain_key, \
+    REDUCE_PROMPT
+from graphical_user_interface.node_worker import NodeWorker
+
+
+@pytest.fixture
+def worker(tmpdir):
+    """Worker whose server streams a canned answer"""
+    script = tmpdir.join("server.js")
+    script.write(
+        "const readline = require('readline');\n"
+        "readline.createInterface({ input: process.stdin })"
+        ".on('line', (line) => {\n"
+        "  const { id, fileContent } = JSON.parse(line);\n"
+        "  for (const token of ['This ', 'file ', 'says: ', fileContent]) {\n"
+        "    process.stdout.write(JSON.stringify({ id, token }) + '\\n');\n"
+        "  }\n"
+        "  process.stdout.write(JSON.stringify({ id, done: true }) + '\\n');\n"
+        "});\n")
+    worker = NodeWorker(str(script))
+    yield worker
+    worker.close()
+
+
+def collect(request):
+    """Wait for a request's events up to its done event"""
+    events = []
+    while not events or events[-1][0] != "done":
+        events.append(request.events.get(timeout=10))
+    return events
+
+
+def test_response_is_streamed(worker):
+    """Test the answer arrives as tokens followed by a done event"""
+    request = ExplainRequest(None, "hello", worker=worker)
+    worker.request({"fileContent": "hello"}, request.on_message)
+    events = collect(request)
+    assert events[-1] == ("done", None)
+    assert "".join(value for kind, value in events if kind == "token") \
+        == "This file says: hello"
+
+
+def test_error_message():
+    """Test errors from the worker end the request"""
+    request = ExplainRequest(None, "hello", worker=object())
+    request.on_message({"id": 1, "error": "Invalid API key"})
+    assert request.events.get_nowait() == ("done", "Invalid API key")
+
+
+def test_small_content_is_one_chunk():
+    """Test content within the budget is sent as it is"""
+    assert split_for_budget("print('hi')\n", max_tokens=10) == \
+        ["print('hi')\n"]
+
+
+def test_split_on_paragraphs():
+    """Test chunks break after blank lines and fit the budget"""
+    paragraph = "x = 1\ny = 2\n\n"
+    text = paragraph * 20
+    chunks = split_for_budget(text, max_tokens=10)
+    assert len(chunks) > 1
+    assert "".join(chunks) == text
+    for chunk in chunks:
+        assert len(chunk) <= 40
+        assert chunk.endswith("\n\n")
+
+
+def test_split_long_lines():
+    """Test lines longer than the budget are cut into slices"""
+    text = "a" * 100 + "\nb\n"
+    chunks = split_for_budget(text, max_tokens=5)
+    assert "".join(chunks) == text
+    assert all(len(chunk) <= 20 for chunk in chunks)
+    assert estimate_tokens(chunks[0]) <= 6
+
+
+def test_explain_key_follows_prompts(monkeypatch):
+    """Test changing the prompts or the chunk size misses the cache"""
+    key = explain_key("code")
+    assert explain_key("code", max_tokens=10) != key
+    monkeypatch.setattr(explain, 'MAP_PROMPT', "Explain part {part}")
+    assert explain_key("code") != key
+
+
+class FakeWidget:
+    """Runs the after() callbacks when told to"""
+    def __init__(self):
+        self.callbacks = {}
+        self.last_id = 0
+
+    def after(self, delay, callback):
+        self.last_id += 1
+        self.callbacks[self.last_id] = callback
+        return self.last_id
+
+    def after_cancel(self, after_id):
+        self.callbacks.pop(after_id, None)
+
+    def run(self):
+        """Run the callbacks scheduled so far, once"""
+        callbacks, self.callbacks = self.callbacks, {}
+        for callback in callbacks.values():
+            callback()
+
+
+class FakeWorker:
+    """Holds requests until the test answers them"""
+    def __init__(self):
+        self.requests = {}      # id: (prompt, callback)
+        self.sent = []
+        self.cancelled = []
+
+    def request(self, payload, callback):
+        request_id = len(self.sent) + 1
+        self.sent.append(payload['fileContent'])
+        self.requests[request_id] = (payload['fileContent'], callback)
+        return request_id
+
+    def cancel(self, request_id):
+        self.cancelled.append(request_id)
+        self.requests.pop(request_id, None)
+
+    def answer(self, request_id, text='', error=None):
+        _, callback = self.requests.pop(request_id)
+        if error:
+            callback({'error': error})
+        else:
+            callback({'token': text})
+            callback({'done': True})
+
+
+def part_of(prompt):
+    """Number of the chunk a map prompt asks about"""
+    return int(re.search(r"part (\d+) of", prompt).group(1))
+
+
+def map_reduce(concurrency=2, max_tokens=25, parts=5):
+    """Explanation of parts paragraphs, each a chunk of its own"""
+    widget = FakeWidget()
+    worker = FakeWorker()
+    content = "".join(f"paragraph {i} " + "x" * 50 + "\n\n"
+                      for i in range(parts))
+    tokens = []
+    done = []
+    request = MapReduceExplain(widget, content, on_token=tokens.append,
+                               on_done=done.append, worker=worker,
+                               max_tokens=max_tokens,
+                               concurrency=concurrency)
+    request.start()
+    return request, widget, worker, tokens, done
+
+
+def test_chunks_run_at_most_concurrency_at_a_time():
+    """Test a finished chunk request makes room for the next one"""
+    request, widget, worker, tokens, done = map_reduce(concurrency=2)
+    in_flight = []
+    while len(worker.sent) <= 5:
+        in_flight.append(len(worker.requests))
+        worker.answer(min(worker.requests), "A")
+        widget.run()
+    assert max(in_flight) == 2
+    assert worker.sent[-1].startswith(REDUCE_PROMPT[:20])
+
+
+def test_reduce_keeps_chunk_order():
+    """Test answers arriving out of order are merged in chunk order"""
+    request, widget, worker, tokens, done = map_reduce(concurrency=5)
+    for request_id in sorted(worker.requests, reverse=True):
+        prompt = worker.requests[request_id][0]
+        worker.answer(request_id, f"answer {part_of(prompt)}")
+        widget.run()
+    final = worker.sent[-1]
+    positions = [final.index(f"Part {i + 1}:\nanswer {i + 1}\n")
+                 for i in range(5)]
+    assert positions == sorted(positions)
+    worker.answer(len(worker.sent), "merged")
+    widget.run()
+    assert tokens == ["merged"]
+    assert done == [None]
+
+
+def test_failed_chunk_cancels_the_rest():
+    """Test one failing request stops the others and fails once"""
+    request, widget, worker, tokens, done = map_reduce(concurrency=2)
+    worker.answer(1, error="rate limited")
+    widget.run()
+    assert done == ["rate limited"]
+    assert worker.cancelled == [2]
+    assert len(worker.sent) == 2
+    assert not worker.requests
+
+
+def test_reduce_in_rounds():
+    """Test answers too long to merge at once are merged in groups"""
+    request, widget, worker, tokens, done = map_reduce(concurrency=5)
+    for request_id in list(worker.requests):
+        worker.answer(request_id, "y" * 30)
+    widget.run()
+    # Two answers fit a request: three merges, then the final one
+    merges = list(worker.requests)
+    assert len(merges) == 3
+    for request_id in merges:
+        assert worker.requests[request_id][0].startswith(REDUCE_PROMPT[:20])
+        worker.answer(request_id, "short")
+    widget.run()
+    assert len(worker.requests) == 1
+    final = worker.sent[-1]
+    assert "Part 3:\nshort" in final
+    worker.answer(len(worker.sent), "whole file")
+    widget.run()
+    assert tokens == ["whole file"] and done == [None]
@@ -0,0 +1,66 @@
+#!/usr/bin/env python3
+"""Module to test the explain response cache"""
+
+import os
+import pytest
+from graphical_user_interface.explain_cache import ExplainCache, cache_key
+
+
+@pytest.fixture
+def cache(tmpdir):
+    """Cache in a temporary directory"""
+    return ExplainCache(str(tmpdir.join("cache")), max_bytes=100,
+                        memory_entries=2)
+
+
+def test_cache_key():
+    """Test the key depends on content, model and prompt"""
+    assert cache_key("code") == cache_key("code")
+    assert cache_key("code") != cache_key("code ")
+    assert cache_key("code", model="other") != cache_key("code")
+    assert cache_key("code", settings=("user:{content}",)) != \
+        cache_key("code")
+    assert cache_key("code", settings=("a", "b")) != \
+        cache_key("code", settings=("ab",))
+
+
+def test_hits_and_misses(cache):
+    """Test the counters of both tiers"""
+    key = cache_key("print('hi')")
+    assert cache.get(key) is None
+    cache.put(key, "Prints hi")
+    assert cache.get(key) == "Prints hi"
+    cache.memory.clear()
+    assert cache.get(key) == "Prints hi"
+    stats = cache.stats()
+    assert (stats["misses"], stats["memory_hits"], stats["disk_hits"]) == \
+        (1, 1, 1)
+
+
+def test_memory_tier_is_lru(cache):
+    """Test the hot tier keeps only the most recently used entries"""
+    for name in "abc":
+        cache.put(cache_key(name), name)
+    assert list(cache.memory) == [cache_key("b"), cache_key("c")]
+
+
+def test_disk_size_cap(cache):
+    """Test least recently used files are evicted beyond the cap"""
+    keys = [cache_key(str(i)) for i in range(3)]
+    cache.put(keys[0], "x" * 40)
+    cache.put(keys[1], "y" * 40)
+    # Make the second entry the least recently used one
+    os.utime(cache._path(keys[1]), (0, 0))
+    cache.put(keys[2], "z" * 40)
+    assert os.path.exists(cache._path(keys[0]))
+    assert not os.path.exists(cache._path(keys[1]))
+    assert cache.disk_bytes <= 100
+
+
+def test_disk_failure_keeps_memory(tmpdir):
+    """Test a cache that cannot write to disk still answers from memory"""
+    blocker = tmpdir.join("file")
+    blocker.write("not a directory")
+    cache = ExplainCache(str(blocker.join("cache")))
+    cache.put(cache_key("code"), "answer")
+    assert cache.get(cache_key("code")) == "answer"
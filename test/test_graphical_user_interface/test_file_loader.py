@@ -0,0 +1,103 @@
+#!/usr/bin/env python3
+"""Module to test chunked file loading"""
+
+import pytest
+from tkinter import Tk
+from graphical_user_interface.User_Interface import (
+    Tab,
+    TextEditorBase,
+    create_status_bar
+)
+import graphical_user_interface.file_loader as file_loader
+
+
+@pytest.fixture
+def big_file(tmpdir):
+    """Create a file larger than the synchronous load limit"""
+    file_path = tmpdir.join("big.txt")
+    line = "0123456789" * 10 + "\n"
+    count = file_loader.SYNC_LIMIT // len(line) * 3
+    file_path.write(line * count)
+    return str(file_path), line * count
+
+
+def pump(tab):
+    """Run the Tk event loop until the tab finished loading"""
+    while tab.loader is not None:
+        tab.update()
+
+
+def test_small_file_loads_synchronously(tmpdir):
+    """Test small files are in the widget as soon as the tab exists"""
+    file_path = tmpdir.join("small.txt")
+    file_path.write("Small content")
+    tab = Tab(FileDir=str(file_path))
+    assert tab.loader is None
+    assert tab.textbox.get("1.0", "end-1c") == "Small content"
+
+
+def test_big_file_streams_in(big_file):
+    """Test large files are inserted over several ticks"""
+    file_path, content = big_file
+    tab = Tab(FileDir=file_path)
+    assert tab.loader is not None
+    pump(tab)
+    assert tab.textbox.get("1.0", "end-1c") == content
+    assert not tab.is_modified()
+    assert tab.textbox.cget("state") == "normal"
+
+
+def test_cancel_loading(big_file):
+    """Test cancelling keeps the partial buffer away from the file"""
+    file_path, content = big_file
+    tab = Tab(FileDir=file_path)
+    tab.cancel_loading()
+    assert tab.loader is None
+    assert tab.file_dir is None
+    assert len(tab.textbox.get("1.0", "end-1c")) < len(content)
+
+
+def test_detected_encoding(tmpdir):
+    """Test a non UTF-8 file is decoded in its own encoding"""
+    file_path = tmpdir.join("latin.txt")
+    file_path.write_binary("café\r\nprix: 5€\r\n".encode('cp1252'))
+    tab = Tab(FileDir=str(file_path))
+    assert tab.encoding == 'cp1252'
+    assert tab.textbox.get("1.0", "end-1c") == "café\nprix: 5€\n"
+
+
+def test_invalid_bytes_fall_back(tmpdir):
+    """Test a byte that is not UTF-8 past the sniffed head restarts the
+       load in the fallback encoding instead of becoming U+FFFD
+    """
+    file_path = tmpdir.join("late.txt")
+    data = b"plain\n" * (file_loader.SYNC_LIMIT // 3) + b"caf\xe9\n"
+    file_path.write_binary(data)
+    tab = Tab(FileDir=str(file_path))
+    pump(tab)
+    assert tab.encoding == 'cp1252'
+    text = tab.textbox.get("1.0", "end-1c")
+    assert "\ufffd" not in text
+    assert text.encode('cp1252') == data
+    assert not tab.is_modified()
+
+
+def test_progress_stays_in_status_bar(big_file):
+    """Test the text streaming in does not repaint the status bar over
+       the loading progress
+    """
+    file_path, content = big_file
+    root = Tk()
+    editor = TextEditorBase(root)
+    editor.pack()
+    editor.status_bar = create_status_bar(editor)
+    tab = editor.current_tab()
+    tab.file_dir = file_path
+    tab.load_file_content()
+    texts = []
+    while tab.loader is not None:
+        root.update()
+        texts.append(editor.status_bar.cget("text"))
+    assert texts
+    assert all(text.startswith("Load") for text in texts)
+    root.destroy()
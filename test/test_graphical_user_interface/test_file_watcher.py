@@ -0,0 +1,319 @@
+#!/usr/bin/env python3
+"""Module to test the detection and merging of external file changes"""
+
+import queue
+import random
+import sys
+import time
+import pytest
+import graphical_user_interface.file_watcher as file_watcher
+from graphical_user_interface.file_watcher import (
+    FileWatcher,
+    InotifyBackend,
+    PollingBackend,
+    file_stat,
+    line_changes,
+    line_starts,
+    read_text
+)
+from graphical_user_interface.piece_table import PieceTable
+
+
+def apply_changes(text, changes):
+    """Apply line replacements the way the text widget would"""
+    for line1, line2, new in changes:
+        starts = [0] + [i + 1 for i, char in enumerate(text) if char == '\n']
+        start = starts[line1 - 1] if line1 <= len(starts) else len(text)
+        end = starts[line2 - 1] if line2 <= len(starts) else len(text)
+        text = text[:start] + new + text[end:]
+    return text
+
+
+def test_line_starts():
+    """Test every line start is found, followed by the end"""
+    assert line_starts("ab\nc\n") == [0, 3, 5, 5]
+    assert line_starts("") == [0, 0]
+
+
+def test_line_changes():
+    """Test only the changed lines are replaced"""
+    old = "one\ntwo\nthree\nfour\n"
+    new = "one\n2\nthree\nfour\nfive\n"
+    changes = line_changes(old, new)
+    assert changes == [(5, 5, "five\n"), (2, 3, "2\n")]
+    assert apply_changes(old, changes) == new
+    assert line_changes(old, old) == []
+
+
+def test_random_changes():
+    """Test the replacements rebuild the new text exactly"""
+    rng = random.Random(3)
+    for _ in range(200):
+        old = "".join(rng.choice(["a\n", "b\n", "c", "\n", "d\r\n"])
+                      for _ in range(rng.randrange(30)))
+        new = "".join(rng.choice(["a\n", "b\n", "c", "\n", "e\n"])
+                      for _ in range(rng.randrange(30)))
+        assert apply_changes(old, line_changes(old, new)) == new
+
+
+def test_read_tail(tmpdir):
+    """Test reading what was appended, with newlines normalized"""
+    path = tmpdir.join("log.txt")
+    path.write_binary("first\r\nsecond\r\n".encode('utf-8'))
+    assert read_text(str(path)) == "first\nsecond\n"
+    assert read_text(str(path), 7) == "second\n"
+    path.write_binary(b"caf\xe9\n")
+    with pytest.raises(UnicodeDecodeError):
+        read_text(str(path))
+    assert read_text(str(path), 0, 'cp1252') == "caf\xe9\n"
+
+
+class FakeTextbox:
+    """Applies line.column edits to the tab's document"""
+    def __init__(self, tab):
+        self.tab = tab
+        self.deletes = 0
+
+    def cget(self, option):
+        return True
+
+    def config(self, **options):
+        pass
+
+    def edit_separator(self):
+        pass
+
+    def delete(self, start, end):
+        self.deletes += 1
+        start = self.tab.offset(start)
+        self.tab.document.delete(start, self.tab.offset(end) - start)
+
+
+class FakeTab:
+    """A tab showing a file, with the document as its only text"""
+    def __init__(self, path, modified=False):
+        self.file_dir = str(path)
+        self.file_name = path.basename
+        self.document = PieceTable(read_text(self.file_dir))
+        self.textbox = FakeTextbox(self)
+        self.encoding = 'utf-8'
+        self.modified = modified
+        self.loader = None
+        self.hibernated = None
+        self.disk_stat = file_stat(self.file_dir)
+        self.appends = []
+
+    def is_read_only(self):
+        return False
+
+    def is_modified(self):
+        return self.modified
+
+    def restore(self):
+        self.hibernated = None
+
+    def offset(self, index):
+        line, column = map(int, index.split('.'))
+        return line_starts(self.document.text())[line - 1] + column
+
+    def widget_position(self, offset):
+        text = self.document.text()[:offset]
+        return text.count('\n') + 1, len(text) - text.rfind('\n') - 1
+
+    def insert_text(self, index, text):
+        self.document.insert(self.offset(index), text)
+
+    def append_text(self, text):
+        self.appends.append(text)
+        self.document.insert(len(self.document), text)
+
+    def mark_saved(self):
+        self.modified = False
+
+
+class FakeEditor:
+    """Shows the given tabs and records status bar messages"""
+    def __init__(self, *tabs):
+        self.open_tabs = tabs
+        self.status_bar = self
+
+    def tabs(self):
+        return range(len(self.open_tabs))
+
+    def nametowidget(self, tab_id):
+        return self.open_tabs[tab_id]
+
+    def config(self, text):
+        self.status = text
+
+
+@pytest.fixture
+def answers(monkeypatch):
+    """Answer the reload question with the answers appended to the list,
+       failing if it is asked more often
+    """
+    answers = []
+    monkeypatch.setattr(file_watcher.messagebox, "askyesno",
+                        lambda *args: answers.pop(0))
+    return answers
+
+
+def rewrite(path, data):
+    """Write data to the file as a newer version"""
+    time.sleep(0.01)
+    path.write_binary(data)
+
+
+def test_check_applies_line_changes(tmpdir):
+    """Test a clean tab follows a change in the middle of its file"""
+    path = tmpdir.join("notes.txt")
+    path.write_binary(b"one\ntwo\nthree\n")
+    tab = FakeTab(path)
+    editor = FakeEditor(tab)
+    rewrite(path, b"one\n2\nthree\nfour\n")
+    FileWatcher(editor).check(tab)
+    assert tab.document.text() == "one\n2\nthree\nfour\n"
+    assert tab.disk_stat == file_stat(str(path))
+    assert tab.appends == []
+    assert editor.status == "Reloaded notes.txt"
+    # Nothing changed since
+    tab.document.insert(0, "x")
+    FileWatcher(editor).check(tab)
+    assert tab.document.text().startswith("xone")
+
+
+def test_appended(tmpdir):
+    """Test text added at the end is appended without diffing"""
+    path = tmpdir.join("log.txt")
+    path.write_binary(b"first\n")
+    tab = FakeTab(path)
+    watcher = FileWatcher(FakeEditor(tab))
+    rewrite(path, b"first\nsecond\n")
+    assert watcher.appended(tab, file_stat(str(path)))
+    watcher.check(tab)
+    assert tab.appends == ["second\n"]
+    assert tab.textbox.deletes == 0
+    assert tab.document.text() == "first\nsecond\n"
+
+
+def test_not_appended(tmpdir):
+    """Test growth is not taken as appending when the old text changed,
+       the tab has unsaved changes or the encoding writes a mark
+    """
+    path = tmpdir.join("log.txt")
+    path.write_binary(b"first\n")
+    tab = FakeTab(path)
+    watcher = FileWatcher(FakeEditor(tab))
+    rewrite(path, b"FIRST\nsecond\n")
+    assert not watcher.appended(tab, file_stat(str(path)))
+    rewrite(path, b"first\nsecond\n")
+    stat = file_stat(str(path))
+    assert watcher.appended(tab, stat)
+    tab.modified = True
+    assert not watcher.appended(tab, stat)
+    tab.modified = False
+    tab.encoding = 'utf-8-sig'
+    assert not watcher.appended(tab, stat)
+
+
+def test_unsaved_changes_ask_once(tmpdir, answers):
+    """Test a declined reload keeps the tab and is not asked again for
+       the same version, but is for the next one
+    """
+    path = tmpdir.join("draft.txt")
+    path.write_binary(b"old\n")
+    tab = FakeTab(path, modified=True)
+    tab.document.insert(0, "mine ")
+    watcher = FileWatcher(FakeEditor(tab))
+    rewrite(path, b"theirs\n")
+    answers.append(False)
+    watcher.check(tab)
+    watcher.check(tab)
+    assert tab.document.text() == "mine old\n"
+    assert tab.is_modified()
+    assert watcher.declined[str(path.realpath())] == file_stat(str(path))
+
+    rewrite(path, b"theirs again\n")
+    answers.append(True)
+    watcher.check(tab)
+    assert tab.document.text() == "theirs again\n"
+    assert not tab.is_modified()
+    assert not watcher.declined
+    assert not answers
+
+
+def test_reload_restores_hibernated_tab(tmpdir):
+    """Test a hibernated tab is brought back before the change is applied"""
+    path = tmpdir.join("notes.txt")
+    path.write_binary(b"a\n")
+    tab = FakeTab(path)
+    tab.hibernated = object()
+    rewrite(path, b"b\n")
+    FileWatcher(FakeEditor(tab)).check(tab)
+    assert tab.hibernated is None
+    assert tab.document.text() == "b\n"
+
+
+def test_reload_falls_back_on_invalid_bytes(tmpdir):
+    """Test a change that is not valid in the tab's encoding switches to
+       the fallback instead of bringing in replacement characters
+    """
+    path = tmpdir.join("notes.txt")
+    path.write_binary(b"cafe\n")
+    tab = FakeTab(path)
+    rewrite(path, b"caf\xe9\n")
+    FileWatcher(FakeEditor(tab)).check(tab)
+    assert tab.encoding == 'cp1252'
+    assert tab.document.text() == "caf\xe9\n"
+
+
+def wait_for(changes, timeout=5):
+    try:
+        return changes.get(timeout=timeout)
+    except queue.Empty:
+        return None
+
+
+def test_polling_backend(tmpdir):
+    """Test the polling fallback reports a changed file"""
+    path = tmpdir.join("watched.txt")
+    path.write("old")
+    changes = queue.Queue()
+    backend = PollingBackend(changes, interval=0.05)
+    try:
+        backend.watch(str(path))
+        time.sleep(0.1)
+        assert changes.empty()
+        path.write("new content")
+        assert wait_for(changes) == str(path)
+    finally:
+        backend.close()
+
+
+@pytest.mark.skipif(not sys.platform.startswith('linux'),
+                    reason="inotify is Linux only")
+def test_inotify_backend(tmpdir):
+    """Test inotify reports appends and replacements, not other files"""
+    path = tmpdir.join("watched.txt")
+    path.write("old")
+    changes = queue.Queue()
+    backend = InotifyBackend(changes)
+    try:
+        backend.watch(str(path))
+        tmpdir.join("other.txt").write("x")
+        with open(str(path), 'a') as file:
+            file.write(" more")
+        assert wait_for(changes) == str(path)
+        while wait_for(changes, 0.2) is not None:
+            pass
+        replacement = tmpdir.join("replacement.txt")
+        replacement.write("replaced")
+        replacement.rename(path)
+        assert wait_for(changes) == str(path)
+        while wait_for(changes, 0.2) is not None:
+            pass
+        backend.unwatch(str(path))
+        path.write("unwatched")
+        assert wait_for(changes, 0.5) is None
+    finally:
+        backend.close()
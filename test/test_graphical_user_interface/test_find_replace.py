@@ -0,0 +1,169 @@
+#!/usr/bin/env python3
+"""Module to test the find/replace search index"""
+
+import random
+import re
+from graphical_user_interface import find_replace
+from graphical_user_interface.find_replace import FindBar, SearchIndex
+from graphical_user_interface.long_lines import SEGMENT_LENGTH
+from graphical_user_interface.piece_table import PieceTable
+from graphical_user_interface.User_Interface import Tab
+
+
+def full_search(text, pattern, flags=re.MULTILINE):
+    """Non-empty matches found by scanning the whole text"""
+    return [match.span() for match in re.finditer(pattern, text, flags)
+            if match.end() > match.start()]
+
+
+def test_literal_search():
+    """Test literal patterns are not treated as regular expressions"""
+    index = SearchIndex(PieceTable("a.b a+b a.b"))
+    assert index.search("a.b") == 2
+    assert index.matches == [(0, 3), (8, 11)]
+
+
+def test_regex_and_case():
+    """Test regular expressions and case-insensitive search"""
+    index = SearchIndex(PieceTable("Foo foo\nfOO"))
+    assert index.search("^foo", regex=True, ignore_case=True) == 2
+    assert index.search("foo") == 1
+    assert index.search("(", regex=True) == 0
+    assert index.error
+
+
+def test_matches_follow_edits():
+    """Test random edits give the same matches as a full search"""
+    rng = random.Random(7)
+    words = ["def ", "self", "x", "\n", "  ", "return ", "sel", "f."]
+    text = "".join(rng.choice(words) for _ in range(400))
+    document = PieceTable(text)
+    index = SearchIndex(document)
+    for pattern in ("self", r"\bre\w+", r"^\s*def"):
+        index.search(pattern, regex=True)
+        for _ in range(200):
+            offset = rng.randrange(len(document) + 1)
+            if rng.random() < 0.5 and offset < len(document):
+                length = rng.randrange(1, 10)
+                length = min(length, len(document) - offset)
+                document.delete(offset, length)
+                index.edited(offset, length, 0)
+            else:
+                word = rng.choice(words)
+                document.insert(offset, word)
+                index.edited(offset, 0, len(word))
+            if rng.random() < 0.3:
+                index.refresh()
+                assert index.matches == full_search(document.text(),
+                                                    pattern)
+        index.refresh()
+        assert index.matches == full_search(document.text(), pattern)
+
+
+def test_visible_range_and_navigation():
+    """Test matches are looked up by range and cursor position"""
+    index = SearchIndex(PieceTable("ab ab ab ab"))
+    index.search("ab")
+    assert index.in_range(4, 7) == [(3, 5), (6, 8)]
+    assert index.next_match(4) == (6, 8)
+    assert index.next_match(10) == (0, 2)
+    assert index.next_match(4, backwards=True) == (3, 5)
+    assert index.next_match(0, backwards=True) == (9, 11)
+
+
+def test_replace_all_region():
+    """Test replace-all produces one region with every match replaced"""
+    document = PieceTable("x = 1; y = 2; z = 3")
+    index = SearchIndex(document)
+    index.search(r"(\w) = (\d)", regex=True)
+    start, end, new = index.replace_all(r"\2 = \1", regex=True)
+    text = document.text()
+    assert text[:start] + new + text[end:] == "1 = x; 2 = y; 3 = z"
+    index.search("nothing")
+    assert index.replace_all("x") is None
+
+
+def test_scan_in_windows(monkeypatch):
+    """Test matches across window ends are found as by a full search"""
+    monkeypatch.setattr(find_replace, 'SCAN_WINDOW', 300)
+    rng = random.Random(3)
+    text = "".join(rng.choice(["ab", "a", "b\n", "  "]) for _ in range(3000))
+    document = PieceTable(text)
+    index = SearchIndex(document)
+    for pattern in (r"a+b", r"b$", r"(?<=a)b(?=\s)", r"a[ab\s]*"):
+        index.search(pattern, regex=True)
+        assert index.matches == full_search(text, pattern)
+
+
+def test_edits_do_not_copy_the_document():
+    """Test keeping the matches up to date reads only around the edits"""
+    class CountingTable(PieceTable):
+        copies = 0
+
+        def text(self):
+            CountingTable.copies += 1
+            return PieceTable.text(self)
+
+    document = CountingTable("word " * 100000)
+    index = SearchIndex(document)
+    index.search("word")
+    document.insert(250000, "word")
+    index.edited(250000, 0, 4)
+    assert len(index.in_range(0, len(document))) == 100001
+    assert CountingTable.copies == 0
+
+
+def test_edit_keeps_matches_before_it():
+    """Test an edit leaves the list and the matches before it in place
+       and only moves the ones after it
+    """
+    document = PieceTable("ab " * 1000)
+    index = SearchIndex(document)
+    index.search("ab")
+    matches = index.matches
+    head = matches[:995]
+    document.insert(2990, "xx")
+    index.edited(2990, 0, 2)
+    assert index.matches is matches
+    assert all(old is new for old, new in zip(head, index.matches))
+    assert index.matches[-1] == (2999, 3001)
+    index.refresh()
+    assert index.matches == full_search(document.text(), "ab")
+
+
+def test_typing_waits_to_search(tmpdir):
+    """Test keystrokes in the Find entry search once typing pauses, or
+       when a match is asked for
+    """
+    file_path = tmpdir.join("notes.txt")
+    file_path.write("one two one")
+    bar = FindBar(Tab(FileDir=str(file_path)))
+    bar.find_text.set("o")
+    bar.find_text.set("on")
+    assert bar.index.regex is None
+    assert bar.find_next() == (0, 2)
+    bar.find_text.set("one")
+    bar.after(find_replace.SEARCH_DELAY * 2, bar.quit)
+    bar.mainloop()
+    assert bar.index.matches == [(0, 3), (8, 11)]
+
+
+def test_replace_keeps_long_lines_in_rows(tmpdir):
+    """Test replacements in long-line mode are cut into rows like any
+       other insert, and the cursor ends after the replacement
+    """
+    file_path = tmpdir.join("app.min.js")
+    file_path.write("a;" * 5000)
+    tab = Tab(FileDir=str(file_path))
+    assert tab.long_lines
+    bar = FindBar(tab)
+    bar.find_text.set(";")
+    bar.replace_text.set("; ")
+    bar.search()
+    bar.find_next()
+    bar.replace()
+    assert bar._offset('insert') == 3
+    bar.replace_all()
+    rows = tab.textbox.get("1.0", "end-1c").split("\n")
+    assert max(len(row) for row in rows) <= SEGMENT_LENGTH
+    assert tab.document.text() == "a; " * 5000
@@ -0,0 +1,43 @@
+#!/usr/bin/env python3
+"""Module to test the compressed buffers of hibernated tabs"""
+
+from graphical_user_interface.hibernate import HibernatedDocument
+from graphical_user_interface.piece_table import PieceTable
+
+
+def test_round_trip():
+    """Test the content reads back unchanged and compressed"""
+    text = "def main():\n    print('héllo wörld')\n" * 10000
+    document = HibernatedDocument([text], len(text))
+    assert len(document) == len(text)
+    assert document.text() == text
+    assert document.file is None
+    assert document.compressed_size < len(text) // 10
+
+
+def test_spill_to_file():
+    """Test large buffers go to a temporary file"""
+    text = "".join(f"line {i}\n" for i in range(100000))
+    document = HibernatedDocument([text[:1000], text[1000:]], len(text),
+                                  spill_size=1024)
+    assert document.file is not None
+    assert document.memory == []
+    assert document.text() == text
+    # Read twice: the file is not consumed
+    assert "".join(document.chunks()) == text
+    document.close()
+
+
+def test_from_piece_table():
+    """Test a document split across pieces and multi-byte characters"""
+    table = PieceTable("ab€cd")
+    table.insert(2, "→x")
+    document = HibernatedDocument(table.chunks(), len(table))
+    assert document.text() == table.text() == "ab→x€cd"
+
+
+def test_empty_document():
+    """Test an empty tab hibernates to nothing"""
+    document = HibernatedDocument([], 0)
+    assert document.text() == ""
+    assert list(document.chunks()) == []
@@ -0,0 +1,120 @@
+#!/usr/bin/env python3
+"""Module to test incremental syntax highlighting"""
+
+from graphical_user_interface.highlighter import LineStates, \
+    PythonLexer, CLexer, lexer_for
+
+
+def tags(lexer, line, state=None):
+    """(text, tag) of every token of a line"""
+    tokens, state = lexer.lex_line(line, state)
+    return [(line[start:end], tag) for start, end, tag in tokens], state
+
+
+def test_python_tokens():
+    """Test keywords, strings, comments, numbers and definitions"""
+    found, state = tags(PythonLexer(), "def f(x): return 'a#b' + 42  # c")
+    assert ("def", "syntax_keyword") in found
+    assert ("f", "syntax_definition") in found
+    assert ("'a#b'", "syntax_string") in found
+    assert ("42", "syntax_number") in found
+    assert ("# c", "syntax_comment") in found
+    assert state is None
+
+
+def test_multiline_string_state():
+    """Test triple-quoted strings carry their state across lines"""
+    lexer = PythonLexer()
+    found, state = tags(lexer, 'x = """start')
+    assert state == '"""'
+    found, state = tags(lexer, 'middle if', state)
+    assert found == [('middle if', 'syntax_string')]
+    found, state = tags(lexer, 'end""" if', state)
+    assert found == [('end"""', 'syntax_string'), ('if', 'syntax_keyword')]
+    assert state is None
+
+
+def test_c_block_comment():
+    """Test C block comments span lines"""
+    lexer = CLexer()
+    _, state = tags(lexer, "int x; /* open")
+    assert state == "*/"
+    found, state = tags(lexer, "still */ return 0;", state)
+    assert found[0] == ("still */", "syntax_comment")
+    assert state is None
+
+
+def test_lexer_for():
+    """Test lexers are picked by file extension"""
+    assert isinstance(lexer_for("main.py"), PythonLexer)
+    assert isinstance(lexer_for("util.H"), CLexer)
+    assert lexer_for("notes.txt") is None
+    assert lexer_for(None) is None
+
+
+class CountingLines:
+    """Document lines that count how many times each is lexed"""
+    def __init__(self, lines):
+        self.lines = lines
+        self.calls = 0
+
+    def __call__(self, line):
+        self.calls += 1
+        return self.lines[line - 1]
+
+
+def full_states(lexer, lines):
+    """States computed from scratch"""
+    states = LineStates(lexer, len(lines))
+    states.advance(lambda line: lines[line - 1], len(lines))
+    return states.states
+
+
+def test_relex_stops_when_state_converges():
+    """Test an edit re-lexes only until the states match again"""
+    lines = ["x = 1"] * 1000
+    get_line = CountingLines(lines)
+    states = LineStates(PythonLexer(), len(lines))
+    states.advance(get_line, len(lines))
+    assert get_line.calls == 999
+
+    get_line.calls = 0
+    lines[500] = "y = 2  # changed"
+    states.inserted(501, 0)
+    states.advance(get_line, len(lines))
+    assert get_line.calls <= 2
+    assert states.states == full_states(PythonLexer(), lines)
+
+
+def test_relex_follows_opened_string():
+    """Test opening a string re-lexes down to where it closes"""
+    lines = ["x = 1"] * 100
+    lines[60] = '"""'
+    lexer = PythonLexer()
+    states = LineStates(lexer, len(lines))
+    states.advance(CountingLines(lines), len(lines))
+
+    lines[10] = 'a = """'
+    states.inserted(11, 0)
+    get_line = CountingLines(lines)
+    states.advance(get_line, len(lines))
+    assert states.states == full_states(lexer, lines)
+    assert get_line.calls == 89
+
+    # Inserting and deleting lines keeps the states lined up
+    lines[20:20] = ["b = 2", "c = 3"]
+    states.inserted(20, 2)
+    del lines[5:8]
+    states.deleted(5, 8)
+    states.advance(CountingLines(lines), len(lines))
+    assert states.states == full_states(lexer, lines)
+
+
+def test_advance_in_slices():
+    """Test lexing stops at the deadline and picks up where it left"""
+    lines = ["x = 1"] * 50
+    states = LineStates(PythonLexer(), len(lines))
+    assert not states.advance(CountingLines(lines), 50, deadline=0)
+    assert states.valid == 2
+    assert states.advance(CountingLines(lines), 50)
+    assert states.valid == 50
@@ -0,0 +1,231 @@
+#!/usr/bin/env python3
+"""Module to test the crash-recovery journal"""
+
+import os
+import pytest
+from graphical_user_interface.journal import (
+    Journal,
+    JournalWriter,
+    replay,
+    orphaned_journals,
+    recover_tabs
+)
+from graphical_user_interface.line_index import LineIndex
+from graphical_user_interface.piece_table import PieceTable
+
+
+class FakeTab:
+    """Just enough of a tab: the document, its line index and timers"""
+    def __init__(self, text='', file_dir=None):
+        self.document = PieceTable(text)
+        self.lines = LineIndex(text)
+        self.file_dir = file_dir
+        self.encoding = 'utf-8'
+        self.loader = None
+        self.listeners = []
+
+    def add_edit_listener(self, listener):
+        self.listeners.append(listener)
+
+    def after(self, delay, callback):
+        return 'after#1'
+
+    def after_cancel(self, after_id):
+        pass
+
+    def edit(self, action, line, column, text):
+        """Apply an edit the way the text widget hooks do"""
+        start = f'{line}.{column}'
+        offset = self.lines.offset(line, column)
+        self.last_edit = (offset, text)
+        if action == 'insert':
+            self.document.insert(offset, text)
+            self.lines.insert(line, column, text)
+            end = start
+        else:
+            end_line, end_column = self.lines.position(offset + len(text))
+            end = f'{end_line}.{end_column}'
+            self.document.delete(offset, len(text))
+            self.lines.delete(line, column, end_line, end_column, text)
+        for listener in self.listeners:
+            listener(action, start, end, text)
+
+
+class FakeTextbox:
+    """Keeps the modified flag"""
+    modified = False
+
+    def edit_reset(self):
+        pass
+
+    def edit_modified(self, flag=None):
+        if flag is None:
+            return self.modified
+        self.modified = flag
+
+
+class FakeEditor:
+    """Opens FakeTabs journaling to directory"""
+    def __init__(self, directory, writer):
+        self.directory = directory
+        self.writer = writer
+        self.tabs = []
+
+    def add_tab(self):
+        tab = FakeTab()
+        tab.file_name = None
+        tab.textbox = FakeTextbox()
+        tab.append_text = lambda text: tab.document.insert(0, text)
+        tab.on_modified = tab.update_highlighter = lambda: None
+        tab.journal = Journal(tab, self.directory, self.writer)
+        self.tabs.append(tab)
+
+    def indexed_tab(self, index):
+        return self.tabs[index]
+
+
+@pytest.fixture
+def writer():
+    writer = JournalWriter()
+    yield writer
+    writer.close()
+
+
+def test_untitled_replay(tmpdir, writer):
+    """Test the edits of an untitled tab replay to its content"""
+    tab = FakeTab()
+    journal = Journal(tab, str(tmpdir), writer)
+    tab.edit('insert', 1, 0, "hello\nwörld")
+    tab.edit('delete', 1, 1, "ello\nw")
+    tab.edit('insert', 1, 1, "i ")
+    journal.flush()
+    writer.wait()
+    header, text = replay(journal.path)
+    assert header['file'] is None
+    assert text == tab.document.text() == "hi örld"
+
+
+def test_file_base(tmpdir, writer):
+    """Test edits apply to the file they were made to, unless it changed"""
+    file_path = tmpdir.join("notes.txt")
+    file_path.write_text("one\ntwo\n", "utf-8")
+    tab = FakeTab("one\ntwo\n", str(file_path))
+    journal = Journal(tab, str(tmpdir.mkdir("journal")), writer)
+    tab.edit('insert', 2, 3, " three")
+    journal.flush()
+    writer.wait()
+    assert replay(journal.path)[1] == "one\ntwo three\n"
+    file_path.write_text("changed on disk\n", "utf-8")
+    with pytest.raises(ValueError):
+        replay(journal.path)
+
+
+def test_torn_record(tmpdir, writer):
+    """Test a record cut short by a crash is ignored"""
+    tab = FakeTab()
+    journal = Journal(tab, str(tmpdir), writer)
+    tab.edit('insert', 1, 0, "kept")
+    journal.flush()
+    writer.wait()
+    with open(journal.path, 'a', encoding='utf-8') as file:
+        file.write('["+", 4, "lo')
+    assert replay(journal.path)[1] == "kept"
+
+
+def test_compaction(tmpdir, writer):
+    """Test records outgrowing the document become one snapshot"""
+    tab = FakeTab()
+    journal = Journal(tab, str(tmpdir), writer)
+    for _ in range(50):
+        tab.edit('insert', 1, 0, "x" * 1000)
+        tab.edit('delete', 1, 0, "x" * 1000)
+        journal.flush()
+    tab.edit('insert', 1, 0, "left")
+    journal.flush()
+    journal.compact()
+    writer.wait()
+    assert os.path.getsize(journal.path) < 200
+    assert replay(journal.path)[1] == "left"
+
+
+def test_clear(tmpdir, writer):
+    """Test saving removes the journal"""
+    tab = FakeTab()
+    journal = Journal(tab, str(tmpdir), writer)
+    tab.edit('insert', 1, 0, "text")
+    journal.flush()
+    writer.wait()
+    path = journal.path
+    assert os.path.exists(path)
+    journal.clear()
+    writer.wait()
+    assert not os.path.exists(path)
+
+
+def test_orphans(tmpdir):
+    """Test journals of running editors are left alone"""
+    for name, pid in (("live", os.getppid()), ("dead", 2 ** 22 + 1)):
+        tmpdir.join(name + ".journal").write(
+            '{"pid": %d, "file": null, "snapshot": false}\n' % pid)
+    assert orphaned_journals(str(tmpdir)) == [
+        str(tmpdir.join("dead.journal"))]
+
+
+def crashed_journal(tab, directory, writer, text):
+    """Journal of text typed into tab by an editor no longer running"""
+    journal = Journal(tab, directory, writer)
+    tab.edit('insert', 1, 0, text)
+    journal.flush()
+    writer.wait()
+    with open(journal.path, encoding='utf-8') as file:
+        lines = file.readlines()
+    lines[0] = lines[0].replace('"pid": %d' % os.getpid(),
+                                '"pid": %d' % (2 ** 22 + 1))
+    with open(journal.path, 'w', encoding='utf-8') as file:
+        file.writelines(lines)
+    return journal.path
+
+
+def test_recover_tabs(tmpdir, writer):
+    """Test unsaved tabs come back dirty and their journal is replaced"""
+    directory = str(tmpdir.mkdir("journal"))
+    path = crashed_journal(FakeTab(), directory, writer, "lost work")
+    editor = FakeEditor(str(tmpdir.mkdir("new")), writer)
+    tabs, kept = recover_tabs(editor, directory)
+    writer.wait()
+    assert kept == []
+    assert [tab.document.text() for tab in tabs] == ["lost work"]
+    assert tabs[0].textbox.edit_modified()
+    assert not os.path.exists(path)
+    assert os.path.exists(tabs[0].journal.path)
+
+
+def test_recover_changed_base(tmpdir, writer):
+    """Test edits to a file changed since are recovered untitled and
+       their journal is kept
+    """
+    file_path = tmpdir.join("notes.txt")
+    file_path.write_text("one\n", "utf-8")
+    directory = str(tmpdir.mkdir("journal"))
+    path = crashed_journal(FakeTab("one\n", str(file_path)), directory,
+                           writer, "zero ")
+    file_path.write_text("one, changed\n", "utf-8")
+    editor = FakeEditor(str(tmpdir.mkdir("new")), writer)
+    tabs, kept = recover_tabs(editor, directory)
+    assert tabs[0].file_dir is None
+    assert tabs[0].document.text() == "zero one, changed\n"
+    assert not os.path.exists(path)
+    assert replay(kept[0], check=False)[1] == "zero one, changed\n"
+
+
+def test_unreadable_journal_is_kept(tmpdir, writer):
+    """Test a journal that cannot be replayed is never deleted"""
+    file_path = tmpdir.join("notes.txt")
+    file_path.write_text("one\n", "utf-8")
+    directory = str(tmpdir.mkdir("journal"))
+    crashed_journal(FakeTab("one\n", str(file_path)), directory, writer,
+                    "zero ")
+    file_path.remove()
+    tabs, kept = recover_tabs(FakeEditor(directory, writer), directory)
+    assert tabs == []
+    assert len(kept) == 1 and os.path.exists(kept[0])
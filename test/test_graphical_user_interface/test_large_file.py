@@ -0,0 +1,141 @@
+#!/usr/bin/env python3
+"""Module to test the large file viewer"""
+
+import pytest
+import graphical_user_interface.large_file as large_file
+from graphical_user_interface.large_file import (
+    LargeFileView,
+    SparseLineIndex
+)
+import graphical_user_interface.User_Interface as User_Interface
+
+
+@pytest.fixture
+def small_blocks(monkeypatch):
+    """Use tiny blocks so a few lines span several checkpoints"""
+    monkeypatch.setattr(SparseLineIndex, "BLOCK", 7)
+
+
+def test_line_offsets(small_blocks):
+    """Test every line start is found through the checkpoints"""
+    data = b"first\nsecond line\n\nfourth\nlast"
+    index = SparseLineIndex(data)
+    assert index.build()
+    assert index.line_count() == 5
+    assert [index.line_offset(i) for i in range(5)] == [0, 6, 18, 19, 26]
+
+
+def test_line_offsets_in_big_blocks():
+    """Test line starts found by counting halves of a block match a scan
+       of the data
+    """
+    data = b"".join(b"x" * (i % 7) + b"\n" for i in range(3000)) + b"end"
+    index = SparseLineIndex(data)
+    index.BLOCK = 4096
+    index.build()
+    starts = [0] + [i + 1 for i, byte in enumerate(data) if byte == 10]
+    assert [index.line_offset(i) for i in range(len(starts))] == starts
+
+
+def test_offset_line(small_blocks):
+    """Test byte offsets map back to their line"""
+    data = b"a\nbb\nccc\n"
+    index = SparseLineIndex(data)
+    index.build()
+    assert index.offset_line(0) == 0
+    assert index.offset_line(3) == 1
+    assert index.offset_line(len(data)) == 3
+
+
+def test_incremental_build(small_blocks):
+    """Test the index can be built a few blocks at a time"""
+    data = b"line\n" * 20
+    index = SparseLineIndex(data)
+    assert not index.build(max_blocks=2)
+    while not index.build(max_blocks=2):
+        pass
+    assert index.line_count() == 21
+    assert index.line_offset(20) == len(data)
+
+
+class FakeTextbox:
+    """Holds the materialized text, ten rows high"""
+    def __init__(self):
+        self.text = ''
+
+    def winfo_height(self):
+        return 10
+
+    def config(self, **options):
+        pass
+
+    def delete(self, start, end):
+        self.text = ''
+
+    def insert(self, index, text):
+        self.text = text
+
+    def yview(self, index):
+        self.top_row = int(index.split('.')[0])
+
+
+class FakeTab:
+    """Gives the viewer a text widget and a scrollbar"""
+    def __init__(self):
+        self.textbox = FakeTextbox()
+        self.yscrollbar = self
+
+    def set(self, first, last):
+        pass
+
+
+def viewer(data):
+    """A viewer over data with rows one pixel high"""
+    view = LargeFileView(FakeTab(), None)
+    view.data = data
+    view.index = SparseLineIndex(data)
+    view.index.build()
+    view._row_height = 1
+    return view
+
+
+def visible_line(view):
+    """The file line at the top of the widget"""
+    rows = view.textbox.text.split('\n')
+    return rows[view.textbox.top_row - 1]
+
+
+def test_window_over_budget_starts_at_top(monkeypatch):
+    """Test lines too long to fit the margin above still show top, and
+       a line over the budget is cut on a character boundary
+    """
+    monkeypatch.setattr(large_file, "MAX_WINDOW_BYTES", 101)
+    data = b"".join(b"%d%s\n" % (i, b"." * 30) for i in range(20)) + \
+        "é".encode('utf-8') * 100 + b"\nafter\n" + b"end\n" * 10
+    view = viewer(data)
+    view.scroll_to(10)
+    assert view.window_start == 10
+    assert visible_line(view) == "10" + "." * 30
+    view.scroll_to(20)
+    assert view.window_start == 20
+    assert view.textbox.text == "é" * 50
+    view.scroll_to(20)
+    view.scroll_to(21)
+    assert visible_line(view) == "after"
+
+
+def test_large_file_tab(tmpdir, monkeypatch):
+    """Test big files open read-only with only a window materialized"""
+    monkeypatch.setattr(User_Interface, "LARGE_FILE_THRESHOLD", 1024)
+    file_path = tmpdir.join("huge.log")
+    file_path.write("".join(f"line {i}\n" for i in range(10000)))
+    tab = User_Interface.Tab(FileDir=str(file_path))
+    assert tab.is_read_only()
+    lines = int(tab.textbox.index("end-1c").split(".")[0])
+    assert lines < 10000
+    tab.large_file.scroll_to(5000)
+    top = tab.large_file.top
+    assert tab.textbox.get(f"{top - tab.large_file.window_start + 1}.0",
+                           f"{top - tab.large_file.window_start + 1}.end") \
+        == f"line {top}"
+    tab.close()
@@ -0,0 +1,140 @@
+#!/usr/bin/env python3
+"""Module to test the line index"""
+
+import random
+import pytest
+
+from graphical_user_interface.line_index import LineIndex
+
+
+def test_offsets():
+    """Test Tk positions map to character offsets and back"""
+    index = LineIndex("one\ntwo\n\nfour")
+    assert index.line_count() == 4
+    assert index.offset(1, 0) == 0
+    assert index.offset(2, 1) == 5
+    assert index.offset(4, 4) == 13
+    assert index.position(5) == (2, 1)
+    assert index.position(9) == (4, 0)
+
+
+def test_insert_lines():
+    """Test inserting text that contains newlines"""
+    index = LineIndex("abc")
+    index.insert(1, 1, "x\ny\nz")
+    # Document is now "ax\ny\nzbc"
+    assert index.line_count() == 3
+    assert index.line_length(1) == 3
+    assert index.line_length(3) == 3
+    assert len(index) == 8
+
+
+def test_delete_lines():
+    """Test deleting across several lines"""
+    index = LineIndex("one\ntwo\nthree")
+    index.delete(1, 2, 3, 1)
+    # Document is now "onhree"
+    assert index.line_count() == 1
+    assert len(index) == 6
+
+
+def test_many_lines():
+    """Test lines spread over several blocks"""
+    text = "".join(f"{i}\n" for i in range(5000))
+    index = LineIndex(text)
+    assert index.line_count() == 5001
+    assert index.offset(4001, 0) == text.index("4000\n")
+    index.delete(2, 0, 4001, 0)
+    assert index.line_count() == 1002
+    assert index.offset(2, 0) == 2
+
+
+def test_byte_offsets():
+    """Test lines with multi-byte characters map to UTF-8 offsets"""
+    index = LineIndex("héllo\n€\nz")
+    assert index.byte_size() == len("héllo\n€\nz".encode('utf-8'))
+    assert index.line_start_byte(2) == 7
+    assert index.line_start_byte(3) == 11
+    assert index.byte_offset(1, "hé") == 3
+    assert index.byte_position(7) == (2, 0)
+    assert index.byte_position(12) == (3, 1)
+
+
+def test_non_ascii_edits():
+    """Test splitting and joining lines that hold multi-byte characters"""
+    index = LineIndex("aé€b")
+    index.insert(1, 2, "\n", lambda: "aé")
+    assert index.line_bytes(1) == 4
+    assert index.line_bytes(2) == 4
+    index.delete(1, 2, 2, 1, "\n€")
+    # Document is now "aéb"
+    assert index.line_count() == 1
+    assert index.byte_size() == 4
+
+
+def test_random_edits():
+    """Test the index against the text after many random edits"""
+    rng = random.Random(7)
+    text = "".join(rng.choice("ab€é\n") for _ in range(5000))
+    index = LineIndex(text)
+    for _ in range(300):
+        start = rng.randrange(len(text) + 1)
+        line = text.count('\n', 0, start) + 1
+        column = start - (text.rfind('\n', 0, start) + 1)
+        if rng.random() < 0.5:
+            new = "".join(rng.choice("xü\n")
+                          for _ in range(rng.randrange(40)))
+            prefix = text[start - column:start]
+            index.insert(line, column, new, lambda: prefix)
+            text = text[:start] + new + text[start:]
+        else:
+            end = min(len(text), start + rng.randrange(2000))
+            end_line = text.count('\n', 0, end) + 1
+            end_column = end - (text.rfind('\n', 0, end) + 1)
+            index.delete(line, column, end_line, end_column, text[start:end])
+            text = text[:start] + text[end:]
+    assert index.line_count() == text.count('\n') + 1
+    assert len(index) == len(text)
+    assert index.byte_size() == len(text.encode('utf-8'))
+    for offset in range(0, len(text), 97):
+        line = text.count('\n', 0, offset) + 1
+        column = offset - (text.rfind('\n', 0, offset) + 1)
+        assert index.offset(line, column) == offset
+        assert index.position(offset) == (line, column)
+        prefix = text[offset - column:offset]
+        assert index.byte_offset(line, prefix) == \
+            len(text[:offset].encode('utf-8'))
+
+
+@pytest.mark.parametrize('encoding', ['cp1252', 'utf-8-sig', 'utf-16',
+                                      'utf-16-be', 'utf-32'])
+def test_file_encodings(encoding):
+    """Test byte offsets follow the encoding and count its BOM"""
+    rng = random.Random(5)
+    text = "".join(rng.choice("ab€é\n") for _ in range(2000))
+    index = LineIndex(text, encoding)
+    for _ in range(100):
+        start = rng.randrange(len(text) + 1)
+        line = text.count('\n', 0, start) + 1
+        column = start - (text.rfind('\n', 0, start) + 1)
+        if rng.random() < 0.5:
+            new = "".join(rng.choice("x€\n") for _ in range(20))
+            prefix = text[start - column:start]
+            index.insert(line, column, new, lambda: prefix)
+            text = text[:start] + new + text[start:]
+        else:
+            end = min(len(text), start + rng.randrange(300))
+            end_line = text.count('\n', 0, end) + 1
+            end_column = end - (text.rfind('\n', 0, end) + 1)
+            index.delete(line, column, end_line, end_column, text[start:end])
+            text = text[:start] + text[end:]
+    assert index.byte_size() == len(text.encode(encoding))
+    for offset in range(0, len(text), 37):
+        line = text.count('\n', 0, offset) + 1
+        column = offset - (text.rfind('\n', 0, offset) + 1)
+        # Encoding a prefix writes the BOM too, as the file starts with it
+        size = len(text[:offset].encode(encoding))
+        prefix = text[offset - column:offset]
+        assert index.byte_offset(line, prefix) == size
+        assert index.byte_position(size) == \
+            (line, size - index.line_start_byte(line))
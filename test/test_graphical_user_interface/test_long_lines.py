@@ -0,0 +1,106 @@
+#!/usr/bin/env python3
+"""Module to test the display of long lines as rows"""
+
+import random
+from graphical_user_interface.long_lines import (
+    LONG_LINE,
+    LongLines,
+    SoftBreaks,
+    has_long_line,
+    segment,
+    strip_soft
+)
+
+
+class FakeTextbox:
+    """Records bindings instead of making them"""
+    def bind(self, sequence, callback):
+        return sequence
+
+    def unbind(self, sequence, binding):
+        pass
+
+
+class FakeTab:
+    """Holds the one attribute LongLines needs"""
+    def __init__(self):
+        self.textbox = FakeTextbox()
+
+
+def test_has_long_line():
+    """Test a line over LONG_LINE is found, counting the start column"""
+    assert not has_long_line('a' * LONG_LINE + '\nb')
+    assert has_long_line('b\n' + 'a' * (LONG_LINE + 1))
+    assert has_long_line('a' * 10, LONG_LINE - 5)
+    assert not has_long_line('\n' + 'a' * 10, LONG_LINE - 5)
+
+
+def test_segment():
+    """Test rows are cut at the limit and the cuts are reported"""
+    shown, soft = segment('abcdefg\nhi', limit=3)
+    assert shown == 'abc\ndef\ng\nhi'
+    assert soft == [3, 7]
+    assert strip_soft(shown, soft) == 'abcdefg\nhi'
+    # The first row continues a line already started
+    shown, soft = segment('abcd', column=2, limit=3)
+    assert shown == 'a\nbcd'
+    assert soft == [1]
+    assert segment('abc', limit=3) == ('abc', [])
+
+
+def test_soft_breaks_mapping():
+    """Test offsets map between the widget and the document"""
+    text = ''.join(random.choice('ab\n') for _ in range(500))
+    shown, soft = segment(text, limit=7)
+    breaks = SoftBreaks(soft)
+    document = 0
+    for widget in range(len(shown) + 1):
+        assert breaks.to_document(widget) == document
+        if widget not in soft:
+            assert breaks.to_widget(document) == widget
+            document += 1
+
+
+def test_edits_reach_the_document():
+    """Test widget edits, with and without soft breaks, edit the
+       document as if the breaks were not there
+    """
+    random.seed(7)
+    long_lines = LongLines(FakeTab())
+    document = 'x' * 1500 + '\n' + 'y' * 2500
+    shown = long_lines.reset(document)
+    assert len(long_lines.breaks) == 3
+    for _ in range(300):
+        if random.random() < 0.5 and shown:
+            start = random.randrange(len(shown))
+            end = min(len(shown), start + random.randint(1, 1200))
+            text = shown[start:end]
+            position, content = long_lines.edited('delete', start, text)
+            shown = shown[:start] + shown[end:]
+            assert document[position:position + len(content)] == content
+            document = document[:position] + \
+                document[position + len(content):]
+        else:
+            start = random.randint(0, len(shown))
+            text = random.choice(['z', '\n', 'abc'])
+            position, content = long_lines.edited('insert', start, text)
+            shown = shown[:start] + text + shown[start:]
+            document = document[:position] + content + document[position:]
+        assert strip_soft(shown, long_lines.breaks.breaks) == document
+
+
+def test_undo_restores_soft_breaks():
+    """Test undoing a delete puts the soft breaks it took back as such"""
+    long_lines = LongLines(FakeTab())
+    document = 'a' * 2500
+    shown = long_lines.reset(document)
+    text = shown[900:1100]
+    position, content = long_lines.edited('delete', 900, text)
+    assert content == document[900:1099]
+    assert len(long_lines.breaks) == 1
+    position, content = long_lines.edited('insert', 900, text, undoing=True)
+    assert (position, content) == (900, document[900:1099])
+    assert len(long_lines.breaks) == 2
+    # Typed newlines are real ones
+    position, content = long_lines.edited('insert', 5, '\n')
+    assert content == '\n'
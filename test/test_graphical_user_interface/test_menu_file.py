@@ -4,6 +4,7 @@
 import pytest
 from unittest.mock import patch
 from tkinter import Tk
+import tkinter.font as tkfont
 import os
 from graphical_user_interface.User_Interface import (
     TextEditorBase,
@@ -35,31 +36,38 @@ def test_create_menu(root, editor):
 
 
 def test_change_font(editor):
-    """Test changing font type"""
-    # Initial font
-    initial_font = editor.current_tab().textbox['font']
-
-    # Change font
+    """Test changing font type of every tab"""
+    editor.add_tab()
     graphical_user_interface.menu_file.change_font(editor, "Arial")
 
-    # Check if font changed successfully
-    assert editor.current_tab().textbox['font'] != initial_font
-    assert editor.current_tab().textbox['font'][:5] == "Arial"
+    # Every tab shows the one shared font
+    for index in range(2):
+        font = tkfont.nametofont(editor.indexed_tab(index).textbox['font'])
+        assert font.cget('family') == "Arial"
 
 
 def test_change_font_size(editor):
     """Test changing font size"""
-    # Initial font size
-    initial_font_size = editor.current_tab().textbox['font'][1]
-
-    # Change font size
     graphical_user_interface.menu_file.change_font_size(editor, 14)
+    font = tkfont.nametofont(editor.current_tab().textbox['font'])
+    assert font.cget('size') == 14
+
+    # Tabs created later use it too
+    editor.add_tab()
+    assert editor.indexed_tab(-1).textbox['font'] == str(font)
+
 
-    # Check if font size changed successfully
-    assert editor.current_tab().textbox['font'][1] != initial_font_size
-    first = editor.current_tab().textbox['font'][17].strip()
-    second = editor.current_tab().textbox['font'][18].strip()
-    assert int(first + second) == 14
+def test_toggle_word_wrap(editor):
+    """Test wrap reaches background tabs once they are selected"""
+    editor.add_tab()
+    wrap = editor.current_tab().textbox.cget('wrap')
+    graphical_user_interface.menu_file.toggle_word_wrap(editor)
+    assert editor.current_tab().textbox.cget('wrap') != wrap
+    other = editor.indexed_tab(1)
+    editor.select(other)
+    editor.on_tab_changed()
+    assert other.textbox.cget('wrap') != wrap
+    graphical_user_interface.menu_file.toggle_word_wrap(editor)
 
 
 def test_create_status_bar(editor):
@@ -113,8 +121,8 @@ def test_save_file(editor, temp_dir):
     tab.file_dir = str(file_path)
     tab.textbox.insert("1.0", "Test content for save_file function\n")
 
-    # Save the file
-    graphical_user_interface.menu_file.save_file(editor)
+    # Save the file and wait for the background write
+    graphical_user_interface.menu_file.save_file(editor).result()
 
     # Check if the file is saved correctly
     file_content = file_path.read_text('utf-8').strip()
@@ -151,8 +159,9 @@ def test_save_all(editor, temp_dir):
         if i > 0:
             tab.file_dir = str(temp_dir.join(f"test_{i}.txt"))
 
-    # Save all files
+    # Save all files and wait for the background writes
     graphical_user_interface.menu_file.save_all(editor)
+    editor.save_engine.wait()
 
     # Check if all files are saved correctly
     for i, content in enumerate(file_contents):
@@ -193,3 +202,18 @@ def test_exit_editor(editor, temp_dir):
     # Check if the file is saved before exiting
     with open(file_path, 'r', encoding='utf-8') as file:
         assert file.read().rstrip('\n') == file_content
+
+
+def test_has_unsaved_changes(editor):
+    """Test dirty tracking follows edits and saves"""
+    tab = editor.current_tab()
+    assert not graphical_user_interface.menu_file.has_unsaved_changes(tab)
+    tab.textbox.insert("1.0", "abc")
+    assert graphical_user_interface.menu_file.has_unsaved_changes(tab)
+    tab.mark_saved()
+    assert not graphical_user_interface.menu_file.has_unsaved_changes(tab)
+    # Editing the text back to its saved content is not a change
+    tab.textbox.delete("1.2")
+    assert graphical_user_interface.menu_file.has_unsaved_changes(tab)
+    tab.textbox.insert("1.2", "c")
+    assert not graphical_user_interface.menu_file.has_unsaved_changes(tab)
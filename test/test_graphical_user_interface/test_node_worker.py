@@ -0,0 +1,122 @@
+#!/usr/bin/env python3
+"""Module to test the persistent node worker"""
+
+import base64
+import gzip
+import json
+import queue
+import pytest
+from graphical_user_interface.node_worker import NodeWorker, \
+    encode_request, COMPRESS_THRESHOLD
+
+# Echoes each request back as two tokens; "crash" makes the worker exit
+# and "hang" is never answered
+FAKE_SERVER = r"""
+const readline = require('readline');
+const zlib = require('zlib');
+const lines = readline.createInterface({ input: process.stdin });
+lines.on('line', (line) => {
+    const request = JSON.parse(line);
+    if (request.cancel) { return; }
+    if (request.contentEncoding === 'gzip+base64') {
+        request.fileContent = zlib.gunzipSync(
+            Buffer.from(request.fileContent, 'base64')).toString('utf8');
+    }
+    if (request.fileContent === 'hang') { return; }
+    if (request.fileContent === 'crash') {
+        process.stderr.write('worker crashed\n');
+        process.exit(1);
+    }
+    const send = (message) => process.stdout.write(
+        JSON.stringify(Object.assign({ id: request.id }, message)) + '\n');
+    send({ token: 'pid ' + process.pid + ': ' });
+    send({ token: request.fileContent });
+    send({ done: true });
+});
+"""
+
+
+@pytest.fixture
+def worker(tmpdir):
+    """Worker running the fake server script"""
+    script = tmpdir.join("server.js")
+    script.write(FAKE_SERVER)
+    worker = NodeWorker(str(script))
+    yield worker
+    worker.close()
+
+
+def explain(worker, content):
+    """Run one request and collect its messages"""
+    messages = queue.Queue()
+    worker.request({"fileContent": content}, messages.put)
+    collected = []
+    while True:
+        message = messages.get(timeout=10)
+        collected.append(message)
+        if "done" in message or "error" in message:
+            return collected
+
+
+def test_requests_share_one_process(worker):
+    """Test consecutive requests are served by the same process"""
+    first = explain(worker, "one")
+    second = explain(worker, "two")
+    assert first[-1] == {"id": 1, "done": True}
+    assert first[1]["token"] == "one"
+    assert second[1]["token"] == "two"
+    assert first[0]["token"] == second[0]["token"]
+
+
+def test_concurrent_requests(worker):
+    """Test responses are routed to the request they belong to"""
+    results = [queue.Queue() for _ in range(5)]
+    for i, messages in enumerate(results):
+        worker.request({"fileContent": f"request {i}"}, messages.put)
+    for i, messages in enumerate(results):
+        tokens = [messages.get(timeout=10) for _ in range(3)]
+        assert tokens[1]["token"] == f"request {i}"
+
+
+def test_restart_after_crash(worker):
+    """Test a dead worker fails its requests and is restarted"""
+    before = explain(worker, "before")[0]["token"]
+    assert explain(worker, "crash")[-1] == {"error": "worker crashed"}
+    after = explain(worker, "after")[0]["token"]
+    assert after != before
+
+
+def test_request_right_after_death(worker):
+    """Test requests of a dead worker fail even when a new request has
+       already started its replacement
+    """
+    messages = queue.Queue()
+    worker.request({"fileContent": "hang"}, messages.put)
+    process = worker.process
+    process.kill()
+    process.wait()
+    assert explain(worker, "after")[-1]["done"]
+    assert "error" in messages.get(timeout=10)
+    assert not worker.handlers
+
+
+def test_small_content_is_sent_as_is():
+    """Test requests under the threshold are plain JSON lines"""
+    line = encode_request({"id": 1, "fileContent": "hello"})
+    assert json.loads(line) == {"id": 1, "fileContent": "hello"}
+
+
+def test_large_content_is_compressed():
+    """Test large content is gzipped and much smaller on the pipe"""
+    content = "print('hello world')\n" * COMPRESS_THRESHOLD
+    message = json.loads(encode_request({"id": 1, "fileContent": content}))
+    assert message["contentEncoding"] == "gzip+base64"
+    assert len(message["fileContent"]) < len(content) // 10
+    data = gzip.decompress(base64.b64decode(message["fileContent"]))
+    assert data.decode("utf-8") == content
+
+
+def test_large_request(worker):
+    """Test content far over the argv size limit reaches the worker"""
+    content = "é" * (4 * 1024 * 1024)
+    assert explain(worker, content)[1]["token"] == content
@@ -0,0 +1,62 @@
+#!/usr/bin/env python3
+"""Module to test the piece-table document model"""
+
+from graphical_user_interface.piece_table import PieceTable
+
+
+def test_initial_document():
+    """Test the original buffer is the whole document"""
+    document = PieceTable("Hello, World!")
+    assert len(document) == 13
+    assert document.text() == "Hello, World!"
+
+
+def test_insert_and_delete():
+    """Test edits at the start, middle and end of the document"""
+    document = PieceTable("Hello World")
+    document.insert(5, ",")
+    document.insert(len(document), "!")
+    document.insert(0, ">> ")
+    assert document.text() == ">> Hello, World!"
+    document.delete(0, 3)
+    document.delete(5, 7)
+    assert document.text() == "Hello!"
+    assert len(document) == 6
+
+
+def test_typing_coalesces_pieces():
+    """Test consecutive typing extends one piece"""
+    document = PieceTable()
+    for char in "typing":
+        document.insert(len(document), char)
+    assert document.text() == "typing"
+    assert len(list(document.chunks())) == 1
+
+
+def test_snapshot_is_frozen():
+    """Test a snapshot is unaffected by later edits"""
+    document = PieceTable("abc")
+    document.insert(3, "def")
+    snapshot = document.snapshot()
+    document.insert(6, "ghi")
+    document.delete(0, 2)
+    assert snapshot.text() == "abcdef"
+    assert document.text() == "cdefghi"
+
+
+def test_equals():
+    """Test comparing the document with a string"""
+    document = PieceTable("abc")
+    document.insert(1, "X")
+    assert document.equals("aXbc")
+    assert not document.equals("abc")
+    assert not document.equals(None)
+
+
+def test_slice():
+    """Test taking text across piece boundaries"""
+    document = PieceTable("abcdef")
+    document.insert(3, "XYZ")
+    assert document.slice(2, 7) == "cXYZd"
+    assert document.slice(0, len(document)) == document.text()
+    assert document.slice(4, 4) == ""
@@ -0,0 +1,92 @@
+#!/usr/bin/env python3
+"""Module to test the atomic background save engine"""
+
+import os
+import pytest
+from graphical_user_interface.piece_table import PieceTable, digest_chunks
+from graphical_user_interface.save_engine import (
+    write_atomic,
+    SaveBatch,
+    format_size
+)
+
+
+@pytest.fixture
+def document():
+    """A document made of several pieces"""
+    document = PieceTable("Hello World")
+    document.insert(5, ",")
+    document.insert(len(document), "!\n")
+    return document
+
+
+def test_write_atomic(tmpdir, document):
+    """Test the snapshot ends up in the file and no temp file is left"""
+    file_path = tmpdir.join("saved.txt")
+    result = write_atomic(document.snapshot(), str(file_path),
+                          document.version)
+    assert file_path.read_text("utf-8") == "Hello, World!\n"
+    assert result.length == len(document)
+    assert result.size == os.path.getsize(str(file_path))
+    assert result.digest == digest_chunks(document.chunks())
+    assert os.listdir(str(tmpdir)) == ["saved.txt"]
+
+
+def test_write_atomic_replaces_file(tmpdir, document):
+    """Test an existing file is replaced and keeps its permissions"""
+    file_path = tmpdir.join("saved.txt")
+    file_path.write("old content that is longer than the new one")
+    os.chmod(str(file_path), 0o640)
+    write_atomic(document.snapshot(), str(file_path), document.version)
+    assert file_path.read_text("utf-8") == "Hello, World!\n"
+    assert os.stat(str(file_path)).st_mode & 0o777 == 0o640
+
+
+def test_failed_write_keeps_original(tmpdir, document, monkeypatch):
+    """Test a failure mid-write leaves the original file untouched"""
+    file_path = tmpdir.join("saved.txt")
+    file_path.write("original")
+
+    def fail(*args):
+        raise OSError("disk full")
+    monkeypatch.setattr(os, "fsync", fail)
+    with pytest.raises(OSError):
+        write_atomic(document.snapshot(), str(file_path), document.version)
+    assert file_path.read_text("utf-8") == "original"
+    assert os.listdir(str(tmpdir)) == ["saved.txt"]
+
+
+class DoneFuture:
+    """Stand-in for a finished Future"""
+    def __init__(self, result=None, error=None):
+        self._result = result
+        self._error = error
+
+    def exception(self):
+        return self._error
+
+    def result(self):
+        return self._result
+
+
+def test_save_batch(tmpdir, document):
+    """Test a batch reports once every save has finished"""
+    finished = []
+    batch = SaveBatch(3, finished.append)
+    for i in range(2):
+        result = write_atomic(document.snapshot(),
+                              str(tmpdir.join(f"{i}.txt")), document.version)
+        batch.add(result.file_path, DoneFuture(result))
+    assert not finished
+    batch.add("missing.txt", DoneFuture(error=OSError("denied")))
+    assert finished == [batch]
+    assert batch.size() == 2 * len("Hello, World!\n")
+    assert batch.summary().startswith("Saved 2 of 3 files, 28 B in")
+    assert batch.summary().endswith("1 failed")
+
+
+def test_format_size():
+    """Test byte counts are shown in readable units"""
+    assert format_size(512) == "512 B"
+    assert format_size(1536) == "1.5 KB"
+    assert format_size(3 * 1024 ** 3) == "3.0 GB"
@@ -0,0 +1,28 @@
+#!/usr/bin/env python3
+"""Module to test the startup timer"""
+
+import io
+from graphical_user_interface.startup import StartupTimer
+
+
+def test_phases_add_up():
+    """Test each phase runs from the end of the previous one"""
+    timer = StartupTimer(started=0.0)
+    timer.mark('imports')
+    timer.mark('window')
+    names = [phase for phase, _ in timer.phases]
+    assert names == ['imports', 'window']
+    assert abs(sum(seconds for _, seconds in timer.phases) -
+               timer.total()) < 1e-9
+
+
+def test_report(monkeypatch):
+    """Test the breakdown is only printed when asked for"""
+    timer = StartupTimer()
+    timer.mark('imports')
+    monkeypatch.delenv('PYC_STARTUP_REPORT', raising=False)
+    timer.report()
+    stream = io.StringIO()
+    timer.report(stream)
+    assert stream.getvalue().startswith('Startup ')
+    assert 'imports' in stream.getvalue()
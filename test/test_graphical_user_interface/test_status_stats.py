@@ -0,0 +1,52 @@
+#!/usr/bin/env python3
+"""Module to test the running status bar statistics"""
+
+from graphical_user_interface.status_stats import DocumentStats
+
+
+def test_reset():
+    """Test counting a whole document"""
+    stats = DocumentStats("Hello, World!\nSecond line")
+    assert stats.chars == 25
+    assert stats.lines == 2
+    assert stats.words == 4
+
+
+def test_insert_joins_and_splits_words():
+    """Test word counts when inserting inside and between words"""
+    stats = DocumentStats("foo bar")
+    # "foo bar" -> "foo  bar": a space next to a space adds no word
+    stats.inserted(" ", before=" ", after="b")
+    assert stats.words == 2
+    # "foo  bar" -> "foXo  bar": typing inside a word adds no word
+    stats.inserted("X", before="o", after="o")
+    assert stats.words == 2
+    # "foXo  bar" -> "foX o  bar": splitting a word adds one
+    stats.inserted(" ", before="X", after="o")
+    assert stats.words == 3
+    assert stats.chars == 10
+
+
+def test_delete_joins_words():
+    """Test deleting the space between two words"""
+    stats = DocumentStats("foo bar\nbaz")
+    stats.deleted(" ", before="o", after="b")
+    assert stats.words == 2
+    stats.deleted("\n", before="r", after="b")
+    assert stats.words == 1
+    assert stats.lines == 1
+
+
+def test_matches_full_count():
+    """Test a series of edits agrees with recounting the text"""
+    text = ""
+    stats = DocumentStats(text)
+    for position, chunk in [(0, "one two"), (3, " and"), (0, "\n"),
+                            (5, "x y\nz")]:
+        before = text[position - 1:position] if position else ""
+        after = text[position:position + 1]
+        stats.inserted(chunk, before, after)
+        text = text[:position] + chunk + text[position:]
+    expected = DocumentStats(text)
+    assert (stats.chars, stats.lines, stats.words) == \
+        (expected.chars, expected.lines, expected.words)
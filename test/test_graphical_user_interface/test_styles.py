@@ -0,0 +1,50 @@
+#!/usr/bin/env python3
+"""Module to test the view options shared by every tab"""
+
+from graphical_user_interface.styles import Styles
+
+
+class FakeTextbox:
+    """Counts the times it is configured"""
+    def __init__(self):
+        self.options = {}
+        self.configures = 0
+
+    def configure(self, **options):
+        self.options.update(options)
+        self.configures += 1
+
+
+def test_options_are_applied_once():
+    """Test a tab is configured only when it shows old options"""
+    styles = Styles(options={'wrap': 'none'})
+    textbox = FakeTextbox()
+    version = styles.version
+    assert styles.apply(textbox, version) == version
+    assert textbox.configures == 0
+
+    styles.set_options(wrap='word')
+    version = styles.apply(textbox, version)
+    assert textbox.options == {'wrap': 'word'}
+    assert styles.apply(textbox, version) == version
+    assert textbox.configures == 1
+
+
+def test_unchanged_options_keep_the_version():
+    """Test setting the current value does not touch any tab"""
+    styles = Styles(options={'wrap': 'none'})
+    styles.set_options(wrap='none')
+    assert styles.version == 0
+    styles.set_options(wrap='word')
+    styles.set_options(wrap='none')
+    assert styles.version == 2
+
+
+def test_font_settings_without_widgets():
+    """Test the font is remembered before any widget uses it"""
+    styles = Styles(font=('Arial', 10))
+    styles.set_font(size='14')
+    styles.set_font(family='Courier New')
+    assert (styles.family, styles.size) == ('Courier New', 14)
+    # Tabs measuring rows in the font are told when next shown
+    assert styles.version == 2
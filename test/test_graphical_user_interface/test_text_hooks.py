@@ -0,0 +1,36 @@
+#!/usr/bin/env python3
+"""Module to test edit hooks on the text widget"""
+
+from graphical_user_interface.User_Interface import Tab
+
+
+def test_document_follows_widget():
+    """Test the document model mirrors inserts, deletes and replaces"""
+    tab = Tab()
+    tab.textbox.insert("1.0", "Hello\nWorld")
+    tab.textbox.insert("end", "!")
+    tab.textbox.delete("1.0", "1.2")
+    tab.textbox.replace("2.0", "2.5", "There")
+    assert tab.document.text() == tab.textbox.get("1.0", "end-1c")
+    assert tab.document.text() == "llo\nThere!"
+
+
+def test_undo_is_tracked():
+    """Test undo goes through the hooks as well"""
+    tab = Tab()
+    tab.textbox.insert("1.0", "Some text")
+    tab.textbox.edit_separator()
+    tab.textbox.delete("1.0", "end")
+    tab.textbox.edit_undo()
+    assert tab.document.text() == "Some text"
+
+
+def test_edit_listeners():
+    """Test listeners receive normalized positions"""
+    tab = Tab()
+    edits = []
+    tab.add_edit_listener(lambda *edit: edits.append(edit))
+    tab.textbox.insert("end", "ab\ncd")
+    tab.textbox.delete("1.1", "end")
+    assert edits == [("insert", "1.0", "2.2", "ab\ncd"),
+                     ("delete", "1.1", "2.2", "b\ncd")]